@@ -0,0 +1,219 @@
+import argparse
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List
+
+from rich.panel import Panel
+
+from src import (
+    BATCH_RATE_LIMIT,
+    BATCH_WORKERS,
+    DECODE_CHUNK_SECONDS,
+    DECODE_MIN_FRAMES,
+    DECODE_WORKERS,
+    FRAME_CACHE_DIR,
+    FRAME_CACHE_MAX_GB,
+    MOTION_FLOW_WIDTH,
+    OPENAI_CLIENT,
+    UPLOAD_MAX_FRAMES,
+    UPLOAD_MAX_WIDTH,
+    UPLOAD_SAMPLE_FPS,
+    UPLOAD_WINDOW_OVERLAP,
+    UPLOAD_WINDOW_SECONDS,
+    console,
+    logger,
+)
+from src.frame_cache import make_frame_reader
+from src.geometric_detector import GeometricFallDetector, format_geometric_verdict
+from src.parallel_decode import ParallelDecoder
+from src.rate_limit import RateLimiter
+from src.timeline import TimelineAnalyzer, fall_events
+from src.utils import file_sha256, frames_to_base64, is_verdict, prepare_messages
+from src.video_reader import probe_video
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+CSV_FIELDS = ["path", "sha256", "status", "duration", "windows", "failed_windows", "falls", "fall_times", "error", "analyzed_at"]
+
+
+def find_videos(directory, extensions=VIDEO_EXTENSIONS):
+    """All video files under a directory, in a stable order"""
+    videos: List[str] = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        videos.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(extensions))
+    return videos
+
+
+def load_done_hashes(output_path):
+    """Content hashes already analyzed successfully in a previous run, so a re-run only picks up the rest"""
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "r", encoding="utf-8", newline="") as f:
+        if output_path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return {row["sha256"] for row in rows if row.get("status") == "ok"}
+
+
+class ResultWriter:
+    """Appends one result per file as soon as it is ready (JSONL, or CSV by extension) so an interrupted run can resume"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.is_csv = output_path.endswith(".csv")
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            new_file = not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0
+            with open(self.output_path, "a", encoding="utf-8", newline="") as f:
+                if self.is_csv:
+                    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+                    if new_file:
+                        writer.writeheader()
+                    writer.writerow({**record, "fall_times": ";".join(f"{t:.1f}" for t in record["fall_times"])})
+                else:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def make_analyzer(method, limiter):
+    """Window analyzer for the chosen method; model requests go through the shared rate limiter"""
+    if method == "geometric":
+        detector = GeometricFallDetector()
+        return lambda frames: format_geometric_verdict(detector.analyze(frames))
+
+    def analyze_openai(frames):
+        base64_frames = frames_to_base64(frames)
+        if not base64_frames:
+            return None
+        limiter.acquire()
+        response = OPENAI_CLIENT.chat.completions.create(model="gpt-4o-mini", messages=prepare_messages(base64_frames), max_tokens=150)
+        return (response.choices[0].message.content or "").strip() or None
+
+    return analyze_openai
+
+
+class BatchAnalyzer:
+    """Analyzes every video of a directory as a timeline of windows with a pool of file workers"""
+
+    def __init__(self, method="openai", workers=BATCH_WORKERS, rate_limit=BATCH_RATE_LIMIT):
+        self.method = method
+        self.workers = max(1, workers)
+        self.analyze = make_analyzer(method, RateLimiter(rate_limit))
+        self.decoder = ParallelDecoder(DECODE_WORKERS, DECODE_CHUNK_SECONDS, DECODE_MIN_FRAMES)
+        self.frame_reader = make_frame_reader(FRAME_CACHE_DIR, self.decoder.iter_frames, FRAME_CACHE_MAX_GB)
+        self.claimed = set()  # hashes done before or being analyzed now (duplicate copies are analyzed once)
+        self.lock = threading.Lock()
+
+    def analyze_file(self, path):
+        """Result record for one file, or None when its content was already analyzed"""
+        record = {"path": path, "sha256": "", "status": "error", "duration": 0.0, "windows": 0, "failed_windows": 0, "falls": 0, "fall_times": [], "error": ""}
+        try:
+            # Unreadable files (permissions, deleted mid-run) become error records instead of aborting the batch
+            digest = file_sha256(path)
+            with self.lock:
+                if digest in self.claimed:
+                    return None
+                self.claimed.add(digest)
+            record["sha256"] = digest
+
+            info = probe_video(path)
+            if info["duration"] <= 0:
+                raise IOError("empty or unreadable video")
+
+            analyzer = TimelineAnalyzer(
+                self.analyze,
+                window_seconds=UPLOAD_WINDOW_SECONDS,
+                overlap=UPLOAD_WINDOW_OVERLAP,
+                max_workers=1,  # files are the unit of parallelism here
+                sample_fps=UPLOAD_SAMPLE_FPS,
+                max_frames=UPLOAD_MAX_FRAMES,
+                max_width=UPLOAD_MAX_WIDTH,
+                motion_width=MOTION_FLOW_WIDTH,
+                reader=self.frame_reader,
+            )
+            timeline = analyzer.run(path, info["duration"])
+            events = fall_events(timeline)
+            failed = sum(1 for entry in timeline if not is_verdict(entry["verdict"]))
+
+            # Files with failed windows are not "ok", so the next run retries them
+            record.update(
+                status="ok" if not failed else ("failed" if failed == len(timeline) else "partial"),
+                duration=round(info["duration"], 2),
+                windows=len(timeline),
+                failed_windows=failed,
+                falls=len(events),
+                fall_times=[round(event["fall_time"], 2) for event in events],
+                timeline=[{key: entry[key] for key in ("start", "end", "verdict", "fall", "fall_time")} for entry in timeline],
+            )
+        except Exception as e:
+            record["error"] = str(e)
+
+        record["analyzed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return record
+
+    def run(self, directory, output_path):
+        videos = find_videos(directory)
+        self.claimed = load_done_hashes(output_path)
+        writer = ResultWriter(output_path)
+        console.print(f"[blue]📂 {len(videos)} video trong[/blue] [cyan]{directory}[/cyan] [blue]({len(self.claimed)} đã phân tích trước đó)[/blue]")
+
+        counts = {"ok": 0, "partial": 0, "failed": 0, "error": 0, "skipped": 0, "falls": 0}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(self.analyze_file, path): path for path in videos}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                record = future.result()
+                if record is None:
+                    counts["skipped"] += 1
+                    continue
+
+                writer.write(record)
+                counts[record["status"]] += 1
+                counts["falls"] += record["falls"]
+                if record["falls"]:
+                    times = ", ".join(f"{t:.1f}s" for t in record["fall_times"])
+                    console.print(f"[red]🚨 [{done}/{len(videos)}] {path}: {record['falls']} té ngã tại {times}[/red]")
+                elif record["status"] == "error":
+                    logger.error(f"[{done}/{len(videos)}] {path}: {record['error']}")
+                else:
+                    console.print(f"[green]✅ [{done}/{len(videos)}] {path}: {record['status']} ({record['windows']} cửa sổ)[/green]")
+
+        self.decoder.shutdown()
+        return counts
+
+
+def main():
+    """Analyze a directory of recordings offline"""
+    parser = argparse.ArgumentParser(description="Batch fall analysis of a directory of recordings")
+    parser.add_argument("directory", help="directory to scan recursively for videos")
+    parser.add_argument("--output", default="batch_results.jsonl", help="results file, .jsonl or .csv; re-running resumes from it")
+    parser.add_argument("--method", choices=["openai", "geometric"], default="openai", help="window analysis method")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="files analyzed at the same time (env BATCH_WORKERS)")
+    parser.add_argument("--rate-limit", type=float, default=BATCH_RATE_LIMIT, help="max model requests per minute, 0 = unlimited (env BATCH_RATE_LIMIT)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        console.print(f"[red]❌ Không tìm thấy thư mục {args.directory}[/red]")
+        return
+
+    console.print(Panel("[bold blue]📼 Phân Tích Hàng Loạt Video Lưu Trữ[/bold blue]", title="[bold green]BATCH[/bold green]", border_style="blue", padding=(1, 2)))
+
+    counts = BatchAnalyzer(args.method, args.workers, args.rate_limit).run(args.directory, args.output)
+
+    summary = (
+        f"✅ Thành công: {counts['ok']}  ⚠️ Một phần: {counts['partial']}  ❌ Lỗi: {counts['failed'] + counts['error']}  ⏭️ Bỏ qua: {counts['skipped']}\n"
+        f"🚨 Sự kiện té ngã: {counts['falls']}\n"
+        f"💾 Kết quả: {args.output}"
+    )
+    console.print(Panel(summary, title="[bold green]🎯 KẾT QUẢ[/bold green]", border_style="green", padding=(1, 2)))
+
+
+if __name__ == "__main__":
+    main()
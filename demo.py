@@ -1,3 +1,4 @@
+import argparse
 import base64
 import os
 import threading
@@ -6,8 +7,30 @@ import cv2
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from src import OPENAI_CLIENT, console
-from src.utils import prepare_messages, save_analysis_frames_to_temp
+from src import (
+    DEMO_MAX_FRAMES,
+    DEMO_SAMPLE_FPS,
+    FRAME_CACHE_DIR,
+    FRAME_CACHE_MAX_GB,
+    OPENAI_CLIENT,
+    RESULT_CACHE,
+    RESULT_CACHE_DIR,
+    console,
+)
+from src.frame_cache import make_frame_reader
+from src.multiview import combine_views
+from src.result_cache import ResultCache, cache_key
+from src.utils import (
+    JPEG_QUALITY,
+    PROMPT_VERSION,
+    file_sha256,
+    is_verdict,
+    prepare_messages,
+    save_analysis_frames_to_temp,
+)
+
+RESULT_CACHE_STORE = ResultCache(RESULT_CACHE_DIR)
+FRAME_READER = make_frame_reader(FRAME_CACHE_DIR, max_gb=FRAME_CACHE_MAX_GB)
 
 
 def analyze_video_for_falls(video_path="src/media/fall-01-cam1.mp4"):
@@ -19,29 +42,85 @@ def analyze_video_for_falls(video_path="src/media/fall-01-cam1.mp4"):
 
     console.print(f"[blue]📹 Đang phân tích video:[/blue] [cyan]{video_path}[/cyan]")
 
-    # Extract frames from video
-    video = cv2.VideoCapture(video_path)
+    key = demo_cache_key([video_path], multiview=False)
+    if show_cached_result(key):
+        return
+
+    # Only the sampled frames are decoded and encoded; they are also the evidence saved for a fall
     base64_frames = []
-    recent_frames = []
-    frame_count = 0
+    sampled_frames = []
+    for sample in FRAME_READER(video_path, DEMO_SAMPLE_FPS, DEMO_MAX_FRAMES):
+        sampled_frames.append(sample["frame"])
+        _, buffer = cv2.imencode(".jpg", sample["frame"], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        base64_frames.append(base64.b64encode(buffer).decode("utf-8"))
+
+    console.print(f"[green]📊 Đã trích xuất {len(base64_frames)} khung hình để phân tích[/green]")
+    report_analysis(base64_frames, sampled_frames, key)
 
-    while video.isOpened():  # Limit frames for demo
-        success, frame = video.read()
-        if not success:
-            break
 
-        frame_count += 1
+def analyze_multiview_for_falls(video_paths):
+    """Analyze several time-aligned cameras of one room with a single model call, using the best view per moment"""
+    missing = [path for path in video_paths if not os.path.exists(path)]
+    if missing:
+        console.print(f"[red]❌ Không tìm thấy file video {', '.join(missing)}[/red]")
+        return
 
-        # Take every 10th frame to reduce processing
-        recent_frames.append(frame)
-        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-        base64_frame = base64.b64encode(buffer).decode("utf-8")
-        base64_frames.append(base64_frame)
+    console.print(f"[blue]📹 Đang phân tích {len(video_paths)} góc quay:[/blue] [cyan]{', '.join(video_paths)}[/cyan]")
 
-    base64_frames = base64_frames[::10]
-    video.release()
-    console.print(f"[green]📊 Đã trích xuất {len(base64_frames)} khung hình để phân tích[/green]")
+    key = demo_cache_key(video_paths, multiview=True)
+    if show_cached_result(key):
+        return
+
+    frames = combine_views(video_paths, DEMO_SAMPLE_FPS, DEMO_MAX_FRAMES, reader=FRAME_READER)
+    base64_frames = []
+    for frame_data in frames:
+        _, buffer = cv2.imencode(".jpg", frame_data["frame"], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        base64_frames.append(base64.b64encode(buffer).decode("utf-8"))
+
+    views = ", ".join(f"cam{i}: {sum(1 for f in frames if f['view'] == i)}" for i in range(len(video_paths)))
+    console.print(f"[green]📊 Đã chọn {len(base64_frames)} khung hình từ các góc quay ({views})[/green]")
+    report_analysis(base64_frames, [f["frame"] for f in frames], key)
+
+
+def demo_cache_key(video_paths, multiview):
+    """Result cache key of a demo run (None when caching is off)"""
+    if not RESULT_CACHE:
+        return None
+    settings = {
+        "method": "demo-openai",
+        "multiview": multiview,
+        "sampling": [DEMO_SAMPLE_FPS, DEMO_MAX_FRAMES],
+        "jpeg_quality": JPEG_QUALITY,
+        "prompt_version": PROMPT_VERSION,
+    }
+    return cache_key([file_sha256(path) for path in video_paths], settings)
+
+
+def show_cached_result(key):
+    """Display a cached verdict for this content and settings; returns False when there is none"""
+    cached = RESULT_CACHE_STORE.get(key) if key else None
+    if not cached:
+        return False
+
+    console.print("[green]⚡ Dùng kết quả đã lưu (cùng nội dung video và cấu hình)[/green]")
+    show_result(cached["verdict"])
+    return True
+
+
+def show_result(analysis_result):
+    """Display a verdict; returns whether it is a fall"""
+    result_panel = Panel(analysis_result, title="[bold green]🎯 KẾT QUẢ PHÂN TÍCH[/bold green]", border_style="green", padding=(1, 2))
+    console.print(result_panel)
 
+    if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+        console.print("\n[red]🚨 PHÁT HIỆN TÉ NGÃ trong video![/red]")
+        return True
+    console.print("\n[green]✅ Không phát hiện té ngã trong video[/green]")
+    return False
+
+
+def report_analysis(base64_frames, evidence_frames, key=None):
+    """Send the encoded frames to OpenAI once, display the verdict and cache it"""
     if not base64_frames:
         console.print("[red]❌ Không trích xuất được khung hình từ video[/red]")
         return
@@ -60,16 +139,12 @@ def analyze_video_for_falls(video_path="src/media/fall-01-cam1.mp4"):
     analysis_result = response.choices[0].message.content.strip()
 
     # Display results in a beautiful panel
-    result_panel = Panel(analysis_result, title="[bold green]🎯 KẾT QUẢ PHÂN TÍCH[/bold green]", border_style="green", padding=(1, 2))
-    console.print(result_panel)
+    if show_result(analysis_result):
+        threading.Thread(target=save_analysis_frames_to_temp, args=(evidence_frames,)).start()
 
-    # Check if fall was detected
-    if "PHÁT_HIỆN_TÉ_NGÃ" in analysis_result:
-        console.print("\n[red]🚨 PHÁT HIỆN TÉ NGÃ trong video![/red]")
-        # save_analysis_frames_to_temp(recent_frames)
-        threading.Thread(target=save_analysis_frames_to_temp, args=([recent_frames])).start()
-    else:
-        console.print("\n[green]✅ Không phát hiện té ngã trong video[/green]")
+    # Only real verdicts are cached, like the UI: other replies must not become the stored answer for this content
+    if key and is_verdict(analysis_result):
+        RESULT_CACHE_STORE.put(key, {"verdict": analysis_result, "timeline": None}, [{"frame": frame} for frame in evidence_frames])
 
     # except Exception as e:
     #     console.print(f"[red]❌ Lỗi trong quá trình phân tích: {e}[/red]")
@@ -77,6 +152,11 @@ def analyze_video_for_falls(video_path="src/media/fall-01-cam1.mp4"):
 
 def main():
     """Main demo function"""
+    parser = argparse.ArgumentParser(description="Fall detection demo on recorded videos")
+    parser.add_argument("videos", nargs="*", help="video files (default: media/fall-01-cam0.mp4, both sample cameras with --multiview)")
+    parser.add_argument("--multiview", action="store_true", help="treat the videos as time-aligned cameras of one room and analyze them together")
+    args = parser.parse_args()
+
     startup_panel = Panel(
         "[bold blue]🎬 Demo Phân Tích Video Phát Hiện Té Ngã[/bold blue]", title="[bold green]DEMO SYSTEM[/bold green]", border_style="blue", padding=(1, 2)
     )
@@ -88,22 +168,20 @@ def main():
         console.print("[yellow]Vui lòng thiết lập file .env trước[/yellow]")
         return
 
-    # Check if video file exists
-    video_files = ["media/fall-01-cam0.mp4"]
-    video_to_analyze = None
+    # Check if video files exist; a missing camera must not silently turn a multi-view run into a single-view one
+    video_files = args.videos or ["media/fall-01-cam0.mp4", "media/fall-01-cam1.mp4"][: 2 if args.multiview else 1]
+    missing = [video_file for video_file in video_files if not os.path.exists(video_file)]
 
-    for video_file in video_files:
-        if os.path.exists(video_file):
-            video_to_analyze = video_file
-            break
-
-    if not video_to_analyze:
-        console.print("[red]❌ Không tìm thấy file video để phân tích[/red]")
-        console.print("[yellow]Các tùy chọn có sẵn: media/fall-01-cam0.mp4[/yellow]")
+    if missing:
+        console.print(f"[red]❌ Không tìm thấy file video {', '.join(missing)}[/red]")
+        console.print("[yellow]Các tùy chọn có sẵn: media/fall-01-cam0.mp4, media/fall-01-cam1.mp4[/yellow]")
         return
 
     # Run analysis
-    analyze_video_for_falls(video_to_analyze)
+    if args.multiview and len(video_files) > 1:
+        analyze_multiview_for_falls(video_files)
+    else:
+        analyze_video_for_falls(video_files[0])
 
 
 if __name__ == "__main__":
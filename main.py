@@ -1,38 +1,110 @@
+import argparse
 import asyncio
+import signal
 import threading
 import time
 from datetime import datetime
+from typing import Optional
 
 import cv2
 from rich.panel import Panel
 from rich.table import Table
 
 from src import (
+    ANALYSIS_WIDTH,
+    BACKLOG_DIR,
+    BACKLOG_DRAIN_PER_MINUTE,
+    BACKLOG_MAX_ATTEMPTS,
+    BACKLOG_MAX_WINDOWS,
+    BACKLOG_RETRY_SECONDS,
+    CAMERA_HEIGHT,
+    CAMERA_WIDTH,
+    EVIDENCE_FPS,
     EVIDENT_DIR,
+    GEOMETRIC_DROP_VELOCITY,
+    GEOMETRIC_FLOOR_SECONDS,
+    GEOMETRIC_GATE,
+    GEOMETRIC_GATE_THRESHOLD,
+    HEADLESS,
+    MAX_FRAMES,
     OPENAI_CLIENT,
+    PERSON_DETECTOR_MODEL,
+    PERSON_DETECTOR_PROTOTXT,
+    PREVIEW_FPS,
+    ROI_CROP,
+    ROI_MARGIN,
+    ROI_MAX_SIDE,
+    ROI_ZONES,
     SAVE_ANALYSIS_FRAMES,
     SAVE_FORMAT,
     TELEGRAM_BOT,
+    TEMPORAL_FILTER,
+    TEMPORAL_REALERT_SECONDS,
+    TEMPORAL_RECHECK,
     USE_TELE_ALERT,
+    ZONES_FILE,
     alert_services,
     console,
     logger,
 )
-from src.utils import frames_to_base64, prepare_messages, save_analysis_frames_to_temp
+from src.backlog import WindowBacklog
+from src.geometric_detector import GeometricFallDetector
+from src.person_detector import PersonDetector
+from src.roi import RoiCropper, parse_zones
+from src.streams import DualResolutionStreams
+from src.temporal import TemporalFallFilter, offset_frames
+from src.utils import (
+    frames_to_base64,
+    is_verdict,
+    prepare_messages,
+    save_analysis_frames_to_temp,
+)
+from src.zones import CameraZones, load_camera_zones
 
 
 class FallDetectionSystem:
-    def __init__(self):
+    def __init__(self, headless=HEADLESS, preview_fps=PREVIEW_FPS):
         # Camera and detection settings
         self.camera = None
         self.is_running = False
+        self.headless = headless  # no preview window, no GUI event pump
+        self.preview_interval = 1.0 / preview_fps if preview_fps > 0 else 0.0
+        self.last_preview_time = 0.0
         self.analysis_interval = 5  # seconds
-        self.frame_buffer = []
+        self.frame_buffer = []  # analysis stream (ANALYSIS_WIDTH wide)
+        self.streams = DualResolutionStreams(ANALYSIS_WIDTH, EVIDENCE_FPS)
         self.last_analysis_time = 0
         self.fall_detected_cooldown = 30  # seconds between fall alerts
         self.last_fall_alert = 0
         self.frame_count = 0
         self.analysis_count = 0
+        self.zones: Optional[CameraZones] = None  # per-camera polygon zones, loaded in initialize_camera
+
+        # Crop frames to the people (or configured zones) before they are encoded for the model
+        self.roi_cropper: Optional[RoiCropper] = None
+        if ROI_CROP:
+            self.roi_cropper = RoiCropper(PersonDetector(PERSON_DETECTOR_PROTOTXT, PERSON_DETECTOR_MODEL), parse_zones(ROI_ZONES), ROI_MARGIN, ROI_MAX_SIDE)
+
+        # Cheap per-frame fall heuristics; with GEOMETRIC_GATE quiet windows skip the OpenAI call
+        self.geometric_detector = GeometricFallDetector(drop_velocity=GEOMETRIC_DROP_VELOCITY, floor_seconds=GEOMETRIC_FLOOR_SECONDS)
+
+        # Confirm fall verdicts over consecutive windows (with a quick re-check) and alert once per event
+        self.temporal_filter = TemporalFallFilter(realert_seconds=TEMPORAL_REALERT_SECONDS) if TEMPORAL_FILTER else None
+
+        # Windows OpenAI could not analyze are kept on disk and re-analyzed once it answers again
+        self.backlog: Optional[WindowBacklog] = None
+        if BACKLOG_DIR:
+            self.backlog = WindowBacklog(
+                BACKLOG_DIR,
+                lambda frames, meta: self.request_verdict(frames),
+                self.handle_late_result,
+                BACKLOG_MAX_WINDOWS,
+                BACKLOG_DRAIN_PER_MINUTE,
+                BACKLOG_RETRY_SECONDS,
+                MAX_FRAMES,
+                BACKLOG_MAX_ATTEMPTS,
+            )
+        self.last_late_fall_alert = 0
 
     def create_status_table(self):
         """Create a status table for real-time monitoring"""
@@ -51,6 +123,7 @@ class FallDetectionSystem:
         table.add_row("⏰ Thời gian hoạt động", uptime)
         table.add_row("🔄 Chu kỳ phân tích", f"{self.analysis_interval}s")
         table.add_row("📊 Buffer frames", str(len(self.frame_buffer)))
+        table.add_row("📦 Cửa sổ chờ phân tích lại", self.backlog.get_stats_text() if self.backlog else "Tắt")
 
         return table
 
@@ -61,11 +134,18 @@ class FallDetectionSystem:
             if not self.camera.isOpened():
                 raise Exception(f"Failed to open camera {camera_index}")
 
-            # Set camera properties for better performance
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # Capture at high resolution for evidence; analysis works on a downscaled stream
+            if CAMERA_WIDTH and CAMERA_HEIGHT:
+                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
 
+            # Zones of this camera: ignore areas are masked, floor/bed zones refine fall checks and crops
+            self.zones = load_camera_zones(ZONES_FILE, camera_index)
+            self.geometric_detector.zones = self.zones
+            if self.roi_cropper:
+                self.roi_cropper.zones = parse_zones(ROI_ZONES) + (self.zones.roi_zones() if self.zones else [])
+
             logger.info("[green]✓[/green] Camera đã được khởi tạo thành công", extra={"markup": True})
             return True
         except Exception as e:
@@ -80,30 +160,40 @@ class FallDetectionSystem:
                 logger.warning("Không thể chụp khung hình")
                 continue
 
-            # Add timestamp to frame
+            # Small analysis stream for detection, full-resolution evidence stream at reduced fps
+            current_time = time.time()
+            analysis_frame = self.streams.push(frame, current_time)
+
+            # Ignore zones never trigger analysis and are never sent to the model
+            if self.zones:
+                analysis_frame = self.zones.apply(analysis_frame)
+
+            # Feed the geometric detector before the timestamp overlay is drawn
+            self.geometric_detector.update(analysis_frame, current_time)
+
+            # Add timestamp to the full-resolution frame (evidence and display)
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cv2.putText(frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
             # Store frame with timestamp
-            current_time = time.time()
             self.frame_count += 1
-            self.frame_buffer.append({"frame": frame, "timestamp": current_time})
+            self.frame_buffer.append({"frame": analysis_frame, "timestamp": current_time})
 
             # Keep only recent frames (last 10 seconds)
             self.frame_buffer = [f for f in self.frame_buffer if current_time - f["timestamp"] < 10]
 
-            # Display frame
-            cv2.imshow("Fall Detection System", frame)
-
             # Check for analysis trigger
             if current_time - self.last_analysis_time >= self.analysis_interval:
                 threading.Thread(target=self.analyze_frames, daemon=True).start()
                 self.last_analysis_time = current_time
 
-            # Exit on 'q' key
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                self.stop()
-                break
+            # Display frame (throttled to PREVIEW_FPS); exit on 'q' key
+            if not self.headless and current_time - self.last_preview_time >= self.preview_interval:
+                self.last_preview_time = current_time
+                cv2.imshow("Fall Detection System", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    self.stop()
+                    break
 
     def analyze_frames(self):
         """Analyze recent frames for fall detection using OpenAI"""
@@ -114,6 +204,12 @@ class FallDetectionSystem:
             self.analysis_count += 1
             logger.info(f"[blue]🔍[/blue] Bắt đầu phân tích lần {self.analysis_count}...", extra={"markup": True})
 
+            if GEOMETRIC_GATE:
+                score = self.geometric_detector.evaluate()["score"]
+                if score < GEOMETRIC_GATE_THRESHOLD:
+                    logger.info(f"[blue]📐[/blue] Không có chuyển động đáng ngờ, bỏ qua phân tích (điểm hình học {score:.2f})", extra={"markup": True})
+                    return
+
             # Get recent frames
             recent_frames = self.frame_buffer.copy()
 
@@ -121,35 +217,98 @@ class FallDetectionSystem:
             if SAVE_ANALYSIS_FRAMES:
                 threading.Thread(target=save_analysis_frames_to_temp, args=([recent_frames], "analysis")).start()
 
-            base64_frames = frames_to_base64(recent_frames)
-
-            if not base64_frames:
+            try:
+                analysis_result = self.request_verdict(recent_frames)
+            except Exception as e:
+                logger.error(f"Error during frame analysis: {e}")
+                if self.backlog and self.backlog.spill(recent_frames, "Camera Bệnh viện", "openai", str(e)):
+                    logger.info(f"[yellow]📦[/yellow] Đã lưu cửa sổ để phân tích lại ({self.backlog.get_stats_text()})", extra={"markup": True})
+                return
+            if not analysis_result:
                 return
-
-            # Call OpenAI API
-            response = OPENAI_CLIENT.chat.completions.create(model="gpt-4o-mini", messages=prepare_messages(base64_frames), max_tokens=150)
-
-            analysis_result = response.choices[0].message.content.strip()
             logger.info(f"[green]📊[/green] Kết quả phân tích: [white]{analysis_result}[/white]", extra={"markup": True})
+            if not is_verdict(analysis_result):
+                # An answer without a verdict is a failed request, not a "no fall"
+                if self.backlog and self.backlog.spill(recent_frames, "Camera Bệnh viện", "openai", analysis_result):
+                    logger.info(f"[yellow]📦[/yellow] Đã lưu cửa sổ để phân tích lại ({self.backlog.get_stats_text()})", extra={"markup": True})
+                return
 
             # Check for fall detection (Vietnamese)
-            if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+            is_fall = analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ")
+            if self.temporal_filter is None:
+                if is_fall:
+                    self.handle_fall_detection(analysis_result)
+                return
+
+            recheck = (lambda: self.recheck_window(recent_frames)) if TEMPORAL_RECHECK else None
+            decision = self.temporal_filter.update(1.0 if is_fall else 0.0, time.time(), recheck)
+            if decision == "alert":
                 self.handle_fall_detection(analysis_result)
+            elif is_fall and decision == "suspect":
+                logger.info("[yellow]🤔[/yellow] Nghi ngờ té ngã, chờ cửa sổ tiếp theo để xác nhận", extra={"markup": True})
+            elif is_fall and decision == "suppressed":
+                logger.info("[blue]🔕[/blue] Vẫn là sự kiện té ngã đã cảnh báo, không gửi lại", extra={"markup": True})
 
         except Exception as e:
             logger.error(f"Error during frame analysis: {e}")
 
-    def handle_fall_detection(self, analysis_result):
-        """Handle detected fall - send alerts"""
+    def request_verdict(self, frames):
+        """Send frames (cropped to the ROI when enabled) to OpenAI and return the verdict text"""
+        if self.roi_cropper and frames:
+            # People are detected on the full-resolution evidence frames of the window, too small in the analysis stream
+            detect_frames = self.streams.detection_frames(frames[0]["timestamp"], self.zones.apply if self.zones else None)
+            roi = self.roi_cropper.find_roi(frames, detect_frames)
+            base64_frames = frames_to_base64(frames, roi=roi, max_side=self.roi_cropper.max_side)
+        else:
+            base64_frames = frames_to_base64(frames)
+
+        if not base64_frames:
+            return None
+
+        # Call OpenAI API
+        response = OPENAI_CLIENT.chat.completions.create(model="gpt-4o-mini", messages=prepare_messages(base64_frames), max_tokens=150)
+        return response.choices[0].message.content.strip()
+
+    def recheck_window(self, frames):
+        """Quick second look at a suspicious window using the frames the first request skipped"""
+        logger.info("[blue]🔁[/blue] Kiểm tra lại cửa sổ đáng ngờ với các khung hình khác...", extra={"markup": True})
+        try:
+            analysis_result = self.request_verdict(offset_frames(frames, MAX_FRAMES))
+        except Exception as e:
+            logger.error(f"Error during re-check: {e}")
+            return None
+        if not analysis_result:
+            return None
+        logger.info(f"[blue]🔁[/blue] Kết quả kiểm tra lại: [white]{analysis_result}[/white]", extra={"markup": True})
+        return 1.0 if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ") else 0.0
+
+    def handle_late_result(self, meta, analysis_result, frames):
+        """Verdict for a window analyzed after OpenAI came back; falls are alerted and flagged as late"""
+        captured = datetime.fromtimestamp(meta["captured_at"]).strftime("%H:%M:%S")
+        logger.info(f"[blue]⏰[/blue] Kết quả trễ cho cửa sổ lúc {captured}: [white]{analysis_result}[/white]", extra={"markup": True})
+        if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+            self.handle_fall_detection(analysis_result, late=meta, evidence_frames=frames)
+
+    def handle_fall_detection(self, analysis_result, late=None, evidence_frames=None):
+        """Handle detected fall - send alerts (late: backlog metadata of a window analyzed after an outage)"""
         current_time = time.time()
 
-        # Check cooldown to prevent spam
-        if current_time - self.last_fall_alert < self.fall_detected_cooldown:
-            logger.info("[yellow]⏳[/yellow] Phát hiện té ngã nhưng vẫn trong thời gian chờ", extra={"markup": True})
-            return
+        # Check cooldown to prevent spam; late alerts are spaced by the time their windows were captured
+        if late:
+            if abs(late["captured_at"] - self.last_late_fall_alert) < self.fall_detected_cooldown:
+                logger.info("[yellow]⏳[/yellow] Phát hiện té ngã nhưng vẫn trong thời gian chờ", extra={"markup": True})
+                return
+            self.last_late_fall_alert = late["captured_at"]
+        else:
+            if current_time - self.last_fall_alert < self.fall_detected_cooldown:
+                logger.info("[yellow]⏳[/yellow] Phát hiện té ngã nhưng vẫn trong thời gian chờ", extra={"markup": True})
+                return
+            self.last_fall_alert = current_time
 
-        self.last_fall_alert = current_time
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = datetime.fromtimestamp(late["captured_at"] if late else current_time).strftime("%Y-%m-%d %H:%M:%S")
+        if late:
+            analysis_result = f"⏰ Kết quả trễ (phân tích lúc {datetime.now().strftime('%H:%M:%S')}): {analysis_result}"
+        evidence_frames = evidence_frames or self.streams.evidence_frames() or self.frame_buffer
 
         # Always log to terminal with Rich formatting
         alert_panel = Panel(
@@ -166,23 +325,28 @@ class FallDetectionSystem:
 
         # Send Telegram notification only if enabled
         if TELEGRAM_BOT and USE_TELE_ALERT:
-            asyncio.create_task(alert_services.send_telegram_alert(analysis_result, timestamp, self.frame_buffer))
+            asyncio.create_task(alert_services.send_telegram_alert(analysis_result, timestamp, evidence_frames))
         else:
             logger.info("[blue]ℹ[/blue] Bỏ qua thông báo Telegram (đã tắt hoặc chưa cấu hình)", extra={"markup": True})
 
         # Save current frame as evidence
-        if self.frame_buffer:
-            threading.Thread(target=save_analysis_frames_to_temp, args=([self.frame_buffer], EVIDENT_DIR)).start()
+        if evidence_frames:
+            threading.Thread(target=save_analysis_frames_to_temp, args=([evidence_frames], EVIDENT_DIR)).start()
 
-    def start(self):
+    def start(self, camera_index=0):
         """Start the fall detection system"""
-        if not self.initialize_camera():
+        if not self.initialize_camera(camera_index):
             return False
 
         self.is_running = True
         self.start_time = time.time()
         logger.info("[green]🚀[/green] Hệ thống phát hiện té ngã đã khởi động", extra={"markup": True})
 
+        # SIGINT/SIGTERM end the capture loop cleanly (the only way to stop in headless mode)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.handle_signal)
+            signal.signal(signal.SIGTERM, self.handle_signal)
+
         try:
             self.capture_frames()
         except KeyboardInterrupt:
@@ -192,25 +356,42 @@ class FallDetectionSystem:
 
         return True
 
+    def handle_signal(self, signum, frame):
+        """Stop the capture loop on SIGINT/SIGTERM"""
+        logger.info(f"[yellow]⚠[/yellow] Nhận tín hiệu {signal.Signals(signum).name}, đang dừng hệ thống...", extra={"markup": True})
+        self.is_running = False
+
     def stop(self):
         """Stop the fall detection system"""
+        if self.camera is None:
+            return
         self.is_running = False
 
-        if self.camera:
-            self.camera.release()
+        self.camera.release()
+        self.camera = None
 
-        cv2.destroyAllWindows()
+        if not self.headless:
+            cv2.destroyAllWindows()
         logger.info("[red]🛑[/red] Hệ thống phát hiện té ngã đã dừng", extra={"markup": True})
 
 
 def main():
     """Main function to run the fall detection system"""
+    parser = argparse.ArgumentParser(description="Hospital fall detection system")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS, help="run without a preview window (env HEADLESS)")
+    parser.add_argument("--preview-fps", type=float, default=PREVIEW_FPS, help="limit the preview window fps, 0 = every frame (env PREVIEW_FPS)")
+    parser.add_argument("--camera", type=int, default=0, help="camera index")
+    args = parser.parse_args()
+
+    exit_hint = (
+        "Nhấn [bold red]Ctrl+C[/bold red] hoặc gửi SIGTERM để thoát (chế độ headless)" if args.headless else "Nhấn '[bold red]q[/bold red]' trong cửa sổ camera để thoát"
+    )
 
     # Create startup panel
     startup_content = (
         "[bold blue]🏥 HỆ THỐNG PHÁT HIỆN TÉ NGÃ BỆNH VIỆN[/bold blue]\n\n"
         "[yellow]📋 Hướng dẫn sử dụng:[/yellow]\n"
-        "• Nhấn '[bold red]q[/bold red]' trong cửa sổ camera để thoát\n"
+        f"• {exit_hint}\n"
         "• Hệ thống sẽ phân tích video mỗi 5 giây\n\n"
         "[green]⚙️ Cấu hình cần thiết trong file .env:[/green]\n"
         "• [bold]OPENAI_API_KEY[/bold] (bắt buộc)\n"
@@ -225,8 +406,8 @@ def main():
 
     console.print(startup_panel)
 
-    system = FallDetectionSystem()
-    system.start()
+    system = FallDetectionSystem(headless=args.headless, preview_fps=args.preview_fps)
+    system.start(args.camera)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,9 @@ import os
 import queue
 import threading
 import time
+import uuid
 from datetime import datetime
+from typing import Optional
 
 import cv2
 import gradio as gr
@@ -12,16 +14,95 @@ import numpy as np
 from PIL import Image
 
 from src import (
+    ANALYSIS_WIDTH,
+    BACKLOG_DIR,
+    BACKLOG_DRAIN_PER_MINUTE,
+    BACKLOG_MAX_ATTEMPTS,
+    BACKLOG_MAX_WINDOWS,
+    BACKLOG_RETRY_SECONDS,
+    CAMERA_HEIGHT,
+    CAMERA_WIDTH,
+    CASCADE_STAGES,
+    DECODE_CHUNK_SECONDS,
+    DECODE_MIN_FRAMES,
+    DECODE_WORKERS,
+    EVIDENCE_FPS,
+    FALL_PROBE_BACKEND,
+    FALL_PROBE_HIGH,
+    FALL_PROBE_LOW,
+    FALL_PROBE_ONNX,
+    FALL_PROBE_WEIGHTS,
+    FRAME_CACHE_DIR,
+    FRAME_CACHE_MAX_GB,
+    GEOMETRIC_DROP_VELOCITY,
+    GEOMETRIC_FLOOR_SECONDS,
+    GEOMETRIC_GATE,
+    GEOMETRIC_GATE_THRESHOLD,
+    LOCAL_VERDICT_MODEL,
+    MAX_FRAMES,
+    MOTION_FLOW_EVERY,
+    MOTION_FLOW_WIDTH,
     OPENAI_CLIENT,
+    PERSON_DETECTOR_MODEL,
+    PERSON_DETECTOR_PROTOTXT,
+    PERSON_TRACKING,
+    PREFILTER_ESCALATE_METHOD,
+    RESULT_CACHE,
+    RESULT_CACHE_DIR,
+    ROI_CROP,
+    ROI_MARGIN,
+    ROI_MAX_SIDE,
+    ROI_ZONES,
     SAVE_ANALYSIS_FRAMES,
     SAVE_FORMAT,
     TELEGRAM_BOT,
+    TEMPORAL_FILTER,
+    TEMPORAL_REALERT_SECONDS,
+    TEMPORAL_RECHECK,
+    TOKEN_BUDGET_PRESET,
+    TOKEN_CEILING,
+    TRACK_CONFIRM_METHOD,
+    UPLOAD_JOB_WORKERS,
+    UPLOAD_MAX_FRAMES,
+    UPLOAD_MAX_WIDTH,
+    UPLOAD_SAMPLE_FPS,
+    UPLOAD_TIMELINE,
+    UPLOAD_WINDOW_OVERLAP,
+    UPLOAD_WINDOW_SECONDS,
+    UPLOAD_WORKERS,
     USE_TELE_ALERT,
+    VERDICT_BACKEND,
+    VIDEOLLAMA_VARIANT,
+    ZONES_FILE,
     alert_services,
 )
 from src.audio_warning import AudioWarningSystem
-from src.utils import frames_to_base64, prepare_messages, save_analysis_frames_to_temp
-from src.videollama_detector import VideoLLamaFallDetector
+from src.backlog import WindowBacklog
+from src.cascade import build_cascade, format_trace, motion_gate_score, verdict_score
+from src.frame_cache import make_frame_reader
+from src.geometric_detector import GeometricFallDetector, format_geometric_verdict
+from src.jobs import STATUS_LABELS, JobCancelled, JobQueue, current_job_id
+from src.model_manager import create_videollama_manager
+from src.motion_features import MotionFeatureExtractor, summarize_motion
+from src.parallel_decode import ParallelDecoder
+from src.person_detector import PersonDetector, PersonPrefilter
+from src.result_cache import ResultCache, cache_key
+from src.roi import RoiCropper, crop_to_roi, parse_zones
+from src.streams import DualResolutionStreams
+from src.temporal import TemporalFallFilter, offset_frames
+from src.timeline import TimelineAnalyzer, fall_events, format_timeline, locate_fall
+from src.tracker import PersonTracker
+from src.utils import (
+    JPEG_QUALITY,
+    PROMPT_VERSION,
+    file_sha256,
+    frames_to_base64,
+    is_verdict,
+    prepare_messages,
+    save_analysis_frames_to_temp,
+)
+from src.video_reader import probe_video, sample_indices
+from src.zones import CameraZones, load_camera_zones
 from loguru import logger
 
 class FallDetectionWebUI:
@@ -30,19 +111,43 @@ class FallDetectionWebUI:
         self.camera = None
         self.is_running = False
         self.analysis_interval = 5
-        self.frame_buffer = []
+        self.frame_buffer = []  # analysis stream (ANALYSIS_WIDTH wide)
+        self.streams = DualResolutionStreams(ANALYSIS_WIDTH, EVIDENCE_FPS)
         self.last_analysis_time = 0
         self.fall_detected_cooldown = 30
         self.last_fall_alert = 0
+        self.last_fall_alerts = {}  # cooldown per tracked person (None = whole-window verdicts)
         self.frame_count = 0
         self.analysis_count = 0
         self.start_time = time.time()
 
-        # Detection method: "openai" or "videollama3"
+        # Detection method: a key of self.detection_methods (registered at the end of __init__)
         self.detection_method = "openai"
-
-        # Initialize VideoLLaMA3 detector
-        self.videollama_detector = VideoLLamaFallDetector()
+        self.person_detector = PersonDetector(PERSON_DETECTOR_PROTOTXT, PERSON_DETECTOR_MODEL)
+        # Live windows and uploads get separate pre-filters: the "person just left" memory only makes sense within one live stream
+        self.person_prefilter = PersonPrefilter(self.person_detector)
+        self.upload_prefilter = PersonPrefilter(self.person_detector, memory_seconds=None)
+        self.prefilter_escalate_method = PREFILTER_ESCALATE_METHOD
+
+        # Geometric detector sees every frame; with GEOMETRIC_GATE it also skips model calls for quiet windows
+        self.geometric_detector = GeometricFallDetector(drop_velocity=GEOMETRIC_DROP_VELOCITY, floor_seconds=GEOMETRIC_FLOOR_SECONDS)
+        self.geometric_gate = GEOMETRIC_GATE
+        self.last_geometric_fall = None
+
+        # Foreground blobs of the geometric detector are tracked per person, so falls can be attributed to someone
+        self.person_tracker: Optional[PersonTracker] = None
+        if PERSON_TRACKING:
+            self.person_tracker = PersonTracker(drop_velocity=GEOMETRIC_DROP_VELOCITY, floor_seconds=GEOMETRIC_FLOOR_SECONDS)
+        self.track_confirm_method = TRACK_CONFIRM_METHOD
+
+        # Optical-flow motion features are computed as frames arrive and stored with each buffered frame
+        self.motion_extractor = MotionFeatureExtractor(MOTION_FLOW_EVERY, MOTION_FLOW_WIDTH)
+
+        # VideoLLaMA3 is loaded lazily on first use and evicted after MODEL_IDLE_TIMEOUT seconds idle
+        self.model_manager = create_videollama_manager()
+        self.model_manager.add_listener(self.on_model_event)
+        self.videollama_variant = VIDEOLLAMA_VARIANT
+        self.verdict_backend = VERDICT_BACKEND
 
         # Initialize audio warning system
         self.audio_warning = AudioWarningSystem()
@@ -51,6 +156,7 @@ class FallDetectionWebUI:
         self.current_frame = None
         self.alert_history = []
         self.system_logs = []
+        self.log_lock = threading.Lock()  # the live loop and concurrent upload jobs all log
         self.status_data = {}
         self.ui_update_queue = queue.Queue()
 
@@ -59,12 +165,64 @@ class FallDetectionWebUI:
         self.last_analysis_result = "Chưa có phân tích"
 
         # Video upload processing
-        self.upload_processing = False
-        self.uploaded_video_path = None
+        # Uploads run as background jobs, UPLOAD_JOB_WORKERS at a time; each browser session polls its own job
+        self.upload_jobs = JobQueue(self.process_uploaded_video, UPLOAD_JOB_WORKERS)
+        self.result_cache = ResultCache(RESULT_CACHE_DIR) if RESULT_CACHE else None
+        # One decoder pool for every upload; it only kicks in for reads of many sampled frames
+        self.decoder = ParallelDecoder(DECODE_WORKERS, DECODE_CHUNK_SECONDS, DECODE_MIN_FRAMES)
+        self.frame_reader = make_frame_reader(FRAME_CACHE_DIR, self.decoder.iter_frames, FRAME_CACHE_MAX_GB)
 
         # Evidence storage
         self.evidence_gifs = []  # Store paths to saved GIF evidence
 
+        # Per-camera polygon zones (ignore / floor / bed), loaded when a camera is opened
+        self.zones: Optional[CameraZones] = None
+
+        # Crop frames to the people (or configured zones) before they are encoded for the model
+        self.roi_cropper = RoiCropper(self.person_detector, parse_zones(ROI_ZONES), ROI_MARGIN, ROI_MAX_SIDE) if ROI_CROP else None
+        # Uploads come from anywhere: crop to the people only, never to the camera's zones
+        self.upload_roi_cropper = RoiCropper(self.person_detector, None, ROI_MARGIN, ROI_MAX_SIDE) if ROI_CROP else None
+
+        # Detection cascade: cheap stages first, the VLMs only for the windows those cannot settle
+        self.cascade = build_cascade(
+            CASCADE_STAGES,
+            {
+                "motion": motion_gate_score,
+                "geometric": self.score_geometric,
+                "prefilter": self.score_prefilter,
+                "videollama3": lambda frames, live: verdict_score(self.analyze_frames_videollama3(frames)),
+                "openai": lambda frames, live: verdict_score(self.analyze_frames_openai(frames) if live else self.analyze_video_frames_openai(frames)),
+            },
+        )
+
+        # Live verdicts are confirmed over consecutive windows (with a quick re-check) before staff are alerted
+        self.temporal_filter = TemporalFallFilter(realert_seconds=TEMPORAL_REALERT_SECONDS) if TEMPORAL_FILTER else None
+
+        # Detection methods: name -> (live window analyzer, uploaded video analyzer)
+        # "prefilter" is the CPU person/posture check followed by PREFILTER_ESCALATE_METHOD,
+        # "geometric" alerts from the capture loop on every frame
+        self.detection_methods = {
+            "openai": (self.analyze_frames_openai, self.analyze_video_frames_openai),
+            "videollama3": (self.analyze_frames_videollama3, self.analyze_video_frames_videollama3),
+            "prefilter": (self.analyze_frames_prefilter, self.analyze_video_frames_prefilter),
+            "geometric": (self.analyze_frames_geometric, self.analyze_video_frames_geometric),
+            "cascade": (lambda frames: self.analyze_frames_cascade(frames, live=True), lambda frames: self.analyze_frames_cascade(frames, live=False)),
+        }
+
+        # Live windows the model backend could not analyze are kept on disk (not in RAM) and re-analyzed once it answers
+        self.backlog: Optional[WindowBacklog] = None
+        if BACKLOG_DIR:
+            self.backlog = WindowBacklog(
+                BACKLOG_DIR,
+                self.analyze_backlog_window,
+                self.handle_late_result,
+                BACKLOG_MAX_WINDOWS,
+                BACKLOG_DRAIN_PER_MINUTE,
+                BACKLOG_RETRY_SECONDS,
+                MAX_FRAMES,
+                BACKLOG_MAX_ATTEMPTS,
+            )
+
     def initialize_camera(self, camera_index=0):
         """Initialize camera capture"""
         try:
@@ -75,10 +233,14 @@ class FallDetectionWebUI:
             if not self.camera.isOpened():
                 raise Exception(f"Không thể mở camera {camera_index}")
 
-            # Set camera properties
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # Set camera properties; capture at high resolution for evidence, analysis uses a downscaled stream
+            if CAMERA_WIDTH and CAMERA_HEIGHT:
+                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
+            self.streams.clear()
+
+            self.set_camera_zones(camera_index)
 
             self.camera_status = "Hoạt động"
             self.add_log("✓ Camera đã được khởi tạo thành công", "success")
@@ -89,15 +251,30 @@ class FallDetectionWebUI:
             self.add_log(f"✗ Không thể khởi tạo camera: {e}", "error")
             return False
 
+    def set_camera_zones(self, camera_index):
+        """Load the camera's zones and hand them to every stage that uses them"""
+        self.zones = load_camera_zones(ZONES_FILE, camera_index)
+        self.geometric_detector.zones = self.zones
+        if self.person_tracker:
+            self.person_tracker.zones = self.zones
+        if self.roi_cropper:
+            self.roi_cropper.zones = parse_zones(ROI_ZONES) + (self.zones.roi_zones() if self.zones else [])
+        if self.zones:
+            self.add_log(f"🗺️ Đã tải vùng cho camera {camera_index}", "info")
+
     def add_log(self, message, log_type="info"):
-        """Add log message with timestamp"""
+        """Add log message with timestamp (tagged with the upload job it comes from, if any)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
+        job_id = current_job_id.get()
+        if job_id:
+            message = f"[{job_id}] {message}"
         logger.info(f"[{timestamp}] {log_type} {message}")
         log_entry = {"time": timestamp, "message": message, "type": log_type}
-        self.system_logs.append(log_entry)
-        # Keep only last 100 logs
-        if len(self.system_logs) > 100:
-            self.system_logs.pop(0)
+        with self.log_lock:
+            self.system_logs.append(log_entry)
+            # Keep only last 100 logs
+            if len(self.system_logs) > 100:
+                self.system_logs.pop(0)
 
     def capture_frames(self):
         """Continuously capture frames from camera"""
@@ -107,14 +284,27 @@ class FallDetectionWebUI:
                 self.add_log("⚠ Không thể chụp khung hình", "warning")
                 continue
 
-            # Add timestamp to frame
+            # Split into the small analysis stream and the full-resolution evidence stream
+            current_time = time.time()
+            analysis_frame = self.streams.push(frame, current_time)
+
+            # Ignore zones are blacked out first: they must neither trigger analysis nor be sent to a model
+            if self.zones:
+                analysis_frame = self.zones.apply(analysis_frame)
+
+            # Feed the per-frame detectors before the overlay, the changing clock text would show up as motion
+            self.geometric_detector.update(analysis_frame, current_time)
+            if self.person_tracker and self.geometric_detector.frame_size:
+                self.person_tracker.update(self.geometric_detector.blobs, current_time, self.geometric_detector.frame_size)
+            motion = self.motion_extractor.update(analysis_frame, current_time)
+
+            # Add timestamp to the full-resolution frame (evidence and preview)
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cv2.putText(frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
             # Store frame with timestamp
-            current_time = time.time()
             self.frame_count += 1
-            self.frame_buffer.append({"frame": frame, "timestamp": current_time})
+            self.frame_buffer.append({"frame": analysis_frame, "timestamp": current_time, "motion": motion})
 
             # Keep only recent frames (last 10 seconds)
             self.frame_buffer = [f for f in self.frame_buffer if current_time - f["timestamp"] < 10]
@@ -122,8 +312,10 @@ class FallDetectionWebUI:
             # Update current frame for UI
             self.current_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-            # Check for analysis trigger
-            if current_time - self.last_analysis_time >= self.analysis_interval:
+            # The geometric method decides on every frame; the others analyze the buffer periodically
+            if self.detection_method == "geometric":
+                self.check_geometric_fall()
+            elif current_time - self.last_analysis_time >= self.analysis_interval:
                 threading.Thread(target=self.analyze_frames, daemon=True).start()
                 self.last_analysis_time = current_time
 
@@ -145,27 +337,135 @@ class FallDetectionWebUI:
             if SAVE_ANALYSIS_FRAMES:
                 threading.Thread(target=save_analysis_frames_to_temp, args=([recent_frames])).start()
 
-            # Choose analysis method
-            if self.detection_method == "videollama3":
-                analysis_result = self.analyze_frames_videollama3(recent_frames)
-            else:  # Default to OpenAI
-                analysis_result = self.analyze_frames_openai(recent_frames)
+            # Choose analysis method (default to OpenAI)
+            gate_reason = self.geometric_gate_reason(self.geometric_detector.evaluate())
+            analyze, _ = self.detection_methods.get(self.detection_method, self.detection_methods["openai"])
+            analysis_result = gate_reason or analyze(recent_frames)
 
             if analysis_result:
                 self.last_analysis_result = analysis_result
                 self.add_log(f"📊 Kết quả phân tích: {analysis_result}", "info")
-
-                # Check for fall detection (Vietnamese)
-                if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+            # No answer or an error string (model not loaded, API failure): keep the window for a later try
+            if (
+                not is_verdict(analysis_result)
+                and self.backlog
+                and self.backlog.spill(recent_frames, "Live Camera", self.detection_method, analysis_result or "mô hình không trả lời")
+            ):
+                self.add_log(f"📦 Không phân tích được, đã lưu cửa sổ để phân tích lại ({self.backlog.get_stats_text()})", "warning")
+
+            # Check for fall detection (Vietnamese), confirmed over time when the temporal filter is on
+            is_fall = bool(analysis_result) and analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ")
+            if self.temporal_filter is None:
+                if is_fall:
                     self.handle_fall_detection(analysis_result)
+                return
+
+            recheck = (lambda: self.recheck_window(recent_frames, analyze)) if TEMPORAL_RECHECK else None
+            decision = self.temporal_filter.update(verdict_score(analysis_result)[0], time.time(), recheck)
+            if decision == "alert":
+                self.handle_fall_detection(analysis_result)
+            elif is_fall and decision == "suspect":
+                self.add_log("🤔 Nghi ngờ té ngã, chờ cửa sổ tiếp theo để xác nhận", "warning")
+            elif is_fall and decision == "suppressed":
+                self.add_log("🔕 Vẫn là sự kiện té ngã đã cảnh báo, không gửi lại", "info")
 
         except Exception as e:
             self.add_log(f"❌ Lỗi phân tích: {e}", "error")
 
+    def check_geometric_fall(self):
+        """Alert as soon as the geometric detector sees a fall, once per fall event"""
+        if self.person_tracker:
+            for track, result in self.person_tracker.new_falls(time.time(), self.fall_detected_cooldown):
+                self.analysis_count += 1
+                analysis_result = f"{format_geometric_verdict(result)} - người #{track.track_id}"
+                self.last_analysis_result = analysis_result
+                self.add_log(f"📐 Bộ dò hình học: {analysis_result}", "info")
+                threading.Thread(target=self.confirm_track_fall, args=(track, analysis_result), daemon=True).start()
+            return
+
+        result = self.geometric_detector.evaluate()
+        if not result["fall"] or result["fall_time"] == self.last_geometric_fall:
+            return
+
+        self.last_geometric_fall = result["fall_time"]
+        self.analysis_count += 1
+        analysis_result = format_geometric_verdict(result)
+        self.last_analysis_result = analysis_result
+        self.add_log(f"📐 Bộ dò hình học: {analysis_result}", "info")
+        threading.Thread(target=self.handle_fall_detection, args=(analysis_result,), daemon=True).start()
+
+    def confirm_track_fall(self, track, analysis_result):
+        """Alert for one person, optionally after the confirm method agrees on frames cropped to that person"""
+        analyze = self.detection_methods.get(self.track_confirm_method, (None, None))[0]
+        frames = self.frame_buffer.copy()
+        if analyze is not None and frames:
+            # Track positions are fractions of the frame, so the box is taken in the size of the frames being cropped
+            height, width = frames[0]["frame"].shape[:2]
+            roi = track.roi(width, height)
+            cropped = [{**f, "frame": crop_to_roi(f["frame"], roi)} for f in frames]
+            self.add_log(f"🔎 Xác nhận té ngã của người #{track.track_id} bằng {self.track_confirm_method.upper()}...", "info")
+            score, verdict = verdict_score(analyze(cropped))
+            if score is not None and score < 0.5:
+                self.add_log(f"✋ {self.track_confirm_method.upper()} không xác nhận té ngã của người #{track.track_id}: {verdict}", "info")
+                return
+            if verdict:
+                analysis_result = f"{verdict} - người #{track.track_id}"
+
+        self.handle_fall_detection(analysis_result, track_id=track.track_id)
+
+    def geometric_gate_reason(self, result):
+        """No-fall verdict when the geometric gate is on and the window is too quiet for a model call, else None"""
+        if not self.geometric_gate or self.detection_method in ["geometric", "cascade"] or result["score"] >= GEOMETRIC_GATE_THRESHOLD:
+            return None
+        return f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: Không có chuyển động đáng ngờ, bỏ qua mô hình (điểm hình học {result['score']:.2f})"
+
+    def analyze_backlog_window(self, frames, meta):
+        """Re-analyze a spilled window's stored frames with the upload analyzer of the method active when it was captured"""
+        _, analyze = self.detection_methods.get(meta["method"], self.detection_methods["openai"])
+        return analyze(frames)
+
+    def handle_late_result(self, meta, analysis_result, frames):
+        """Verdict for a window analyzed after the backend came back; falls are alerted and flagged as late"""
+        captured = datetime.fromtimestamp(meta["captured_at"]).strftime("%H:%M:%S")
+        self.add_log(f"⏰ Kết quả trễ cho cửa sổ lúc {captured}: {analysis_result}", "info")
+        if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+            self.handle_fall_detection(analysis_result, late=meta, evidence_frames=frames)
+
+    def recheck_window(self, frames, analyze):
+        """Quick second look at a suspicious window: same method, the frames the first pass skipped"""
+        self.add_log("🔁 Kiểm tra lại cửa sổ đáng ngờ với các khung hình khác...", "info")
+        score, verdict = verdict_score(analyze(offset_frames(frames, MAX_FRAMES)))
+        if verdict:
+            self.add_log(f"🔁 Kết quả kiểm tra lại: {verdict}", "info")
+        return score
+
+    def analyze_frames_geometric(self, recent_frames):
+        """Verdict of the live geometric detector (alerts themselves are raised from the capture loop)"""
+        return format_geometric_verdict(self.geometric_detector.evaluate())
+
+    def analyze_frames_cascade(self, frames, live=True):
+        """Run the detection cascade and log the score and latency of every stage it needed"""
+        analysis_result, trace = self.cascade.run(frames, live)
+        self.add_log(f"🪜 Cascade: {format_trace(trace)}", "info")
+        return analysis_result
+
+    def score_geometric(self, frames, live):
+        """Cascade scorer: the live detector already saw every frame, uploads are analyzed from scratch"""
+        result = self.geometric_detector.evaluate() if live else self.geometric_detector.analyze(frames)
+        return result["score"], format_geometric_verdict(result)
+
+    def score_prefilter(self, frames, live):
+        """Cascade scorer: 1 when the person pre-filter would escalate, 0 otherwise"""
+        escalate, reason, _ = self.person_prefilter.check(self.person_frames(frames)) if live else self.upload_prefilter.check(frames)
+        if escalate:
+            self.add_log(f"⬆️ Bộ lọc CPU chuyển tiếp: {reason}", "info")
+            return 1.0, None
+        return 0.0, f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: {reason} (bộ lọc CPU)"
+
     def analyze_frames_openai(self, recent_frames):
         """Analyze frames using VLM SmolVLM"""
         try:
-            base64_frames = frames_to_base64(recent_frames)
+            base64_frames = self.encode_frames(recent_frames)
             if not base64_frames:
                 return None
 
@@ -177,23 +477,38 @@ class FallDetectionWebUI:
             self.add_log(f"❌ Lỗi OpenAI API: {e}", "error")
             return None
 
+    def encode_frames(self, frames, max_frames=None, live=True):
+        """Base64-encode frames for the model, cropped to the ROI when enabled (live: camera zones apply)"""
+        max_frames = max_frames or MAX_FRAMES
+        roi_cropper = self.roi_cropper if live else self.upload_roi_cropper
+        if not roi_cropper:
+            return frames_to_base64(frames, max_frames)
+
+        roi = roi_cropper.find_roi(frames, self.person_frames(frames) if live else None)
+        return frames_to_base64(frames, max_frames, roi=roi, max_side=roi_cropper.max_side)
+
+    def person_frames(self, frames):
+        """Full-resolution evidence frames of a live window (ignore zones masked) for the person detector stages"""
+        if not frames:
+            return frames
+        return self.streams.detection_frames(frames[0]["timestamp"], self.zones.apply if self.zones else None) or frames
+
     def analyze_frames_videollama3(self, recent_frames):
         """Analyze frames using local VideoLLaMA3 model + OpenAI Vietnamese analysis"""
         try:
-            if not self.videollama_detector.is_loaded:
-                self.add_log("⚠️ VideoLLaMA3 model chưa được tải", "warning")
-                return None
-
-            # Check if OpenAI is available for Vietnamese analysis
+            # Check if OpenAI is available for Vietnamese analysis (not needed for the local verdict backend)
+            verdict_backend = self.verdict_backend
             openai_available = bool(os.environ.get("OPENAI_API_KEY"))
-            if not openai_available:
+            if verdict_backend == "openai" and not openai_available:
                 self.add_log("⚠️ OpenAI API key không có, không thể phân tích tiếng Việt", "warning")
                 return "LỖI_CẤU_HÌNH: Thiếu OpenAI API key cho phân tích tiếng Việt"
 
-            self.add_log("🔄 Bắt đầu quá trình phân tích 2 bước: VideoLLaMA3 → OpenAI", "info")
+            self.add_log(f"🔄 Bắt đầu quá trình phân tích 2 bước: VideoLLaMA3 → {verdict_backend.upper()}", "info")
 
-            # Call the combined analysis method
-            result = self.videollama_detector.analyze_frames(recent_frames)
+            # Call the combined analysis method (loads the model on first use)
+            with self.model_manager.acquire(self.videollama_variant) as detector:
+                detector.verdict_backend = verdict_backend
+                result = detector.analyze_frames(recent_frames, queue_depth=self.model_manager.in_flight() - 1)
 
             if result.startswith("LỖI_PHÂN_TÍCH_KẾT_HỢP"):
                 self.add_log(f"❌ Lỗi phân tích kết hợp: {result}", "error")
@@ -210,27 +525,60 @@ class FallDetectionWebUI:
             self.add_log(f"❌ Lỗi VideoLLaMA3 + OpenAI: {e}", "error")
             return None
 
-    def handle_fall_detection(self, analysis_result):
-        """Handle detected fall - send alerts and play audio warning"""
+    def analyze_frames_prefilter(self, recent_frames):
+        """Run the CPU person/posture check and escalate only suspicious windows to the VLM"""
+        try:
+            escalate, reason, _ = self.person_prefilter.check(self.person_frames(recent_frames))
+        except Exception as e:
+            self.add_log(f"❌ Lỗi bộ lọc người: {e}", "error")
+            escalate, reason = True, "Bộ lọc lỗi"
+
+        if not escalate:
+            return f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: {reason} (bộ lọc CPU)"
+
+        self.add_log(f"⬆️ Bộ lọc CPU chuyển tiếp tới {self.prefilter_escalate_method.upper()}: {reason}", "info")
+        if self.prefilter_escalate_method == "videollama3":
+            return self.analyze_frames_videollama3(recent_frames)
+        return self.analyze_frames_openai(recent_frames)
+
+    def handle_fall_detection(self, analysis_result, track_id=None, late=None, evidence_frames=None):
+        """Handle detected fall - send alerts and play audio warning
+
+        late is the backlog metadata of a window analyzed after an outage: the alert is dated and
+        rate-limited by its capture time, and labelled as a late result everywhere it is shown.
+        """
         current_time = time.time()
+        alert_time = late["captured_at"] if late else current_time
+        cooldown_key = ("late", track_id) if late else track_id
 
-        # Check cooldown to prevent spam
-        if current_time - self.last_fall_alert < self.fall_detected_cooldown:
+        # Check cooldown to prevent spam (kept per person, so a second person falling still alerts)
+        if abs(alert_time - self.last_fall_alerts.get(cooldown_key, 0)) < self.fall_detected_cooldown:
             self.add_log("⏳ Phát hiện té ngã nhưng vẫn trong thời gian chờ", "warning")
             return
 
-        self.last_fall_alert = current_time
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.last_fall_alerts[cooldown_key] = alert_time
+        if not late:
+            self.last_fall_alert = current_time
+        timestamp = datetime.fromtimestamp(alert_time).strftime("%Y-%m-%d %H:%M:%S")
+        if late:
+            analysis_result = f"⏰ Kết quả trễ (phân tích lúc {datetime.now().strftime('%H:%M:%S')}): {analysis_result}"
+
+        # Evidence comes from the full-resolution stream (late results bring the frames they were analyzed on)
+        evidence_frames = evidence_frames or self.streams.evidence_frames() or self.frame_buffer
 
         # Add to alert history
         alert_data = {
             "timestamp": timestamp,
             "details": analysis_result,
-            "frame_count": len(self.frame_buffer),
+            "frame_count": len(evidence_frames) if late else len(self.frame_buffer),
             "evidence_saved": SAVE_ANALYSIS_FRAMES,
             "source": "Live Camera",
-            "detection_method": self.detection_method.upper(),
+            "detection_method": (late["method"] if late else self.detection_method).upper(),
+            "track_id": track_id,
+            "late": bool(late),
         }
+        if late:
+            alert_data["analyzed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.alert_history.append(alert_data)
 
         # Log the alert
@@ -242,11 +590,11 @@ class FallDetectionWebUI:
 
         # Save evidence as GIF
         try:
-            gif_folder = self.save_evidence_gif(self.frame_buffer, timestamp, "Live Camera")
+            gif_folder = self.save_evidence_gif(evidence_frames, timestamp, "Live Camera")
             if gif_folder:
                 alert_data["gif_evidence"] = gif_folder
                 self.evidence_gifs.append(
-                    {"path": gif_folder, "timestamp": timestamp, "source": "Live Camera", "details": analysis_result, "detection_method": self.detection_method.upper()}
+                    {"path": gif_folder, "timestamp": timestamp, "source": "Live Camera", "details": analysis_result, "detection_method": alert_data["detection_method"]}
                 )
                 self.add_log(f"💾 Đã lưu bằng chứng GIF: {os.path.basename(gif_folder)}", "success")
         except Exception as e:
@@ -254,14 +602,14 @@ class FallDetectionWebUI:
 
         # Send Telegram notification only if enabled
         if TELEGRAM_BOT and USE_TELE_ALERT:
-            asyncio.create_task(alert_services.send_telegram_alert(analysis_result, timestamp, self.frame_buffer))
+            asyncio.create_task(alert_services.send_telegram_alert(analysis_result, timestamp, evidence_frames))
             self.add_log("📱 Thông báo Telegram đã gửi", "success")
         else:
             self.add_log("ℹ Bỏ qua thông báo Telegram (đã tắt hoặc chưa cấu hình)", "info")
 
         # Save current frame as evidence (original format)
-        if self.frame_buffer:
-            threading.Thread(target=save_analysis_frames_to_temp, args=([self.frame_buffer])).start()
+        if evidence_frames:
+            threading.Thread(target=save_analysis_frames_to_temp, args=([evidence_frames])).start()
 
     def start_detection(self, camera_index):
         """Start the fall detection system"""
@@ -310,7 +658,7 @@ class FallDetectionWebUI:
         uptime = time.strftime("%H:%M:%S", time.gmtime(time.time() - self.start_time))
 
         # Get VideoLLaMA3 status
-        llama_status = self.videollama_detector.get_model_status()
+        model_status = self.model_manager.get_status()
         audio_status = self.audio_warning.get_status()
 
         # Check OpenAI availability for VideoLLaMA3 method
@@ -321,7 +669,9 @@ class FallDetectionWebUI:
 
 🎥 **Camera:** {self.camera_status}
 
-🤖 **Phương thức phát hiện:** {"SmolVLM" if self.detection_method == "openai" else "VideoLLaMA3 + OpenAI"}
+🤖 **Phương thức phát hiện:** {self.get_detection_method_label()}
+
+🧠 **VideoLLaMA3:** {"Đã tải" if self.model_manager.is_loaded(self.videollama_variant) else "Chưa tải"} ({model_status["memory_loaded_gb"]:.1f}/{model_status["memory_budget_gb"]:.1f} GB)
 
 🔍 **Lần phân tích:** {self.analysis_count}
 
@@ -339,11 +689,45 @@ class FallDetectionWebUI:
 
 🔊 **Audio Warning:** {'✅ Enabled' if audio_status['enabled'] else '❌ Disabled'} ({audio_status['tts_method']})
 
+🧍 **Bộ lọc CPU:** {self.person_prefilter.get_stats_text()}
+
+⏱️ **Xác nhận theo thời gian:** {self.temporal_filter.get_stats_text() if self.temporal_filter else "Tắt"}
+
+🪜 **Cascade:** {self.cascade.get_stats_text()}
+
+👥 **Theo dõi người:** {self.person_tracker.get_stats_text() if self.person_tracker else "Tắt"}
+
+🌊 **Chuyển động:** {self.get_motion_text()}
+
+📐 **Bộ dò hình học:** điểm {self.geometric_detector.evaluate()["score"]:.2f}{" (cổng bật)" if self.geometric_gate else ""}
+
+📁 **Hàng đợi video:** {self.upload_jobs.get_status_text()}
+
+📦 **Cửa sổ chờ phân tích lại:** {self.backlog.get_stats_text() if self.backlog else "Tắt"}
+
 📋 **Kết quả phân tích gần nhất:**
 {self.last_analysis_result}
         """
         return status_text
 
+    def get_motion_text(self):
+        """Motion summary of the current buffer from the precomputed optical-flow features"""
+        summary = summarize_motion(self.frame_buffer)
+        if not summary:
+            return "Chưa có dữ liệu"
+        return f"vùng chuyển động {summary['mean_motion_area']:.0%}, tốc độ rơi tối đa {summary['max_downward_velocity']:.2f} chiều cao khung/s"
+
+    def get_detection_method_label(self):
+        """Human readable name of the current detection method"""
+        labels = {
+            "openai": "SmolVLM",
+            "videollama3": f"VideoLLaMA3 + {self.verdict_backend.upper()}",
+            "prefilter": f"Bộ lọc CPU → {self.prefilter_escalate_method.upper()}",
+            "geometric": "Bộ dò hình học (CPU)",
+            "cascade": f"Cascade ({' → '.join(stage.name for stage in self.cascade.stages)})",
+        }
+        return labels.get(self.detection_method, self.detection_method)
+
     def get_logs_display(self):
         """Get formatted logs for display"""
         if not self.system_logs:
@@ -366,7 +750,7 @@ class FallDetectionWebUI:
         for i, alert in enumerate(reversed(self.alert_history[-10:])):  # Show last 10 alerts
             alert_text += f"""
 **Cảnh báo #{len(self.alert_history) - i}**
-🕐 Thời gian: {alert['timestamp']}
+🕐 Thời gian: {alert['timestamp']}{f" (⏰ kết quả trễ, phân tích lúc {alert['analyzed_at']})" if alert.get('late') else ""}
 📝 Chi tiết: {alert['details']}
 📊 Frames: {alert['frame_count']}
 💾 Bằng chứng: {'Đã lưu' if alert['evidence_saved'] else 'Không lưu'}
@@ -375,65 +759,56 @@ class FallDetectionWebUI:
 
         return alert_text
 
-    def process_uploaded_video(self, video_path):
-        """Process uploaded video file for fall detection - analyze entire video as one piece"""
+    def process_uploaded_video(self, video_path, progress=None):
+        """Process uploaded video file for fall detection - as one piece, or as a timeline of windows when it is long"""
         if not video_path:
             return "❌ Không có video được upload!", "Vui lòng chọn file video"
 
-        if self.upload_processing:
-            return "❌ Đang xử lý video khác!", "Vui lòng chờ hoàn thành"
-
-        self.upload_processing = True
-        self.uploaded_video_path = video_path
+        self.set_upload_progress(0, progress)
 
         try:
-            self.add_log(f"📁 Bắt đầu phân tích toàn bộ video: {os.path.basename(video_path)}", "info")
-
-            # Open video file
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                raise Exception("Không thể mở file video")
-
-            # Get video properties
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            duration = total_frames / fps if fps > 0 else 0
+            # Same content with the same settings: answer from the cache without decoding anything
+            result_key = self.upload_cache_key(video_path)
+            cached = self.result_cache.get(result_key) if result_key and self.result_cache else None
+            if cached:
+                self.set_upload_progress(100, progress)
+                self.last_analysis_result = cached["verdict"] or self.last_analysis_result
+                self.add_log(f"⚡ Dùng kết quả đã lưu cho {os.path.basename(video_path)} (cùng nội dung và cấu hình)", "success")
+                return cached["completion_msg"], f"{cached['video_info']}\n\n⚡ Kết quả từ bộ nhớ đệm"
+
+            info = probe_video(video_path)
+            total_frames, fps, duration = info["total_frames"], info["fps"], info["duration"]
 
             self.add_log(f"📊 Video info: {total_frames} frames, {fps:.1f} FPS, {duration:.1f}s", "info")
 
-            # Read all frames for complete analysis
-            frame_buffer = []
-            frame_count = 0
-
-            # Sample frames to avoid memory issues (max 60 frames for analysis)
-            sample_interval = max(1, total_frames // 60) if total_frames > 60 else 1
+            if UPLOAD_TIMELINE and duration > UPLOAD_WINDOW_SECONDS:
+                return self.process_uploaded_video_timeline(video_path, info, progress, result_key)
 
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                # frame_count += 1
-                # current_time = frame_count / fps if fps > 0 else frame_count * 0.033
-
-                # # Sample frames at intervals to keep memory usage reasonable
-                # if frame_count % sample_interval == 0:
-                current_time = frame_count / fps if fps > 0 else frame_count * 0.033
-                frame_buffer.append({"frame": frame, "timestamp": current_time})
-
-                # Update progress
+            self.add_log(f"📁 Bắt đầu phân tích toàn bộ video: {os.path.basename(video_path)}", "info")
 
-            cap.release()
+            # Seek to the sampled frames only; the rest of the video is never decoded
+            frame_buffer = []
+            expected = max(1, len(sample_indices(total_frames, fps, UPLOAD_SAMPLE_FPS, UPLOAD_MAX_FRAMES)))
+            motion_extractor = MotionFeatureExtractor(1, MOTION_FLOW_WIDTH)  # samples are already sparse, flow on each
+            for sample in self.frame_reader(video_path, UPLOAD_SAMPLE_FPS, UPLOAD_MAX_FRAMES, max_width=UPLOAD_MAX_WIDTH):
+                sample["motion"] = motion_extractor.update(sample["frame"], sample["timestamp"])
+                frame_buffer.append(sample)
+                # Reading is the first half of the work, the model call the second
+                self.set_upload_progress(50 * min(len(frame_buffer), expected) // expected, progress)
 
             if not frame_buffer:
                 raise Exception("Không thể đọc frame nào từ video")
 
+            frame_count = total_frames or frame_buffer[-1]["index"] + 1
+            duration = duration or frame_buffer[-1]["timestamp"]
             self.add_log(f"📊 Đã sample {len(frame_buffer)} frames từ {frame_count} frames tổng", "info")
 
             # Analyze the entire video as one piece
             self.add_log("🔍 Bắt đầu phân tích toàn bộ video...", "info")
 
             analysis_result = self.analyze_video_frames(frame_buffer, 1, video_path)
+            # A job cancelled during the model call stops here, before it can raise an alert
+            self.set_upload_progress(90, progress)
 
             # Display result prominently
             result_summary = ""
@@ -442,8 +817,9 @@ class FallDetectionWebUI:
                 self.add_log(f"📊 Kết quả phân tích: {analysis_result}", "info")
 
                 # Check for fall detection
-                if "PHÁT_HIỆN_TÉ_NGÃ" in analysis_result:
-                    self.handle_video_fall_detection(analysis_result, frame_buffer, duration / 2, video_path)
+                if analysis_result.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+                    fall_time = locate_fall(frame_buffer, self.geometric_detector)
+                    self.handle_video_fall_detection(analysis_result, frame_buffer, fall_time, video_path)
                     result_summary = f"🚨 TÉ NGÃ ĐƯỢC PHÁT HIỆN!\n{analysis_result}"
                 elif "KHÔNG_PHÁT_HIỆN_TÉ_NGÃ" in analysis_result:
                     result_summary = f"✅ KHÔNG CÓ TÉ NGÃ\n{analysis_result}"
@@ -452,7 +828,7 @@ class FallDetectionWebUI:
             else:
                 result_summary = "❌ Không thể phân tích video"
 
-            self.upload_processing = False
+            self.set_upload_progress(100, progress)
 
             completion_msg = f"✅ Hoàn thành phân tích video!\nFrames gốc: {frame_count}\nFrames phân tích: {len(frame_buffer)}"
             self.add_log(completion_msg, "success")
@@ -464,14 +840,115 @@ class FallDetectionWebUI:
 
 {result_summary}"""
 
+            # Only real verdicts are cached; an error string from a temporary outage must not become the stored answer
+            if result_key and self.result_cache and is_verdict(analysis_result):
+                result = {"verdict": analysis_result, "timeline": None, "completion_msg": completion_msg, "video_info": video_info}
+                self.result_cache.put(result_key, result, frame_buffer)
+
             return completion_msg, video_info
 
+        except JobCancelled:
+            self.add_log(f"🛑 Đã hủy phân tích video: {os.path.basename(video_path)}", "warning")
+            raise
         except Exception as e:
-            self.upload_processing = False
             error_msg = f"❌ Lỗi xử lý video: {e}"
             self.add_log(error_msg, "error")
             return error_msg, f"Xử lý thất bại: {str(e)}"
 
+    def process_uploaded_video_timeline(self, video_path, info, progress=None, result_key=None):
+        """Analyze a long upload as overlapping windows in parallel and report a timeline of verdicts"""
+        duration = info["duration"]
+        self.add_log(f"📁 Phân tích video theo cửa sổ {UPLOAD_WINDOW_SECONDS:.0f}s ({UPLOAD_WORKERS} luồng): {os.path.basename(video_path)}", "info")
+
+        analyzer = TimelineAnalyzer(
+            lambda frames: self.analyze_video_frames(frames, 1, video_path),
+            window_seconds=UPLOAD_WINDOW_SECONDS,
+            overlap=UPLOAD_WINDOW_OVERLAP,
+            max_workers=UPLOAD_WORKERS,
+            sample_fps=UPLOAD_SAMPLE_FPS,
+            max_frames=UPLOAD_MAX_FRAMES,
+            max_width=UPLOAD_MAX_WIDTH,
+            motion_width=MOTION_FLOW_WIDTH,
+            geometric_detector=self.geometric_detector,
+            reader=self.frame_reader,
+        )
+        timeline = analyzer.run(video_path, duration, lambda done, total: self.set_upload_progress(100 * done // total, progress))
+        events = fall_events(timeline)
+        self.set_upload_progress(100, progress)
+
+        for event in events:
+            # Evidence from the window that first caught the event
+            window = next(e for e in timeline if e["fall"] and e["start"] == event["start"])
+            self.handle_video_fall_detection(event["verdict"], window["frames"], event["fall_time"], video_path)
+
+        failed = sum(1 for e in timeline if not is_verdict(e["verdict"]))
+        verdict = None
+        if events:
+            times = ", ".join(f"{event['fall_time']:.1f}s" for event in events)
+            result_summary = f"🚨 {len(events)} TÉ NGÃ ĐƯỢC PHÁT HIỆN tại {times}!"
+            verdict = events[0]["verdict"]
+        elif failed == len(timeline):
+            result_summary = "❌ Không thể phân tích video"
+        else:
+            result_summary = "✅ KHÔNG CÓ TÉ NGÃ"
+            verdict = next(e["verdict"] for e in timeline if is_verdict(e["verdict"]))
+        if verdict:
+            self.last_analysis_result = verdict
+
+        completion_msg = f"✅ Hoàn thành phân tích video!\nCửa sổ phân tích: {len(timeline)} ({failed} lỗi)\nSự kiện té ngã: {len(events)}"
+        self.add_log(completion_msg, "success")
+
+        video_info = f"""📹 Video: {os.path.basename(video_path)}
+⏱️ Thời lượng: {duration:.1f}s
+📊 Frames: {info["total_frames"]} ({len(timeline)} cửa sổ {UPLOAD_WINDOW_SECONDS:.0f}s)
+🤖 Phương thức: {self.detection_method.upper()}
+
+{result_summary}
+
+{format_timeline(timeline)}"""
+
+        # Only complete timelines are cached, so failed windows are retried next time
+        if result_key and self.result_cache and not failed:
+            result = {
+                "verdict": verdict,
+                "timeline": [{key: entry[key] for key in ("start", "end", "verdict", "fall", "fall_time")} for entry in timeline],
+                "completion_msg": completion_msg,
+                "video_info": video_info,
+            }
+            self.result_cache.put(result_key, result, [frame for entry in timeline if entry["frames"] for frame in entry["frames"]])
+
+        return completion_msg, video_info
+
+    def upload_cache_key(self, video_path):
+        """Result cache key of an upload: its content plus every setting that changes the result (None when caching is off)"""
+        if not self.result_cache:
+            return None
+        settings = {
+            "method": self.detection_method,
+            "videollama_variant": self.videollama_variant,
+            "verdict_backend": self.verdict_backend,
+            "cascade": CASCADE_STAGES,
+            "prefilter_escalate": self.prefilter_escalate_method,
+            "person_detector": [PERSON_DETECTOR_PROTOTXT, PERSON_DETECTOR_MODEL],
+            "geometric": [GEOMETRIC_DROP_VELOCITY, GEOMETRIC_FLOOR_SECONDS],
+            "motion_width": MOTION_FLOW_WIDTH,
+            "fall_probe": [FALL_PROBE_BACKEND, FALL_PROBE_WEIGHTS, FALL_PROBE_ONNX, FALL_PROBE_LOW, FALL_PROBE_HIGH],
+            "token_budget": [TOKEN_BUDGET_PRESET, TOKEN_CEILING],
+            "local_verdict_model": LOCAL_VERDICT_MODEL,
+            "sampling": [UPLOAD_SAMPLE_FPS, UPLOAD_MAX_FRAMES, UPLOAD_MAX_WIDTH],
+            "timeline": [UPLOAD_TIMELINE, UPLOAD_WINDOW_SECONDS, UPLOAD_WINDOW_OVERLAP],
+            "geometric_gate": [self.geometric_gate, GEOMETRIC_GATE_THRESHOLD],
+            "roi": [ROI_CROP, ROI_MARGIN, ROI_MAX_SIDE],
+            "jpeg_quality": JPEG_QUALITY,
+            "prompt_version": PROMPT_VERSION,
+        }
+        return cache_key([file_sha256(video_path)], settings)
+
+    def set_upload_progress(self, percent, progress=None):
+        """Report upload progress (0-100) to the job's progress callback, which also stops cancelled jobs"""
+        if progress is not None:
+            progress(percent / 100)
+
     def analyze_video_frames(self, frame_buffer, analysis_count, source_video):
         """Analyze frames from uploaded video"""
         if not frame_buffer:
@@ -480,20 +957,43 @@ class FallDetectionWebUI:
         try:
             self.add_log(f"🔍 Phân tích video hoàn chỉnh ({len(frame_buffer)} frames) - {self.detection_method.upper()}...", "info")
 
-            # Choose analysis method
-            if self.detection_method == "videollama3":
-                if not self.videollama_detector.is_loaded:
-                    self.add_log("⚠️ VideoLLaMA3 model chưa được tải, chuyển về OpenAI", "warning")
-                    return self.analyze_video_frames_openai(frame_buffer)
-                else:
-                    return self.videollama_detector.analyze_frames(frame_buffer)
-            else:
-                return self.analyze_video_frames_openai(frame_buffer)
+            # Choose analysis method (default to OpenAI)
+            if self.geometric_gate:
+                gate_reason = self.geometric_gate_reason(self.geometric_detector.analyze(frame_buffer))
+                if gate_reason:
+                    return gate_reason
+
+            _, analyze = self.detection_methods.get(self.detection_method, self.detection_methods["openai"])
+            return analyze(frame_buffer)
 
         except Exception as e:
             self.add_log(f"❌ Lỗi phân tích video frames: {e}", "error")
             return None
 
+    def analyze_video_frames_videollama3(self, frame_buffer):
+        """Analyze video frames with VideoLLaMA3, falling back to OpenAI when the model cannot be loaded"""
+        try:
+            with self.model_manager.acquire(self.videollama_variant) as detector:
+                detector.verdict_backend = self.verdict_backend
+                return detector.analyze_frames(frame_buffer, queue_depth=self.model_manager.in_flight() - 1)
+        except RuntimeError as e:
+            self.add_log(f"⚠️ Không thể tải VideoLLaMA3 ({e}), chuyển về OpenAI", "warning")
+            return self.analyze_video_frames_openai(frame_buffer)
+
+    def analyze_video_frames_prefilter(self, frame_buffer):
+        """Run the person pre-filter over the video, escalating suspicious ones to the configured VLM"""
+        escalate, reason, _ = self.upload_prefilter.check(frame_buffer)
+        if not escalate:
+            return f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: {reason} (bộ lọc CPU)"
+        self.add_log(f"⬆️ Bộ lọc CPU chuyển tiếp: {reason}", "info")
+        if self.prefilter_escalate_method == "videollama3":
+            return self.analyze_video_frames_videollama3(frame_buffer)
+        return self.analyze_video_frames_openai(frame_buffer)
+
+    def analyze_video_frames_geometric(self, frame_buffer):
+        """Run a fresh geometric detector over the whole video"""
+        return format_geometric_verdict(self.geometric_detector.analyze(frame_buffer))
+
     def analyze_video_frames_openai(self, frame_buffer):
         """Analyze video frames using OpenAI"""
         # Sample frames to avoid too many (max 8 frames for better analysis)
@@ -503,7 +1003,7 @@ class FallDetectionWebUI:
         else:
             sample_frames = frame_buffer
 
-        base64_frames = frames_to_base64(sample_frames)
+        base64_frames = self.encode_frames(sample_frames, live=False)
 
         if not base64_frames:
             return None
@@ -576,9 +1076,9 @@ class FallDetectionWebUI:
             evidence_dir = "evidence_gifs"
             os.makedirs(evidence_dir, exist_ok=True)
 
-            # Create timestamp folder (matching temp folder format)
+            # Create timestamp folder (matching temp folder format); the suffix keeps falls alerted within the same second apart
             safe_timestamp = timestamp.replace(":", "").replace(" ", "_").replace("-", "")
-            timestamp_folder = os.path.join(evidence_dir, f"fall_{safe_timestamp}")
+            timestamp_folder = os.path.join(evidence_dir, f"fall_{safe_timestamp}_{uuid.uuid4().hex[:6]}")
             os.makedirs(timestamp_folder, exist_ok=True)
 
             # Generate GIF filename
@@ -714,57 +1214,102 @@ Analysis Result:
 
         return details_text, gif_path
 
-    def get_upload_progress(self):
-        """Get current upload processing progress"""
-        if not self.upload_processing:
+    def get_upload_progress(self, job_id=None):
+        """Get an upload job's progress"""
+        job = self.upload_jobs.get(job_id)
+        if job is None:
             return "Sẵn sàng upload video", 0
-        return f"Đang xử lý video... {self.upload_progress}%", self.upload_progress
+        return job.describe(), int(job.progress * 100)
+
+    def submit_upload(self, video_path):
+        """Queue an uploaded video for analysis; returns the job ID (None when there is no video)"""
+        if not video_path:
+            return None
+        job = self.upload_jobs.submit(os.path.basename(video_path), video_path)
+        self.add_log(f"📥 Đã thêm video vào hàng đợi: {job.name} (job {job.job_id}, {self.upload_jobs.get_status_text()})", "info")
+        return job.job_id
+
+    def get_upload_job_display(self, job_id):
+        """Status and result text of an upload job, for polling"""
+        job = self.upload_jobs.get(job_id)
+        if job is None:
+            return "Chưa có video được upload...", "Chưa chọn video..."
+
+        queue_text = f"Hàng đợi: {self.upload_jobs.get_status_text()}"
+        if job.status == "done":
+            completion_msg, video_info = job.result
+            return f"{completion_msg}\n{queue_text}", video_info
+        if job.status == "failed":
+            return f"❌ Lỗi xử lý video: {job.error}\n{queue_text}", f"Xử lý thất bại: {job.error}"
+        return f"{job.describe()}\n{queue_text}", f"📹 Video: {job.name}\n{STATUS_LABELS[job.status]}"
+
+    def cancel_upload(self, job_id):
+        if self.upload_jobs.cancel(job_id):
+            self.add_log(f"🛑 Yêu cầu hủy job {job_id}", "warning")
+            return True
+        return False
 
     def set_detection_method(self, method):
-        """Set detection method (openai or videollama3)"""
-        if method in ["openai", "videollama3"]:
+        """Set detection method (any registered in self.detection_methods)"""
+        if method in self.detection_methods:
             self.detection_method = method
             self.add_log(f"🔧 Đã chuyển phương thức phát hiện: {method.upper()}", "info")
             return f"✅ Đã chuyển sang {method.upper()}"
         else:
             return "❌ Phương thức không hợp lệ"
 
+    def set_verdict_backend(self, backend):
+        """Set the VideoLLaMA3 second stage (openai or local)"""
+        if backend in ["openai", "local"]:
+            self.verdict_backend = backend
+            self.add_log(f"🔧 Đã chuyển bước phân tích tiếng Việt: {backend.upper()}", "info")
+            return f"✅ Bước 2 dùng {backend.upper()}"
+        else:
+            return "❌ Backend không hợp lệ"
+
+    def on_model_event(self, event, variant):
+        """Forward model manager load/evict events to the logs and UI"""
+        if event == "load":
+            self.add_log(f"✅ {variant} đã tải thành công", "success")
+            self.ui_update_queue.put(("model_loaded", f"✅ {variant} đã tải thành công"))
+        elif event == "load_failed":
+            self.add_log(f"❌ Không thể tải {variant}", "error")
+            self.ui_update_queue.put(("model_error", f"❌ Không thể tải {variant}"))
+        elif event == "evict":
+            self.add_log(f"🗑️ Đã gỡ {variant} khỏi bộ nhớ", "info")
+            self.ui_update_queue.put(("model_unloaded", f"✅ Đã gỡ {variant} khỏi bộ nhớ"))
+
     def load_videollama3_model(self):
-        """Load VideoLLaMA3 model"""
-        if self.videollama_detector.is_loaded:
+        """Preload VideoLLaMA3 model (otherwise it is loaded on first use)"""
+        if self.model_manager.is_loaded(self.videollama_variant):
             return "⚠️ Model đã được tải rồi"
 
-        self.add_log("🚀 Đang tải VideoLLaMA3 model...", "info")
+        self.add_log(f"🚀 Đang tải {self.videollama_variant}...", "info")
 
         def load_worker():
-            success = self.videollama_detector.load_model()
-            if success:
-                self.add_log("✅ VideoLLaMA3 model đã tải thành công", "success")
-                # Force UI update by updating the queue
-                self.ui_update_queue.put(("model_loaded", "✅ VideoLLaMA3 model đã tải thành công"))
-            else:
-                self.add_log("❌ Không thể tải VideoLLaMA3 model", "error")
-                self.ui_update_queue.put(("model_error", "❌ Không thể tải VideoLLaMA3 model"))
+            try:
+                self.model_manager.load(self.videollama_variant)
+            except Exception as e:
+                self.add_log(f"❌ Lỗi tải model: {e}", "error")
 
         threading.Thread(target=load_worker, daemon=True).start()
         return "⏳ Đang tải model, vui lòng chờ..."
 
     def unload_videollama3_model(self):
         """Unload VideoLLaMA3 model"""
-        if not self.videollama_detector.is_loaded:
+        if not self.model_manager.is_loaded(self.videollama_variant):
             return "⚠️ Model chưa được tải"
 
-        self.videollama_detector.unload_model()
-        self.add_log("🗑️ Đã gỡ VideoLLaMA3 model", "info")
-        self.ui_update_queue.put(("model_unloaded", "✅ Đã gỡ model khỏi bộ nhớ"))
+        if not self.model_manager.evict(self.videollama_variant):
+            return "⚠️ Model đang được sử dụng, thử lại sau"
         return "✅ Đã gỡ model khỏi bộ nhớ"
 
     def get_model_status_message(self):
         """Get current model status for UI display"""
-        if self.videollama_detector.is_loaded:
-            return "✅ VideoLLaMA3 model đã sẵn sàng"
+        if self.model_manager.is_loaded(self.videollama_variant):
+            return f"✅ {self.videollama_variant} đã sẵn sàng"
         else:
-            return "❌ VideoLLaMA3 model chưa được tải"
+            return f"💤 {self.videollama_variant} chưa được tải (sẽ tự tải khi cần)"
 
     def test_audio_warning(self):
         """Test audio warning system"""
@@ -857,9 +1402,12 @@ def create_interface():
                 with gr.Column(scale=2):
                     video_upload = gr.File(label="📹 Chọn File Video", file_types=["video"], type="filepath")
 
-                    upload_btn = gr.Button("🔍 Phân Tích Video", variant="primary", size="lg")
+                    with gr.Row():
+                        upload_btn = gr.Button("🔍 Phân Tích Video", variant="primary", size="lg")
+                        cancel_upload_btn = gr.Button("🛑 Hủy", variant="stop", size="lg")
 
-                    gr.Progress()
+                    # ID of this session's latest upload job
+                    upload_job = gr.State(None)
                     upload_status = gr.Textbox(label="📊 Trạng Thái Xử Lý", value="Chưa có video được upload...", interactive=False)
 
                 with gr.Column(scale=1):
@@ -870,9 +1418,10 @@ def create_interface():
             <div class="alert-box">
                 <h4>⚠️ Lưu Ý Quan Trọng</h4>
                 <ul>
-                    <li>Video sẽ được phân tích toàn bộ như một đoạn duy nhất</li>
-                    <li>Hệ thống sẽ sample tối đa 60 frames để phân tích (tránh quá tải bộ nhớ)</li>
-                    <li>Kết quả sẽ hiển thị ngay trong phần thông tin video</li>
+                    <li>Video ngắn được phân tích như một đoạn, video dài được chia thành các cửa sổ chồng lấn</li>
+                    <li>Chỉ các frame được sample mới được giải mã (tránh quá tải bộ nhớ)</li>
+                    <li>Nhiều video có thể được gửi cùng lúc; chúng được xử lý trong hàng đợi nền</li>
+                    <li>Trạng thái và kết quả tự động cập nhật trong phần thông tin video</li>
                     <li>GIF bằng chứng sẽ được tự động tạo khi phát hiện té ngã</li>
                     <li>Thời gian xử lý phụ thuộc vào độ dài video và phương thức phát hiện</li>
                 </ul>
@@ -937,10 +1486,23 @@ def create_interface():
                     gr.Markdown("### 🧠 Phương Thức Phát Hiện")
 
                     detection_method = gr.Radio(
-                        choices=[("VLM SmolVLM", "openai"), ("VideoLLaMA3 + OpenAI", "videollama3")],
+                        choices=[
+                            ("VLM SmolVLM", "openai"),
+                            ("VideoLLaMA3 + OpenAI", "videollama3"),
+                            ("Bộ lọc CPU → VLM", "prefilter"),
+                            ("Hình học (CPU)", "geometric"),
+                            ("Cascade", "cascade"),
+                        ],
                         value="openai",
                         label="Chọn phương thức phát hiện",
-                        info="SmolVLM: Trực tiếp phân tích. VideoLLaMA3: Mô tả video → OpenAI phân tích tiếng Việt",
+                        info="SmolVLM: Trực tiếp phân tích. VideoLLaMA3: Mô tả video → OpenAI phân tích tiếng Việt. Bộ lọc CPU: chỉ gửi VLM khi có người với tư thế đáng ngờ. Hình học: cảnh báo tức thì từ chuyển động rơi và nằm trên sàn. Cascade: các tầng rẻ trước, VLM chỉ cho cửa sổ chưa chắc chắn",
+                    )
+
+                    verdict_backend = gr.Radio(
+                        choices=[("OpenAI (online)", "openai"), ("Local (offline)", "local")],
+                        value=fall_system.verdict_backend,
+                        label="Bước 2 của VideoLLaMA3",
+                        info="OpenAI: gpt-4o-mini phân tích mô tả. Local: bộ phân loại từ khóa chạy offline",
                     )
 
                     method_output = gr.Textbox(label="📢 Trạng Thái Phương Thức", interactive=False)
@@ -971,7 +1533,7 @@ def create_interface():
                 <ul>
                     <li><strong>OpenAI:</strong> Cần API key và kết nối internet, tốc độ phân tích nhanh</li>
                     <li><strong>VideoLLaMA3:</strong> Phân tích 2 bước - VideoLLaMA3 mô tả video (offline) → OpenAI phân tích tiếng Việt (online)</li>
-                    <li><strong>Yêu cầu VideoLLaMA3:</strong> Cần cả VideoLLaMA3 model VÀ OpenAI API key để hoạt động</li>
+                    <li><strong>Yêu cầu VideoLLaMA3:</strong> Cần VideoLLaMA3 model; OpenAI API key chỉ cần khi bước 2 dùng OpenAI</li>
                     <li><strong>Audio:</strong> Cần cài đặt espeak-ng: <code>sudo apt-get install espeak-ng</code></li>
                     <li><strong>RAM:</strong> VideoLLaMA3 cần ~4-8GB VRAM để chạy mượt</li>
                 </ul>
@@ -1060,13 +1622,22 @@ def create_interface():
         # Video upload event handlers
         def process_video(video_file):
             if not video_file:
-                return "❌ Chưa chọn video!", "Vui lòng chọn file video"
+                return None, "❌ Chưa chọn video!", "Vui lòng chọn file video"
+
+            # Analysis runs in the background job queue; this session polls its job
+            job_id = fall_system.submit_upload(video_file)
+            status, info = fall_system.get_upload_job_display(job_id)
+            return job_id, status, info
 
-            # Process video in a separate thread to avoid blocking UI
-            def video_worker():
-                return fall_system.process_uploaded_video(video_file)
+        def poll_upload_job(job_id):
+            if not job_id:
+                return gr.update(), gr.update()
+            return fall_system.get_upload_job_display(job_id)
 
-            return video_worker()
+        def cancel_video(job_id):
+            if fall_system.cancel_upload(job_id):
+                return "🛑 Đang hủy phân tích..."
+            return "Không có job nào đang chạy để hủy"
 
         def refresh_evidence():
             display_text, evidence_choices, gif_paths = fall_system.get_evidence_gifs_display()
@@ -1097,7 +1668,9 @@ def create_interface():
             return details, gif_path
 
         # Bind new events
-        upload_btn.click(process_video, inputs=[video_upload], outputs=[upload_status, upload_info])
+        upload_btn.click(process_video, inputs=[video_upload], outputs=[upload_job, upload_status, upload_info])
+
+        cancel_upload_btn.click(cancel_video, inputs=[upload_job], outputs=[upload_status])
 
         refresh_evidence_btn.click(refresh_evidence, outputs=[evidence_summary, evidence_selector, evidence_details, evidence_gif_display])
 
@@ -1110,6 +1683,9 @@ def create_interface():
         def on_detection_method_change(method):
             return fall_system.set_detection_method(method)
 
+        def on_verdict_backend_change(backend):
+            return fall_system.set_verdict_backend(backend)
+
         def on_load_model():
             return fall_system.load_videollama3_model()
 
@@ -1128,6 +1704,8 @@ def create_interface():
         # Bind AI & Audio events
         detection_method.change(on_detection_method_change, inputs=[detection_method], outputs=[method_output])
 
+        verdict_backend.change(on_verdict_backend_change, inputs=[verdict_backend], outputs=[method_output])
+
         load_model_btn.click(on_load_model, outputs=[model_output])
 
         unload_model_btn.click(on_unload_model, outputs=[model_output])
@@ -1216,6 +1794,10 @@ def create_interface():
                 outputs=[status_display, logs_display, alert_display, evidence_summary, evidence_selector, evidence_details, evidence_gif_display, model_output],
             )
 
+            # Upload job polling (1s), per session through its upload_job state
+            upload_timer = gr.Timer(1.0)
+            upload_timer.tick(poll_upload_job, inputs=[upload_job], outputs=[upload_status, upload_info])
+
             print("✅ Enhanced dual refresh timers set up: Camera 0.1s, Status/Logs 2s with model status")
 
         except Exception as e:
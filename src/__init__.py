@@ -25,6 +25,71 @@ TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 SAVE_ANALYSIS_FRAMES = os.environ.get("SAVE_ANALYSIS_FRAMES", "false").lower() == "true"
 SAVE_FORMAT = os.environ.get("SAVE_FORMAT", "all").lower()
 MAX_FRAMES = int(os.environ.get("MAX_FRAMES", 5))
+VERDICT_BACKEND = os.environ.get("VERDICT_BACKEND", "openai").lower()
+LOCAL_VERDICT_MODEL = os.environ.get("LOCAL_VERDICT_MODEL", "")
+VIDEOLLAMA_VARIANT = os.environ.get("VIDEOLLAMA_VARIANT", "videollama3-2b")
+MODEL_IDLE_TIMEOUT = float(os.environ.get("MODEL_IDLE_TIMEOUT", 600))
+MODEL_MEMORY_BUDGET_GB = float(os.environ.get("MODEL_MEMORY_BUDGET_GB", 24))
+VIDEOLLAMA_WORKER = os.environ.get("VIDEOLLAMA_WORKER", "process").lower()
+WORKER_REQUEST_TIMEOUT = float(os.environ.get("WORKER_REQUEST_TIMEOUT", 300))
+WORKER_HEALTH_INTERVAL = float(os.environ.get("WORKER_HEALTH_INTERVAL", 15))
+TOKEN_BUDGET_PRESET = os.environ.get("TOKEN_BUDGET_PRESET", "balanced").lower()
+TOKEN_CEILING = int(os.environ.get("TOKEN_CEILING", 0))
+FALL_PROBE_WEIGHTS = os.environ.get("FALL_PROBE_WEIGHTS", "")
+FALL_PROBE_BACKEND = os.environ.get("FALL_PROBE_BACKEND", "encoder").lower()
+FALL_PROBE_ONNX = os.environ.get("FALL_PROBE_ONNX", "")
+FALL_PROBE_LOW = float(os.environ.get("FALL_PROBE_LOW", 0.2))
+FALL_PROBE_HIGH = float(os.environ.get("FALL_PROBE_HIGH", 0.8))
+PERSON_DETECTOR_PROTOTXT = os.environ.get("PERSON_DETECTOR_PROTOTXT", "")
+PERSON_DETECTOR_MODEL = os.environ.get("PERSON_DETECTOR_MODEL", "")
+PREFILTER_ESCALATE_METHOD = os.environ.get("PREFILTER_ESCALATE_METHOD", "openai").lower()
+ROI_CROP = os.environ.get("ROI_CROP", "true").lower() == "true"
+ROI_MARGIN = float(os.environ.get("ROI_MARGIN", 0.25))
+ROI_MAX_SIDE = int(os.environ.get("ROI_MAX_SIDE", 384))
+ROI_ZONES = os.environ.get("ROI_ZONES", "")
+MOTION_FLOW_EVERY = int(os.environ.get("MOTION_FLOW_EVERY", 3))
+MOTION_FLOW_WIDTH = int(os.environ.get("MOTION_FLOW_WIDTH", 160))
+GEOMETRIC_DROP_VELOCITY = float(os.environ.get("GEOMETRIC_DROP_VELOCITY", 0.5))
+GEOMETRIC_FLOOR_SECONDS = float(os.environ.get("GEOMETRIC_FLOOR_SECONDS", 1.0))
+GEOMETRIC_GATE = os.environ.get("GEOMETRIC_GATE", "false").lower() == "true"
+GEOMETRIC_GATE_THRESHOLD = float(os.environ.get("GEOMETRIC_GATE_THRESHOLD", 0.3))
+CAMERA_WIDTH = int(os.environ.get("CAMERA_WIDTH", 1280))
+CAMERA_HEIGHT = int(os.environ.get("CAMERA_HEIGHT", 720))
+ANALYSIS_WIDTH = int(os.environ.get("ANALYSIS_WIDTH", 320))
+EVIDENCE_FPS = float(os.environ.get("EVIDENCE_FPS", 5))
+HEADLESS = os.environ.get("HEADLESS", "false").lower() == "true"
+PREVIEW_FPS = float(os.environ.get("PREVIEW_FPS", 0))
+ZONES_FILE = os.environ.get("ZONES_FILE", "")
+PERSON_TRACKING = os.environ.get("PERSON_TRACKING", "true").lower() == "true"
+TRACK_CONFIRM_METHOD = os.environ.get("TRACK_CONFIRM_METHOD", "").lower()
+TEMPORAL_FILTER = os.environ.get("TEMPORAL_FILTER", "true").lower() == "true"
+TEMPORAL_RECHECK = os.environ.get("TEMPORAL_RECHECK", "true").lower() == "true"
+TEMPORAL_REALERT_SECONDS = float(os.environ.get("TEMPORAL_REALERT_SECONDS", 300))
+CASCADE_STAGES = os.environ.get("CASCADE_STAGES", "motion,geometric,openai")
+UPLOAD_SAMPLE_FPS = float(os.environ.get("UPLOAD_SAMPLE_FPS", 15))
+UPLOAD_MAX_FRAMES = int(os.environ.get("UPLOAD_MAX_FRAMES", 120))
+UPLOAD_MAX_WIDTH = int(os.environ.get("UPLOAD_MAX_WIDTH", 640))
+UPLOAD_TIMELINE = os.environ.get("UPLOAD_TIMELINE", "true").lower() == "true"
+UPLOAD_WINDOW_SECONDS = float(os.environ.get("UPLOAD_WINDOW_SECONDS", 10))
+UPLOAD_WINDOW_OVERLAP = float(os.environ.get("UPLOAD_WINDOW_OVERLAP", 0.5))
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 4))
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", 0))
+DECODE_CHUNK_SECONDS = float(os.environ.get("DECODE_CHUNK_SECONDS", 60))
+DECODE_MIN_FRAMES = int(os.environ.get("DECODE_MIN_FRAMES", 500))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 2))
+BATCH_RATE_LIMIT = float(os.environ.get("BATCH_RATE_LIMIT", 30))
+DEMO_SAMPLE_FPS = float(os.environ.get("DEMO_SAMPLE_FPS", 3))
+DEMO_MAX_FRAMES = int(os.environ.get("DEMO_MAX_FRAMES", 16))
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "true").lower() == "true"
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "cache/results")
+FRAME_CACHE_DIR = os.environ.get("FRAME_CACHE_DIR", "")
+FRAME_CACHE_MAX_GB = float(os.environ.get("FRAME_CACHE_MAX_GB", 20))
+UPLOAD_JOB_WORKERS = int(os.environ.get("UPLOAD_JOB_WORKERS", 2))
+BACKLOG_DIR = os.environ.get("BACKLOG_DIR", "cache/backlog")
+BACKLOG_MAX_WINDOWS = int(os.environ.get("BACKLOG_MAX_WINDOWS", 200))
+BACKLOG_DRAIN_PER_MINUTE = float(os.environ.get("BACKLOG_DRAIN_PER_MINUTE", 6))
+BACKLOG_RETRY_SECONDS = float(os.environ.get("BACKLOG_RETRY_SECONDS", 30))
+BACKLOG_MAX_ATTEMPTS = int(os.environ.get("BACKLOG_MAX_ATTEMPTS", 5))
 
 os.makedirs(EVIDENT_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
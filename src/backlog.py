@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+
+from src.rate_limit import RateLimiter
+from src.utils import JPEG_QUALITY, is_verdict
+
+logger = logging.getLogger(__name__)
+
+# Re-analyzes one spilled window: (frames, meta) -> verdict; None, an error string or an exception while the backend is still down
+BacklogAnalyzer = Callable[[List[Dict], Dict[str, Any]], Optional[str]]
+# Receives every late verdict: (meta, verdict, frames)
+BacklogHandler = Callable[[Dict[str, Any], str, List[Dict]], None]
+
+
+class WindowBacklog:
+    """Windows the model backend could not analyze, spilled to disk as JPEG frames plus metadata and re-analyzed at a limited rate"""
+
+    def __init__(
+        self,
+        directory: str,
+        analyze: BacklogAnalyzer,
+        on_result: BacklogHandler,
+        max_windows: int = 200,
+        drain_per_minute: float = 6,
+        retry_seconds: float = 30,
+        max_frames: int = 10,
+        max_attempts: int = 5,
+    ):
+        self.directory = directory
+        self.analyze = analyze
+        self.on_result = on_result
+        self.max_windows = max_windows
+        self.limiter = RateLimiter(drain_per_minute)
+        self.retry_seconds = retry_seconds
+        self.max_frames = max_frames  # only the frames the model would be sent are kept
+        self.max_attempts = max_attempts  # answers without a verdict before a window is given up
+        self.spilled = 0
+        self.drained = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+        # Windows left over from a previous run are drained too
+        if self.pending():
+            self.start()
+
+    def pending(self) -> List[str]:
+        """Entry directories, oldest capture first (names start with the capture time)"""
+        return sorted(name for name in os.listdir(self.directory) if not name.startswith("."))
+
+    def spill(self, frames: List[Dict], source: str, method: str, reason: str = "") -> Optional[str]:
+        """Write a window to the backlog (temp dir renamed into place); the oldest windows are dropped beyond max_windows"""
+        if not frames:
+            return None
+
+        step = max(1, len(frames) // self.max_frames)
+        kept = frames[::step][: self.max_frames]
+        captured_at = frames[0]["timestamp"]
+        name = f"{int(captured_at * 1000):015d}-{uuid.uuid4().hex[:8]}"
+        meta = {
+            "captured_at": captured_at,
+            "ended_at": frames[-1]["timestamp"],
+            "spilled_at": time.time(),
+            "source": source,
+            "method": method,
+            "reason": reason,
+            "attempts": 0,
+            "timestamps": [f["timestamp"] for f in kept],
+            "motion": [f.get("motion") for f in kept],
+        }
+
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            for i, frame_data in enumerate(kept):
+                cv2.imwrite(os.path.join(staging, f"frame_{i:03d}.jpg"), frame_data["frame"], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, default=float)
+            os.replace(staging, os.path.join(self.directory, name))
+        except Exception as e:
+            logger.error(f"Could not spill window to {self.directory}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+
+        with self.lock:
+            self.spilled += 1
+            self.last_error = reason or self.last_error
+        self.trim()
+        self.start()
+        self.wake.set()
+        return name
+
+    def load(self, name: str):
+        """Decoded frames ({frame, timestamp, motion}) and metadata of one entry"""
+        directory = os.path.join(self.directory, name)
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        frames = []
+        for i, (timestamp, motion) in enumerate(zip(meta["timestamps"], meta["motion"])):
+            frame = cv2.imread(os.path.join(directory, f"frame_{i:03d}.jpg"))
+            if frame is None:
+                raise IOError(f"missing frame {i}")
+            frames.append({"frame": frame, "timestamp": timestamp, "motion": motion})
+        return frames, meta
+
+    def attempts(self, name: str) -> int:
+        """Answers without a verdict an entry has had so far"""
+        try:
+            with open(os.path.join(self.directory, name, "meta.json"), "r", encoding="utf-8") as f:
+                return int(json.load(f).get("attempts", 0))
+        except Exception:
+            return 0
+
+    def save_meta(self, name: str, meta: Dict[str, Any]):
+        """Rewrite an entry's metadata (temp file renamed into place)"""
+        path = os.path.join(self.directory, name, "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=float)
+        os.replace(path + ".tmp", path)
+
+    def remove(self, name: str):
+        shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def trim(self):
+        names = self.pending()
+        excess = names[: max(0, len(names) - self.max_windows)]
+        for name in excess:
+            self.remove(name)
+        if excess:
+            with self.lock:
+                self.dropped += len(excess)
+            logger.warning(f"Backlog full, dropped the {len(excess)} oldest window(s)")
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._drain, name="backlog", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def _drain(self):
+        """Oldest window with the fewest attempts first; while the backend keeps failing, wait retry_seconds between attempts"""
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            names = self.pending()
+            if not names:
+                self.wake.wait()
+                continue
+
+            # A window the model keeps answering without a verdict goes behind the others instead of blocking them
+            name = min(names, key=lambda n: (self.attempts(n), n))
+            self.limiter.acquire()
+            try:
+                frames, meta = self.load(name)
+            except Exception as e:
+                logger.warning(f"Dropping unreadable backlog entry {name}: {e}")
+                self.remove(name)
+                with self.lock:
+                    self.dropped += 1
+                continue
+
+            try:
+                verdict = self.analyze(frames, meta)
+            except Exception as e:
+                verdict = None
+                with self.lock:
+                    self.last_error = str(e)
+            if not verdict:
+                # No answer or an exception: the backend is not back yet
+                self.stop_event.wait(self.retry_seconds)
+                continue
+            if not is_verdict(verdict):
+                # An answer without a verdict (an error string such as MODEL_NOT_LOADED, a refusal): count it against this window
+                meta["attempts"] = meta.get("attempts", 0) + 1
+                with self.lock:
+                    self.last_error = verdict
+                if meta["attempts"] >= self.max_attempts:
+                    logger.warning(f"Dropping backlog entry {name} after {meta['attempts']} answers without a verdict: {verdict}")
+                    self.remove(name)
+                    with self.lock:
+                        self.dropped += 1
+                else:
+                    self.save_meta(name, meta)
+                continue
+
+            self.remove(name)
+            with self.lock:
+                self.drained += 1
+            logger.info(f"Late verdict for window captured {time.time() - meta['captured_at']:.0f}s ago: {verdict}")
+            try:
+                self.on_result(meta, verdict, frames)
+            except Exception as e:
+                logger.error(f"Handling late verdict failed: {e}")
+
+    def get_stats_text(self) -> str:
+        pending = len(self.pending())
+        text = f"{pending} cửa sổ chờ, {self.drained} đã phân tích lại, {self.dropped} bị bỏ"
+        if pending and self.last_error:
+            text += f" (lỗi gần nhất: {self.last_error[:80]})"
+        return text
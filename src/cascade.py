@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.motion_features import MotionFeatureExtractor, summarize_motion
+
+logger = logging.getLogger(__name__)
+
+# A scorer gets (frame_buffer, live) and returns (fall score 0-1 or None on failure, verdict text or None)
+Scorer = Callable[[List[Dict], bool], Tuple[Optional[float], Optional[str]]]
+
+# Default (accept, confirm) thresholds: score <= accept ends the cascade with no fall,
+# score >= confirm ends it with a fall, anything in between escalates to the next stage
+DEFAULT_THRESHOLDS = {
+    "motion": (0.3, None),
+    "geometric": (0.2, 0.95),
+    "prefilter": (0.5, None),
+    "videollama3": (0.5, 0.5),
+    "openai": (0.5, 0.5),
+}
+
+# Stage decision -> the stats counter it increments
+DECISION_STATS = {"error": "errors", "accept": "accepted", "confirm": "confirmed", "escalate": "escalated"}
+
+# Downward optical-flow speed (frame heights per second) that maps to a motion score of 1
+MOTION_GATE_VELOCITY = 0.3
+
+
+def parse_cascade_spec(spec: str) -> List[Tuple[str, Optional[float], Optional[float]]]:
+    """Parse "name[:accept[:confirm]],..." stages; "-" disables a threshold, an omitted value uses the default"""
+    stages = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, *values = part.split(":")
+        default_accept, default_confirm = DEFAULT_THRESHOLDS.get(name, (None, None))
+        thresholds = []
+        for value, default in zip(values + [""] * (2 - len(values)), (default_accept, default_confirm)):
+            thresholds.append(default if value == "" else None if value == "-" else float(value))
+        stages.append((name, thresholds[0], thresholds[1]))
+    return stages
+
+
+def verdict_score(verdict: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """Scorer result for a stage that answers with a verdict string"""
+    if not verdict:
+        return None, None
+    if verdict.startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+        return 1.0, verdict
+    if verdict.startswith("KHÔNG_PHÁT_HIỆN_TÉ_NGÃ"):
+        return 0.0, verdict
+    return None, verdict
+
+
+def motion_gate_score(frame_buffer: List[Dict], live: bool = True) -> Tuple[Optional[float], Optional[str]]:
+    """Score a window by its fastest downward motion, from the features precomputed alongside the buffer"""
+    summary = summarize_motion(frame_buffer)
+    if summary is None:
+        # Buffers without precomputed features (e.g. from older callers) get them computed here once
+        extractor = MotionFeatureExtractor()
+        buffer = [{**f, "motion": extractor.update(f["frame"], f["timestamp"])} for f in frame_buffer]
+        summary = summarize_motion(buffer)
+    if summary is None:
+        return 0.0, None
+    return float(np.clip(summary["max_downward_velocity"] / MOTION_GATE_VELOCITY, 0.0, 1.0)), None
+
+
+class CascadeStage:
+    """One cascade step: a scorer plus the thresholds that let it decide on its own"""
+
+    def __init__(self, name: str, scorer: Scorer, accept: Optional[float] = None, confirm: Optional[float] = None):
+        self.name = name
+        self.scorer = scorer
+        self.accept = accept
+        self.confirm = confirm
+        self.stats = {"runs": 0, "accepted": 0, "confirmed": 0, "escalated": 0, "errors": 0, "total_latency": 0.0}
+
+
+class DetectionCascade:
+    """Runs stages cheapest first and stops as soon as one of them is confident"""
+
+    def __init__(self, stages: List[CascadeStage]):
+        if not stages:
+            raise ValueError("A detection cascade needs at least one stage")
+        self.stages = stages
+        self.lock = threading.Lock()  # stage stats are updated by the live loop and concurrent upload windows
+
+    def run(self, frame_buffer: List[Dict], live: bool = True) -> Tuple[Optional[str], List[Dict]]:
+        """Return (verdict, trace); the trace has the score, latency and decision of every stage that ran"""
+        trace = []
+        last_verdict = None
+
+        for stage in self.stages:
+            start = time.perf_counter()
+            try:
+                score, verdict = stage.scorer(frame_buffer, live)
+            except Exception as e:
+                logger.error(f"Cascade stage {stage.name} failed: {e}")
+                score, verdict = None, None
+            latency = time.perf_counter() - start
+
+            step: Dict[str, Any] = {"stage": stage.name, "score": score, "latency": latency}
+            trace.append(step)
+            last_verdict = verdict or last_verdict
+
+            if score is None:
+                step["decision"] = "error"
+            elif stage.accept is not None and score <= stage.accept:
+                step["decision"] = "accept"
+            elif stage.confirm is not None and score >= stage.confirm:
+                step["decision"] = "confirm"
+            else:
+                step["decision"] = "escalate"
+
+            with self.lock:
+                stage.stats["runs"] += 1
+                stage.stats["total_latency"] += latency
+                stage.stats[DECISION_STATS[step["decision"]]] += 1
+
+            if step["decision"] == "accept":
+                return verdict or f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: Không có dấu hiệu té ngã (tầng {stage.name}, điểm {score:.2f})", trace
+            if step["decision"] == "confirm":
+                return verdict or f"PHÁT_HIỆN_TÉ_NGÃ: Tầng {stage.name} phát hiện dấu hiệu té ngã (điểm {score:.2f})", trace
+
+        # No stage was confident: use the most expensive verdict we got
+        return last_verdict, trace
+
+    def get_stats_text(self) -> str:
+        parts = []
+        for stage in self.stages:
+            stats = stage.stats
+            average = stats["total_latency"] / stats["runs"] * 1000 if stats["runs"] else 0.0
+            parts.append(f"{stage.name}: {stats['runs']} lần, dừng {stats['accepted'] + stats['confirmed']}, {average:.0f}ms")
+        return " → ".join(parts)
+
+
+def format_trace(trace: List[Dict]) -> str:
+    """One-line trace for logs, e.g. "motion 0.12 (2ms, escalate) → openai 1.00 (1350ms, confirm)" """
+    steps = []
+    for step in trace:
+        score = "lỗi" if step["score"] is None else f"{step['score']:.2f}"
+        steps.append(f"{step['stage']} {score} ({step['latency'] * 1000:.0f}ms, {step['decision']})")
+    return " → ".join(steps)
+
+
+def build_cascade(spec: str, scorers: Dict[str, Scorer]) -> DetectionCascade:
+    """Build a cascade from a CASCADE_STAGES spec; unknown stage names are skipped with a warning"""
+    stages = []
+    for name, accept, confirm in parse_cascade_spec(spec):
+        if name not in scorers:
+            logger.warning(f"Unknown cascade stage '{name}', skipping")
+            continue
+        stages.append(CascadeStage(name, scorers[name], accept, confirm))
+    return DetectionCascade(stages)
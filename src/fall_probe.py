@@ -0,0 +1,152 @@
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LinearFallHead:
+    """Logistic-regression head over temporally pooled frame features, stored as .npz"""
+
+    def __init__(self, weight: np.ndarray, bias: float, mean: Optional[np.ndarray] = None, std: Optional[np.ndarray] = None):
+        self.weight = weight.astype(np.float32)
+        self.bias = float(bias)
+        self.mean = mean.astype(np.float32) if mean is not None else np.zeros_like(self.weight)
+        self.std = std.astype(np.float32) if std is not None else np.ones_like(self.weight)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearFallHead":
+        data = np.load(path)
+        return cls(data["weight"], float(data["bias"]), data.get("mean"), data.get("std"))
+
+    def save(self, path: str):
+        np.savez(path, weight=self.weight, bias=self.bias, mean=self.mean, std=self.std)
+
+    def score(self, features: np.ndarray) -> float:
+        """Fall probability for one pooled feature vector"""
+        z = (features - self.mean) / self.std
+        return float(1.0 / (1.0 + np.exp(-(z @ self.weight + self.bias))))
+
+
+def pool_features(frame_features: np.ndarray) -> np.ndarray:
+    """Pool (T, D) per-frame features into one vector: mean, max and last-minus-first change"""
+    return np.concatenate([frame_features.mean(axis=0), frame_features.max(axis=0), frame_features[-1] - frame_features[0]])
+
+
+def train_linear_head(features: np.ndarray, labels: np.ndarray, epochs: int = 500, learning_rate: float = 0.1, l2: float = 1e-3) -> LinearFallHead:
+    """Fit the head on pooled features (N, 3D) with 0/1 fall labels using plain gradient descent"""
+    mean, std = features.mean(axis=0), features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    y = labels.astype(np.float32)
+    weight, bias = np.zeros(x.shape[1], dtype=np.float32), 0.0
+
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(x @ weight + bias)))
+        error = p - y
+        weight -= learning_rate * (x.T @ error / len(y) + l2 * weight)
+        bias -= learning_rate * float(error.mean())
+
+    return LinearFallHead(weight, bias, mean, std)
+
+
+class VisionEncoderFeatures:
+    """Per-frame features from the VideoLLaMA3 vision encoder, without running the language model"""
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def extract(self, frames: List[np.ndarray]) -> Optional[np.ndarray]:
+        import torch
+        from PIL import Image
+
+        model, processor = self.detector.model, self.detector.processor
+        if model is None or processor is None:
+            return None
+
+        images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+        inputs = processor.image_processor(images=images, merge_size=1, return_tensors="pt")
+        pixel_values = inputs["pixel_values"].to(model.device, dtype=torch.bfloat16)
+        grid_sizes = inputs["grid_sizes"].to(model.device)
+        merge_sizes = inputs["merge_sizes"].to(model.device)
+
+        with torch.inference_mode():
+            tokens = model.get_model().get_vision_encoder()(pixel_values=pixel_values, grid_sizes=grid_sizes, merge_sizes=merge_sizes)
+
+        # Tokens of all frames are concatenated; average each frame's share
+        counts = grid_sizes.prod(dim=1).tolist()
+        per_frame = [chunk.float().mean(dim=0) for chunk in torch.split(tokens, counts)]
+        return torch.stack(per_frame).cpu().numpy()
+
+
+class OnnxImageFeatures:
+    """Per-frame features from a small ONNX image model (e.g. MobileNet) run with OpenCV DNN on CPU"""
+
+    def __init__(self, model_path: str, input_size: int = 224):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+
+    def extract(self, frames: List[np.ndarray]) -> Optional[np.ndarray]:
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, (self.input_size, self.input_size), (0, 0, 0), swapRB=True, crop=False)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        return output.reshape(len(frames), -1)
+
+
+class FallProbe:
+    """Single forward pass fall score; full generation is only needed inside the ambiguous band"""
+
+    def __init__(self, head: LinearFallHead, extractor, low: float = 0.2, high: float = 0.8, num_frames: int = 8):
+        self.head = head
+        self.extractor = extractor
+        self.low = low
+        self.high = high
+        self.num_frames = num_frames
+        self.stats = {"fall": 0, "no_fall": 0, "ambiguous": 0, "errors": 0}
+
+    def score(self, frame_buffer: List[Dict]) -> Optional[float]:
+        """Return the fall score for a window, or None if features could not be computed"""
+        try:
+            indices = np.linspace(0, len(frame_buffer) - 1, min(self.num_frames, len(frame_buffer))).astype(int)
+            frame_features = self.extractor.extract([frame_buffer[i]["frame"] for i in indices])
+            if frame_features is None:
+                return None
+            return self.head.score(pool_features(frame_features))
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Fall probe failed, falling back to generation: {e}")
+            return None
+
+    def decide(self, frame_buffer: List[Dict]) -> Optional[str]:
+        """Return a verdict when the score is confident, None when full generation is needed"""
+        score = self.score(frame_buffer)
+        if score is None:
+            return None
+
+        if score >= self.high:
+            self.stats["fall"] += 1
+            return f"PHÁT_HIỆN_TÉ_NGÃ: Bộ dò nhanh phát hiện dấu hiệu té ngã (điểm {score:.2f})"
+        if score <= self.low:
+            self.stats["no_fall"] += 1
+            return f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: Bộ dò nhanh không thấy dấu hiệu té ngã (điểm {score:.2f})"
+
+        self.stats["ambiguous"] += 1
+        logger.info(f"Fall probe ambiguous (score {score:.2f}), running full generation")
+        return None
+
+
+def create_fall_probe(detector, weights_path: str, backend: str = "encoder", onnx_path: str = "", low: float = 0.2, high: float = 0.8) -> Optional[FallProbe]:
+    """Build the probe from config; returns None when no trained head is configured"""
+    if not weights_path:
+        return None
+
+    try:
+        head = LinearFallHead.load(weights_path)
+        extractor = OnnxImageFeatures(onnx_path) if backend == "onnx" else VisionEncoderFeatures(detector)
+        logger.info(f"Fall probe enabled ({backend}, ambiguous band {low:.2f}-{high:.2f})")
+        return FallProbe(head, extractor, low, high)
+    except Exception as e:
+        logger.error(f"Failed to create fall probe: {e}")
+        return None
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+from src.result_cache import cache_key
+from src.utils import file_sha256
+from src.video_reader import iter_sampled_frames, probe_video, sample_indices
+
+logger = logging.getLogger(__name__)
+
+# Same call signature as iter_sampled_frames: (path, sample_fps, max_frames, start, end, max_width)
+FrameReader = Callable[..., Iterator[Dict[str, Any]]]
+
+
+class FrameCache:
+    """Sampled decoded frames of whole videos as memory-mapped .npy arrays plus a JSON timestamp index, shared across processes"""
+
+    def __init__(self, directory: str, decode: FrameReader = iter_sampled_frames, max_bytes: float = 0):
+        self.directory = directory
+        self.decode = decode  # reader used on a miss, e.g. ParallelDecoder.iter_frames
+        self.max_bytes = max_bytes  # least recently used entries are removed beyond this (0 = no limit)
+        self.hashes: Dict[tuple, str] = {}  # (path, size, mtime) -> content hash, so a file is hashed once per process
+        self.key_locks: Dict[str, threading.Lock] = {}  # concurrent windows of one file wait for a single decode
+        self.lock = threading.Lock()
+
+    def content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self.hashes.get(file_id)
+        if digest is None:
+            digest = file_sha256(path)
+            with self.lock:
+                self.hashes[file_id] = digest
+        return digest
+
+    def entry_paths(self, key: str):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".npy", base + ".json"
+
+    def iter_frames(
+        self,
+        path: str,
+        sample_fps: float = 15.0,
+        max_frames: int = 120,
+        start: float = 0.0,
+        end: Optional[float] = None,
+        max_width: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Drop-in for iter_sampled_frames: the range is sliced out of the file's cached frames (zero-copy, read-only)"""
+        # One entry per file and sampling: overlapping windows and repeated runs share it instead of storing frames twice
+        key = cache_key([self.content_hash(path)], {"sample_fps": sample_fps, "max_width": max_width})
+        array_path, index_path = self.entry_paths(key)
+
+        entry = self.open_entry(array_path, index_path, path)
+        if entry is None:
+            with self.lock:
+                key_lock = self.key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                entry = self.open_entry(array_path, index_path, path) or self.fill(array_path, index_path, path, sample_fps, max_width)
+        if entry is None:
+            # Unknown length or the store failed: read the range directly
+            yield from self.decode(path, sample_fps, max_frames, start, end, max_width)
+            return
+
+        frames, index = entry
+        timestamps = np.asarray(index["timestamps"])
+        selected = np.flatnonzero((timestamps >= start) & ((timestamps < end) if end is not None else True))
+        if len(selected) > max_frames:
+            selected = selected[np.unique(np.linspace(0, len(selected) - 1, max_frames).astype(int))]
+        for i in selected:
+            yield {"frame": np.asarray(frames[i]), "timestamp": index["timestamps"][i], "index": index["indices"][i]}
+
+    def open_entry(self, array_path: str, index_path: str, source: str):
+        """(memory-mapped frames, index) of a complete entry, None when missing or unusable; reading marks it recently used"""
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            frames = np.load(array_path, mmap_mode="r")
+            os.utime(index_path)
+            return frames, index
+        except Exception as e:
+            logger.warning(f"Frame cache entry for {source} is unusable, decoding again: {e}")
+            return None
+
+    def fill(self, array_path: str, index_path: str, source: str, sample_fps: float, max_width: Optional[int]):
+        """Decode the whole file at sample_fps straight into a new entry; the index, written last, marks it complete"""
+        info = probe_video(source)
+        if info["total_frames"] <= 0 or info["fps"] <= 0:
+            return None
+        count = len(sample_indices(info["total_frames"], info["fps"], sample_fps, info["total_frames"]))
+
+        os.makedirs(os.path.dirname(array_path), exist_ok=True)
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+        array = None
+        index: Dict[str, Any] = {"source": source, "indices": [], "timestamps": []}
+        try:
+            for i, sample in enumerate(self.decode(source, sample_fps, count, 0.0, None, max_width)):
+                if array is None:
+                    array = np.lib.format.open_memmap(array_path + suffix, mode="w+", dtype=np.uint8, shape=(count,) + sample["frame"].shape)
+                array[i] = sample["frame"]
+                index["indices"].append(sample["index"])
+                index["timestamps"].append(sample["timestamp"])
+            if array is None:
+                return None
+            array.flush()
+            del array
+            os.replace(array_path + suffix, array_path)
+
+            with open(index_path + suffix, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(index_path + suffix, index_path)
+        except Exception as e:
+            logger.warning(f"Could not cache frames of {source}: {e}")
+            for leftover in (array_path + suffix, index_path + suffix):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            return None
+
+        self.trim()
+        return self.open_entry(array_path, index_path, source)
+
+    def trim(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        if not self.max_bytes:
+            return
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    index_path = os.path.join(root, name)
+                    array_path = index_path[: -len(".json")] + ".npy"
+                    size = os.path.getsize(array_path) if os.path.exists(array_path) else 0
+                    entries.append((os.path.getmtime(index_path), size, index_path, array_path))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, index_path, array_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Index first: a reader that already mapped the array keeps its view, new readers see a miss
+            for stale in (index_path, array_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            total -= size
+            logger.info(f"Frame cache over {self.max_bytes / 1e9:.1f}GB, removed {os.path.basename(array_path)}")
+
+
+def make_frame_reader(cache_dir: str = "", decode: FrameReader = iter_sampled_frames, max_gb: float = 0) -> FrameReader:
+    """decode (iter_sampled_frames or a ParallelDecoder), going through a FrameCache when a cache directory is configured"""
+    return FrameCache(cache_dir, decode, max_gb * 1e9).iter_frames if cache_dir else decode
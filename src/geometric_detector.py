@@ -0,0 +1,186 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.zones import CameraZones
+
+logger = logging.getLogger(__name__)
+
+# Ring buffer columns
+T, CX, CY, W, H, ASPECT = range(6)
+
+
+def empty_result() -> Dict[str, Any]:
+    return {"fall": False, "score": 0.0, "max_drop_velocity": 0.0, "time_on_floor": 0.0, "fall_time": None}
+
+
+def evaluate_history(rows: np.ndarray, drop_velocity: float, lying_aspect: float, floor_seconds: float, settle_seconds: float, zones=None) -> Dict[str, Any]:
+    """Vectorized check of chronological (T, CX, CY, W, H, ASPECT) rows for a fast drop followed by time spent lying"""
+    result = empty_result()
+
+    tracked = rows[~np.isnan(rows[:, CY])]
+    if len(tracked) < 5:
+        return result
+
+    t = tracked[:, T]
+    dt = np.diff(t)
+    dt[dt <= 0] = 1e-3
+
+    # Downward velocity of the blob top (centroid minus half height), smoothed over 3 samples
+    top = tracked[:, CY] - tracked[:, H] / 2
+    velocity = np.convolve(np.diff(top) / dt, np.ones(3) / 3, mode="same")
+
+    # Start time of the continuous track each sample belongs to (a gap restarts the track)
+    gap = np.concatenate([[True], dt > settle_seconds])
+    track_start = np.maximum.accumulate(np.where(gap, t, -np.inf))
+    settled = (t[1:] - track_start[1:]) >= settle_seconds
+
+    drops = np.flatnonzero((velocity >= drop_velocity) & settled)
+    if drops.size == 0:
+        settled_velocity = velocity[settled].max() if settled.any() else 0.0
+        result["score"] = float(np.clip(settled_velocity / drop_velocity, 0, 1) * 0.4)
+        return result
+
+    # Time lying after the first fast drop: wide blob, or a blob much shorter than before the drop
+    max_velocity = float(velocity[drops].max())
+    result["max_drop_velocity"] = max_velocity
+    drop_index = int(drops[0]) + 1
+    before = tracked[(t >= track_start[drop_index]) & (t <= t[drop_index])]
+    standing_height = np.median(before[:, H])
+    after = tracked[drop_index:]
+    lying = (after[:, ASPECT] >= lying_aspect) | (after[:, H] <= 0.6 * standing_height)
+    if zones is not None:
+        # Lying in a bed is not a fall; with floor zones configured only lying on the floor counts
+        lying &= zones.lying_allowed(after[:, CX], after[:, CY])
+    after_dt = np.minimum(np.diff(after[:, T], append=after[-1, T]), settle_seconds)
+    time_on_floor = float((after_dt * lying).sum())
+
+    result["time_on_floor"] = time_on_floor
+    result["fall_time"] = float(t[drop_index])
+    result["score"] = float(0.4 * min(max_velocity / drop_velocity, 1.0) + 0.6 * min(time_on_floor / floor_seconds, 1.0))
+    result["fall"] = time_on_floor >= floor_seconds
+    return result
+
+
+class GeometricFallDetector:
+    """Deterministic fall detector: background subtraction + largest-blob tracking, cheap enough for every frame"""
+
+    def __init__(
+        self,
+        history_seconds: float = 10.0,
+        max_fps: float = 30.0,
+        process_width: int = 320,
+        min_area: float = 0.01,
+        drop_velocity: float = 0.5,
+        lying_aspect: float = 1.0,
+        floor_seconds: float = 1.0,
+        settle_seconds: float = 0.5,
+    ):
+        self.history_seconds = history_seconds
+        self.process_width = process_width
+        self.min_area = min_area  # fraction of the frame a blob must cover
+        self.drop_velocity = drop_velocity  # frame heights per second, downwards
+        self.lying_aspect = lying_aspect  # width / height of a lying body
+        self.floor_seconds = floor_seconds
+        self.settle_seconds = settle_seconds  # a new blob grows while entering the view; ignore its first moments
+
+        self.capacity = int(history_seconds * max_fps) + 1
+        self.zones: Optional[CameraZones] = None  # CameraZones of the camera being watched, if any
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        # update() runs on the capture thread while evaluate() is called from analysis, UI and cascade threads
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the background model and blob history"""
+        with self.lock:
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=32, detectShadows=True)
+            self.data = np.full((self.capacity, 6), np.nan, dtype=np.float64)
+            self.position = 0
+            self.blobs: List[Tuple[int, int, int, int]] = []
+            self.frame_size: Optional[Tuple[int, int]] = None
+
+    def update(self, frame: np.ndarray, timestamp: float, mask: Optional[np.ndarray] = None):
+        """Feed one frame; records the largest foreground blob (or a gap) for this timestamp"""
+        height, width = frame.shape[:2]
+        scale = self.process_width / width
+        small = cv2.resize(frame, (self.process_width, int(height * scale)), interpolation=cv2.INTER_AREA) if width != self.process_width else frame
+
+        with self.lock:
+            foreground = self.subtractor.apply(small)
+        # MOG2 marks shadows as 127; keep only confident foreground
+        _, foreground = cv2.threshold(foreground, 200, 255, cv2.THRESH_BINARY)
+        if mask is not None:
+            foreground = cv2.bitwise_and(foreground, mask)
+        foreground = cv2.morphologyEx(foreground, cv2.MORPH_OPEN, self.kernel)
+        foreground = cv2.morphologyEx(foreground, cv2.MORPH_CLOSE, self.kernel, iterations=2)
+
+        contours, _ = cv2.findContours(foreground, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        small_h, small_w = foreground.shape[:2]
+        min_pixels = self.min_area * small_h * small_w
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_pixels]
+        blobs = [(int(x / scale), int(y / scale), int(w / scale), int(h / scale)) for x, y, w, h in boxes]
+
+        with self.lock:
+            self.frame_size = (width, height)
+            self.blobs = blobs
+            row = self.data[self.position % self.capacity]
+            row[:] = np.nan
+            row[T] = timestamp
+            if blobs:
+                x, y, w, h = max(blobs, key=lambda b: b[2] * b[3])
+                row[CX], row[CY] = (x + w / 2) / width, (y + h / 2) / height
+                row[W], row[H] = w / width, h / height
+                row[ASPECT] = w / max(h, 1)
+            self.position += 1
+
+    def _history(self, now: Optional[float]) -> np.ndarray:
+        """Chronological rows within history_seconds of now (a copy; caller holds self.lock)"""
+        count = min(self.position, self.capacity)
+        start = self.position - count
+        rows = self.data[np.arange(start, self.position) % self.capacity]
+        if not count:
+            return rows
+        if now is None:
+            now = rows[-1, T]
+        return rows[rows[:, T] >= now - self.history_seconds]
+
+    def evaluate(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Check the largest-blob history for a fast drop followed by time spent lying"""
+        with self.lock:
+            rows = self._history(now)
+        return evaluate_history(rows, self.drop_velocity, self.lying_aspect, self.floor_seconds, self.settle_seconds, self.zones)
+
+    def analyze(self, frame_buffer: List[Dict], zones=None) -> Dict[str, Any]:
+        """Run a fresh detector with the same settings over a whole buffered window (e.g. an uploaded video); camera zones only when given"""
+        if not frame_buffer:
+            return empty_result()
+
+        duration = max(frame_buffer[-1]["timestamp"] - frame_buffer[0]["timestamp"], 1e-3)
+        detector = GeometricFallDetector(
+            history_seconds=duration + 1.0,
+            max_fps=len(frame_buffer) / duration,
+            process_width=self.process_width,
+            min_area=self.min_area,
+            drop_velocity=self.drop_velocity,
+            lying_aspect=self.lying_aspect,
+            floor_seconds=self.floor_seconds,
+            settle_seconds=self.settle_seconds,
+        )
+        detector.zones = zones
+        for frame_data in frame_buffer:
+            detector.update(frame_data["frame"], frame_data["timestamp"])
+        return detector.evaluate()
+
+
+def format_geometric_verdict(result: Dict[str, Any]) -> str:
+    """Verdict string in the same format as the model paths"""
+    if result["fall"]:
+        return (
+            f"PHÁT_HIỆN_TÉ_NGÃ: Phát hiện chuyển động rơi nhanh xuống ({result['max_drop_velocity']:.2f} chiều cao khung/s) "
+            f"và nằm trên sàn {result['time_on_floor']:.1f}s (bộ dò hình học)"
+        )
+    return f"KHÔNG_PHÁT_HIỆN_TÉ_NGÃ: Không có chuyển động té ngã (điểm hình học {result['score']:.2f})"
@@ -0,0 +1,324 @@
+"""
+Out-of-process VideoLLaMA3 inference worker.
+
+The parent starts `python -m src.inference_worker`, which connects back over an authenticated
+localhost socket. Frames go through shared memory; only small dicts go over the socket:
+
+    request:  {"id", "op": "analyze", "shm", "shape", "timestamps", "motion", "verdict_backend", "queue_depth"} | {"id", "op": "ping"} | {"id", "op": "shutdown"}
+    response: {"id", "ok", "result" | "error"}
+"""
+
+import argparse
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+from src import WORKER_HEALTH_INTERVAL, WORKER_REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+AUTHKEY_ENV = "INFERENCE_WORKER_AUTHKEY"
+MAX_RESTART_BACKOFF = 300.0  # seconds between restart attempts while the worker keeps failing to start
+
+
+def frames_to_shared_memory(frame_buffer: List[Dict]):
+    """Copy buffer frames into one shared memory block, resizing any odd-sized frame to the first one"""
+    height, width = frame_buffer[0]["frame"].shape[:2]
+    shape = (len(frame_buffer), height, width, 3)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    array: np.ndarray = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+    for i, frame_data in enumerate(frame_buffer):
+        frame = frame_data["frame"]
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        array[i] = frame
+
+    return shm, shape
+
+
+class InferenceWorkerClient:
+    """Runs VideoLLaMA3 in a supervised child process; drop-in for VideoLLamaFallDetector"""
+
+    def __init__(self, model_name="DAMO-NLP-SG/VideoLLaMA3-2B", verdict_backend=None, request_timeout=WORKER_REQUEST_TIMEOUT, health_interval=WORKER_HEALTH_INTERVAL):
+        self.model_name = model_name
+        self.verdict_backend = verdict_backend
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.is_loaded = False
+        self.process = None
+        self.conn = None
+        self.request_id = 0
+        self.request_count = 0
+        self.restart_count = 0
+        self.last_health_check = 0.0
+        self.request_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread = None
+
+    def _start_process(self) -> bool:
+        authkey = secrets.token_bytes(32)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        host, port = listener.address
+
+        env = dict(os.environ, **{AUTHKEY_ENV: authkey.hex()})
+        cmd = [sys.executable, "-m", "src.inference_worker", "--address", f"{host}:{port}", "--model-name", self.model_name]
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(cmd, env=env, cwd=project_root)
+
+        # accept() has no timeout, so wait for it in a helper thread
+        accepted = []
+        accept_thread = threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True)
+        accept_thread.start()
+        accept_thread.join(60)
+        listener.close()
+
+        if not accepted:
+            logger.error("Inference worker did not connect")
+            self._kill_process()
+            return False
+        self.conn = accepted[0]
+
+        # The worker reports once the model has finished loading
+        if not self.conn.poll(self.request_timeout):
+            logger.error("Inference worker timed out while loading the model")
+            self._kill_process()
+            return False
+
+        ready = self.conn.recv()
+        if not ready.get("ok"):
+            logger.error(f"Inference worker failed to load model: {ready.get('error')}")
+            self._kill_process()
+            return False
+
+        logger.info(f"Inference worker ready (pid {self.process.pid})")
+        return True
+
+    def _kill_process(self):
+        if self.conn:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+        if self.process:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+            self.process = None
+
+    def load_model(self) -> bool:
+        """Start the worker process and load the model inside it"""
+        with self.request_lock:
+            if self.is_loaded:
+                return True
+            self.is_loaded = self._start_process()
+
+        if self.is_loaded:
+            self._stop_event.clear()
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+        return self.is_loaded
+
+    def unload_model(self):
+        """Stop the worker process, releasing all of its memory"""
+        self._stop_event.set()
+        with self.request_lock:
+            if self.conn and self.process and self.process.poll() is None:
+                try:
+                    self.conn.send({"id": 0, "op": "shutdown"})
+                    self.process.wait(timeout=10)
+                except Exception:
+                    pass
+            self._kill_process()
+            self.is_loaded = False
+        logger.info("Inference worker stopped")
+
+    def _request(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one request and wait for its response; caller holds request_lock"""
+        if not self.conn or not self.process or self.process.poll() is not None:
+            raise ConnectionError("Inference worker is not running")
+
+        self.request_id += 1
+        message["id"] = self.request_id
+        self.conn.send(message)
+
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Inference worker did not answer within {timeout:.0f}s")
+
+        response = self.conn.recv()
+        if response.get("id") != message["id"]:
+            raise ConnectionError("Inference worker response out of sequence")
+        return response
+
+    def _restart(self, reason: str):
+        """Replace a dead or hung worker; caller holds request_lock"""
+        logger.warning(f"Restarting inference worker: {reason}")
+        self._kill_process()
+        self.restart_count += 1
+        try:
+            self.is_loaded = self._start_process()
+        except Exception as e:
+            logger.error(f"Inference worker could not be started: {e}")
+            self._kill_process()
+            self.is_loaded = False
+
+    def ping(self, timeout: float = 5.0) -> bool:
+        """Health check; returns False while a request is running or if the worker is unhealthy"""
+        if not self.request_lock.acquire(blocking=False):
+            return False
+        try:
+            return self._request({"op": "ping"}, timeout).get("ok", False)
+        except Exception:
+            return False
+        finally:
+            self.request_lock.release()
+
+    def _health_loop(self):
+        """Ping the worker and replace it when it stops answering; failed restarts are retried with exponential backoff"""
+        wait = self.health_interval
+        while not self._stop_event.wait(wait):
+            if not self.request_lock.acquire(blocking=False):
+                continue  # busy generating, which is healthy
+            try:
+                self.last_health_check = time.time()
+                if not self.is_loaded:
+                    self._restart("previous restart failed")
+                else:
+                    self._request({"op": "ping"}, 5.0)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    self._restart(str(e))
+            finally:
+                self.request_lock.release()
+
+            if self.is_loaded:
+                wait = self.health_interval
+            else:
+                wait = min(wait * 2, MAX_RESTART_BACKOFF)
+                logger.error(f"Inference worker could not be restarted, retrying in {wait:.0f}s")
+
+    def analyze_frames(self, frame_buffer: List[Dict], queue_depth: int = 0) -> str:
+        """Analyze frames in the worker process; same result strings as VideoLLamaFallDetector"""
+        if not self.is_loaded:
+            logger.error("Model not loaded. Call load_model() first.")
+            return "MODEL_NOT_LOADED"
+
+        if not frame_buffer:
+            logger.warning("Empty frame buffer")
+            return "NO_FRAMES"
+
+        shm, shape = frames_to_shared_memory(frame_buffer)
+        try:
+            with self.request_lock:
+                self.request_count += 1
+                message = {
+                    "op": "analyze",
+                    "shm": shm.name,
+                    "shape": shape,
+                    "timestamps": [f.get("timestamp", 0) for f in frame_buffer],
+                    # Motion features precomputed in the capture loop (small, so they travel over the socket)
+                    "motion": [f.get("motion") for f in frame_buffer],
+                    "verdict_backend": self.verdict_backend,
+                    "queue_depth": queue_depth,
+                }
+                try:
+                    response = self._request(message, self.request_timeout)
+                except (ConnectionError, TimeoutError, EOFError, OSError) as e:
+                    self._restart(str(e))
+                    return f"LỖI_PHÂN_TÍCH_KẾT_HỢP: Inference worker lỗi - {e}"
+
+            if not response.get("ok"):
+                return f"LỖI_PHÂN_TÍCH_KẾT_HỢP: {response.get('error')}"
+            return response["result"]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_model_status(self) -> Dict[str, Any]:
+        """Get worker status without importing torch in this process"""
+        return {
+            "loaded": self.is_loaded,
+            "model_name": self.model_name,
+            "device": "worker",
+            "pid": self.process.pid if self.process else None,
+            "worker_alive": bool(self.process and self.process.poll() is None),
+            "requests": self.request_count,
+            "restarts": self.restart_count,
+            "openai_available": bool(os.getenv("OPENAI_API_KEY")),
+            "verdict_backend": self.verdict_backend,
+        }
+
+
+def run_worker(address: str, model_name: str):
+    """Worker process entry point: load the model, then serve requests until shutdown"""
+    from src.videollama_detector import VideoLLamaFallDetector
+
+    host, port = address.rsplit(":", 1)
+    conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+
+    detector = VideoLLamaFallDetector(model_name)
+    if not detector.load_model():
+        conn.send({"id": 0, "ok": False, "error": "Failed to load model"})
+        return
+    conn.send({"id": 0, "ok": True})
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+
+        op = request.get("op")
+        if op == "shutdown":
+            break
+        if op == "ping":
+            conn.send({"id": request["id"], "ok": True})
+            continue
+        if op != "analyze":
+            conn.send({"id": request["id"], "ok": False, "error": f"Unknown op {op}"})
+            continue
+
+        try:
+            shm = shared_memory.SharedMemory(name=request["shm"])
+            # The parent owns (and unlinks) the block; the tracker knows it by its POSIX name with the leading "/"
+            if os.name == "posix":
+                resource_tracker.unregister("/" + shm.name, "shared_memory")
+            try:
+                frames: np.ndarray = np.ndarray(request["shape"], dtype=np.uint8, buffer=shm.buf)
+                motion = request.get("motion") or [None] * len(request["timestamps"])
+                frame_buffer = [{"frame": frames[i], "timestamp": ts, "motion": motion[i]} for i, ts in enumerate(request["timestamps"])]
+                if request.get("verdict_backend"):
+                    detector.verdict_backend = request["verdict_backend"]
+                result = detector.analyze_frames(frame_buffer, request.get("queue_depth", 0))
+                del frame_buffer, frames
+            finally:
+                shm.close()
+            conn.send({"id": request["id"], "ok": True, "result": result})
+        except Exception as e:
+            logger.error(f"Inference worker request failed: {e}")
+            conn.send({"id": request["id"], "ok": False, "error": str(e)})
+
+    detector.unload_model()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VideoLLaMA3 inference worker")
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--model-name", default="DAMO-NLP-SG/VideoLLaMA3-2B")
+    args = parser.parse_args()
+    run_worker(args.address, args.model_name)
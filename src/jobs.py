@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Id of the job the current code runs for (None outside jobs), so concurrent jobs can tag what they log
+current_job_id: ContextVar[Optional[str]] = ContextVar("current_job_id", default=None)
+
+STATUS_LABELS = {QUEUED: "⏳ Đang chờ", RUNNING: "🔄 Đang xử lý", DONE: "✅ Hoàn thành", FAILED: "❌ Lỗi", CANCELLED: "🛑 Đã hủy"}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's handler (from set_progress) once the job has been cancelled"""
+
+
+class Job:
+    """One queued unit of work with progress, cooperative cancellation and its stored result"""
+
+    def __init__(self, name: str, args: tuple):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.args = args
+        self.status = QUEUED
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+
+    def set_progress(self, fraction: float):
+        """Progress callback for the handler (0-1); also the point where a cancelled job stops"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def describe(self) -> str:
+        elapsed = (self.finished or time.time()) - (self.started or self.created)
+        return f"[{self.job_id}] {self.name}: {STATUS_LABELS[self.status]} {self.progress * 100:.0f}% ({elapsed:.0f}s)"
+
+
+class JobQueue:
+    """Runs jobs through a bounded worker pool; finished jobs are kept (up to max_finished) so clients can poll results"""
+
+    def __init__(self, handler: Callable[..., Any], workers: int = 2, max_finished: int = 50):
+        self.handler = handler  # called as handler(*job.args, progress=job.set_progress)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, name: str, *args) -> Job:
+        job = Job(name, args)
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self._prune()
+        job.future = self.executor.submit(self._run, job)
+        logger.info(f"Job {job.job_id} queued: {name}")
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id) if job_id else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright, or ask a running one to stop at its next progress update"""
+        job = self.get(job_id)
+        if job is None or job.is_finished():
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def list_jobs(self) -> List[Job]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def active_count(self) -> int:
+        return sum(1 for job in self.list_jobs() if not job.is_finished())
+
+    def get_status_text(self) -> str:
+        jobs = self.list_jobs()
+        running = sum(1 for job in jobs if job.status == RUNNING)
+        queued = sum(1 for job in jobs if job.status == QUEUED)
+        return f"{running} đang xử lý, {queued} đang chờ, {len(jobs) - running - queued} đã xong"
+
+    def shutdown(self):
+        for job in self.list_jobs():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        token = current_job_id.set(job.job_id)
+        try:
+            job.result = self.handler(*job.args, progress=job.set_progress)
+            job.progress = 1.0
+            self._finish(job, DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            logger.error(f"Job {job.job_id} failed: {e}")
+            self._finish(job, FAILED)
+        finally:
+            current_job_id.reset(token)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished = time.time()
+        logger.info(f"Job {job.job_id} {status}")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished()]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src import MODEL_IDLE_TIMEOUT, MODEL_MEMORY_BUDGET_GB, VIDEOLLAMA_WORKER
+
+logger = logging.getLogger(__name__)
+
+# variant name -> (Hugging Face model id, estimated memory in GB)
+VIDEOLLAMA_VARIANTS = {
+    "videollama3-2b": ("DAMO-NLP-SG/VideoLLaMA3-2B", 8.0),
+    "videollama3-7b": ("DAMO-NLP-SG/VideoLLaMA3-7B", 18.0),
+}
+
+
+class ModelVariant:
+    """Registration and runtime state of one model variant"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], memory_gb: float):
+        self.name = name
+        self.factory = factory
+        self.memory_gb = memory_gb
+        self.instance = None
+        self.pins = 0
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()
+
+
+class ModelManager:
+    """Loads model variants lazily, pins them while requests are in flight and evicts idle ones"""
+
+    def __init__(self, idle_timeout: float = MODEL_IDLE_TIMEOUT, memory_budget_gb: float = MODEL_MEMORY_BUDGET_GB, check_interval: float = 30.0):
+        self.idle_timeout = idle_timeout
+        self.memory_budget_gb = memory_budget_gb
+        self.check_interval = check_interval
+        self.variants: Dict[str, ModelVariant] = {}
+        self.listeners: List[Callable[[str, str], None]] = []
+        self.lock = threading.RLock()
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def register(self, name: str, factory: Callable[[], Any], memory_gb: float):
+        """Register a variant; factory returns an object with load_model()/unload_model()"""
+        with self.lock:
+            self.variants[name] = ModelVariant(name, factory, memory_gb)
+
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """Subscribe to lifecycle events: callback(event, variant) with event in load/load_failed/evict"""
+        self.listeners.append(callback)
+
+    def _emit(self, event: str, name: str):
+        for callback in self.listeners:
+            try:
+                callback(event, name)
+            except Exception as e:
+                logger.error(f"Model event listener failed: {e}")
+
+    def is_loaded(self, name: str) -> bool:
+        variant = self.variants.get(name)
+        return bool(variant and variant.instance is not None)
+
+    def loaded_memory_gb(self) -> float:
+        with self.lock:
+            return sum(v.memory_gb for v in self.variants.values() if v.instance is not None)
+
+    def in_flight(self) -> int:
+        """Number of requests currently holding a model"""
+        with self.lock:
+            return sum(v.pins for v in self.variants.values())
+
+    def _make_room(self, needed_gb: float):
+        """Evict least recently used, unpinned variants until needed_gb fits in the budget"""
+        evicted = []
+        with self.lock:
+            candidates = sorted((v for v in self.variants.values() if v.instance is not None and v.pins == 0), key=lambda v: v.last_used)
+            for variant in candidates:
+                if self.loaded_memory_gb() + needed_gb <= self.memory_budget_gb:
+                    break
+                evicted.append(self._detach(variant))
+            loaded_gb = self.loaded_memory_gb()
+        self._unload(evicted)
+
+        if loaded_gb + needed_gb > self.memory_budget_gb:
+            raise RuntimeError(f"Memory budget exceeded: {loaded_gb:.1f}GB in use, {needed_gb:.1f}GB needed, budget {self.memory_budget_gb:.1f}GB")
+
+    def load(self, name: str):
+        """Load a variant if needed and return its instance"""
+        variant = self.variants.get(name)
+        if variant is None:
+            raise KeyError(f"Unknown model variant: {name}")
+
+        with variant.load_lock:
+            if variant.instance is not None:
+                return variant.instance
+
+            self._make_room(variant.memory_gb)
+
+            logger.info(f"Loading model variant {name} (~{variant.memory_gb:.1f}GB)")
+            instance = variant.factory()
+            if not instance.load_model():
+                self._emit("load_failed", name)
+                raise RuntimeError(f"Failed to load model variant {name}")
+
+            with self.lock:
+                variant.instance = instance
+                variant.last_used = time.time()
+
+        self._emit("load", name)
+        self._ensure_monitor()
+        return variant.instance
+
+    def _detach(self, variant: ModelVariant):
+        """Mark a variant unloaded (caller holds self.lock); returns (name, instance) for _unload"""
+        instance = variant.instance
+        variant.instance = None
+        return variant.name, instance
+
+    def _unload(self, detached):
+        """Unload detached instances outside self.lock, so a slow unload does not block acquire()"""
+        for name, instance in detached:
+            if instance is None:
+                continue
+            try:
+                instance.unload_model()
+            except Exception as e:
+                logger.error(f"Error unloading model variant {name}: {e}")
+            logger.info(f"Evicted model variant {name}")
+            self._emit("evict", name)
+
+    def evict(self, name: str) -> bool:
+        """Unload a variant unless a request is still using it"""
+        variant = self.variants.get(name)
+        if variant is None:
+            return False
+
+        with self.lock:
+            if variant.instance is None or variant.pins > 0:
+                return False
+            detached = self._detach(variant)
+        self._unload([detached])
+        return True
+
+    @contextmanager
+    def acquire(self, name: str):
+        """Pin a variant for the duration of a request, loading it on first use"""
+        variant = self.variants.get(name)
+        if variant is None:
+            raise KeyError(f"Unknown model variant: {name}")
+
+        with self.lock:
+            variant.pins += 1
+        try:
+            instance = self.load(name)
+            yield instance
+        finally:
+            with self.lock:
+                variant.pins -= 1
+                variant.last_used = time.time()
+
+    def evict_idle(self):
+        """Evict every unpinned variant that has been idle longer than idle_timeout"""
+        now = time.time()
+        with self.lock:
+            idle = [v for v in self.variants.values() if v.instance is not None and v.pins == 0 and now - v.last_used >= self.idle_timeout]
+            detached = [self._detach(variant) for variant in idle]
+        self._unload(detached)
+
+    def _ensure_monitor(self):
+        if self.idle_timeout <= 0 or (self._monitor_thread and self._monitor_thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor_thread.start()
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting idle models: {e}")
+
+    def shutdown(self):
+        """Stop the idle monitor and unload everything"""
+        self._stop_event.set()
+        with self.lock:
+            detached = [self._detach(variant) for variant in self.variants.values() if variant.instance is not None]
+        self._unload(detached)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get loaded state of all variants without importing model libraries"""
+        now = time.time()
+        with self.lock:
+            return {
+                "memory_budget_gb": self.memory_budget_gb,
+                "memory_loaded_gb": self.loaded_memory_gb(),
+                "idle_timeout": self.idle_timeout,
+                "variants": {
+                    v.name: {
+                        "loaded": v.instance is not None,
+                        "pins": v.pins,
+                        "memory_gb": v.memory_gb,
+                        "idle_seconds": now - v.last_used if v.instance is not None else None,
+                    }
+                    for v in self.variants.values()
+                },
+            }
+
+
+def create_videollama_manager() -> ModelManager:
+    """Create a manager with all VideoLLaMA3 variants registered; torch is only imported on first load"""
+    manager = ModelManager()
+
+    for name, (model_name, memory_gb) in VIDEOLLAMA_VARIANTS.items():
+
+        def factory(model_name=model_name):
+            # VIDEOLLAMA_WORKER=process keeps generation out of the UI/capture process
+            if VIDEOLLAMA_WORKER == "process":
+                from src.inference_worker import InferenceWorkerClient
+
+                return InferenceWorkerClient(model_name)
+
+            from src.videollama_detector import VideoLLamaFallDetector
+
+            return VideoLLamaFallDetector(model_name)
+
+        manager.register(name, factory, memory_gb)
+
+    return manager
@@ -0,0 +1,82 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Same thumbnail size the token planner uses for its motion score
+THUMBNAIL_SIZE = (32, 24)
+
+
+class MotionFeatureExtractor:
+    """Incremental dense optical flow on every Nth downscaled frame, so motion is paid for as frames arrive"""
+
+    def __init__(self, every_n: int = 3, width: int = 160, min_magnitude: float = 0.5):
+        self.every_n = max(1, every_n)
+        self.width = width
+        self.min_magnitude = min_magnitude  # flow (pixels at the processing width) that counts as moving
+        self.reset()
+
+    def reset(self):
+        self.frame_index = 0
+        self.previous: Optional[np.ndarray] = None
+        self.previous_time: Optional[float] = None
+        self.latest: Optional[Dict[str, Any]] = None
+
+    def update(self, frame: np.ndarray, timestamp: float) -> Optional[Dict[str, Any]]:
+        """Feed one frame; returns features for sampled frames (after the first), None otherwise"""
+        self.frame_index += 1
+        if (self.frame_index - 1) % self.every_n:
+            return None
+
+        height, width = frame.shape[:2]
+        small_height = max(1, int(height * self.width / width))
+        gray = cv2.cvtColor(cv2.resize(frame, (self.width, small_height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+        previous, previous_time = self.previous, self.previous_time
+        self.previous, self.previous_time = gray, timestamp
+        if previous is None or previous_time is None:
+            return None
+
+        dt = max(timestamp - previous_time, 1e-3)
+        flow = cv2.calcOpticalFlowFarneback(previous, gray, None, 0.5, 2, 9, 2, 5, 1.1, 0)
+        magnitude = np.hypot(flow[..., 0], flow[..., 1])
+        moving = magnitude >= self.min_magnitude
+        motion_area = float(moving.mean())
+
+        features = {
+            "timestamp": timestamp,
+            "motion_area": motion_area,
+            # Mean vertical flow of moving pixels in frame heights per second; positive is downwards
+            "downward_velocity": float(flow[..., 1][moving].mean() / small_height / dt) if motion_area > 0 else 0.0,
+            "mean_magnitude": float(magnitude.mean() / self.width / dt),
+            "thumbnail": thumbnail,
+        }
+
+        self.latest = features
+        return features
+
+
+def buffer_motion_features(frame_buffer: List[Dict]) -> List[Dict[str, Any]]:
+    """Precomputed features stored alongside a frame buffer (frames carry them under "motion")"""
+    return [f["motion"] for f in frame_buffer if f.get("motion") is not None]
+
+
+def summarize_motion(frame_buffer: List[Dict]) -> Optional[Dict[str, float]]:
+    """Window statistics from the precomputed features, or None when the buffer has none"""
+    features = buffer_motion_features(frame_buffer)
+    if not features:
+        return None
+
+    area = np.array([f["motion_area"] for f in features])
+    downward = np.array([f["downward_velocity"] for f in features])
+    return {
+        "samples": len(features),
+        "mean_motion_area": float(area.mean()),
+        "max_motion_area": float(area.max()),
+        "mean_downward_velocity": float(downward.mean()),
+        "max_downward_velocity": float(downward.max()),
+    }
@@ -0,0 +1,109 @@
+import logging
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from src.motion_features import MotionFeatureExtractor
+from src.video_reader import iter_sampled_frames
+
+logger = logging.getLogger(__name__)
+
+# Score bonus for staying on the previous moment's view, so the combined window does not flicker between cameras
+STICKY_BONUS = 0.1
+
+
+def load_view(
+    path: str,
+    sample_fps: float,
+    max_frames: int,
+    offset: float = 0.0,
+    max_width: Optional[int] = None,
+    motion_width: int = 160,
+    reader: Callable[..., Iterator[Dict]] = iter_sampled_frames,
+) -> List[Dict]:
+    """Sampled frames of one camera with motion features, timestamps shifted by the camera's offset"""
+    frames = []
+    extractor = MotionFeatureExtractor(1, motion_width)
+    for sample in reader(path, sample_fps, max_frames, max_width=max_width):
+        sample["timestamp"] += offset
+        sample["motion"] = extractor.update(sample["frame"], sample["timestamp"])
+        frames.append(sample)
+    return frames
+
+
+def align_views(views: Sequence[List[Dict]], interval: float, tolerance: Optional[float] = None) -> List[List[Optional[Dict]]]:
+    """Frames of every view at common ticks: per tick, each view's nearest frame within tolerance (or None)"""
+    if not any(views):
+        return []
+
+    tolerance = interval / 2 if tolerance is None else tolerance
+    start = min(view[0]["timestamp"] for view in views if view)
+    end = max(view[-1]["timestamp"] for view in views if view)
+    ticks = np.arange(start, end + interval / 2, interval)
+
+    columns = []
+    for view in views:
+        if not view:
+            # Keep the column so row positions still match the camera order
+            columns.append([None] * len(ticks))
+            continue
+        times = np.array([f["timestamp"] for f in view])
+        nearest = np.clip(np.searchsorted(times, ticks), 1, len(times) - 1) if len(times) > 1 else np.zeros(len(ticks), dtype=int)
+        if len(times) > 1:
+            # searchsorted gives the right neighbour; step back where the left one is closer
+            nearest -= (ticks - times[nearest - 1]) < (times[nearest] - ticks)
+        in_range = np.abs(times[nearest] - ticks) <= tolerance
+        columns.append([view[i] if ok else None for i, ok in zip(nearest, in_range)])
+    return [list(row) for row in zip(*columns)]
+
+
+def view_score(frame_data: Dict, person_detector=None) -> float:
+    """How informative a view is at this moment: its moving area, plus the largest person's size when a detector is given"""
+    motion = frame_data.get("motion") or {}
+    score = motion.get("motion_area", 0.0) + motion.get("downward_velocity", 0.0)
+    if person_detector is not None:
+        height, width = frame_data["frame"].shape[:2]
+        boxes = person_detector.detect(frame_data["frame"])
+        score += max((w * h / (width * height) for _, _, w, h, _ in boxes), default=0.0)
+    return float(score)
+
+
+def select_views(aligned: List[List[Optional[Dict]]], person_detector=None) -> List[Dict]:
+    """One frame per tick from the best view, tagged with its "view" index"""
+    selected = []
+    previous = None
+    for row in aligned:
+        scores = [view_score(f, person_detector) + (STICKY_BONUS if i == previous else 0.0) if f is not None else -np.inf for i, f in enumerate(row)]
+        best = int(np.argmax(scores))
+        frame_data = row[best]
+        if frame_data is None:
+            continue
+        selected.append({**frame_data, "view": best})
+        previous = best
+    return selected
+
+
+def combine_views(
+    paths: Sequence[str],
+    sample_fps: float = 5.0,
+    max_frames: int = 16,
+    offsets: Optional[Sequence[float]] = None,
+    max_width: Optional[int] = None,
+    person_detector=None,
+    reader: Callable[..., Iterator[Dict]] = iter_sampled_frames,
+) -> List[Dict]:
+    """One time-aligned window over several cameras of a room, using the best view at each moment"""
+    offsets = offsets or [0.0] * len(paths)
+    views = [load_view(path, sample_fps, max_frames, offset, max_width, reader=reader) for path, offset in zip(paths, offsets)]
+
+    # Long videos are sampled sparser than sample_fps; align on the actual spacing
+    spacing = [np.median(np.diff([f["timestamp"] for f in view])) for view in views if len(view) > 1]
+    interval = max([1.0 / sample_fps] + spacing)
+    selected = select_views(align_views(views, interval), person_detector)
+
+    if len(selected) > max_frames:
+        selected = [selected[i] for i in np.linspace(0, len(selected) - 1, max_frames).astype(int)]
+
+    counts = np.bincount([f["view"] for f in selected], minlength=len(paths)) if selected else np.zeros(len(paths), dtype=int)
+    logger.info("Multi-view window: " + ", ".join(f"camera {i}: {int(c)} frames" for i, c in enumerate(counts)))
+    return selected
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.video_reader import (
+    iter_frames_at,
+    iter_sampled_frames,
+    probe_video,
+    sample_indices,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def output_size(width: int, height: int, max_width: Optional[int]) -> Tuple[int, int]:
+    """Frame size after resize_to_width, known before anything is decoded"""
+    if not max_width or width <= max_width:
+        return width, height
+    return max_width, int(height * max_width / width)
+
+
+def _decode_chunk(path: str, indices: List[int], max_width: Optional[int], shm_name: str, shape: Tuple[int, ...]) -> List[Tuple[int, float]]:
+    """Worker: decode one chunk's frames straight into the parent's shared memory; returns (index, timestamp) per frame"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out: np.ndarray = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        meta = []
+        for i, sample in enumerate(iter_frames_at(path, indices, max_width)):
+            frame = sample["frame"]
+            if frame.shape != out.shape[1:]:
+                frame = cv2.resize(frame, (out.shape[2], out.shape[1]), interpolation=cv2.INTER_AREA)
+            out[i] = frame
+            meta.append((sample["index"], sample["timestamp"]))
+        return meta
+    finally:
+        shm.close()
+
+
+class ParallelDecoder:
+    """Decodes time ranges of one file in a process pool, each worker seeking to its range start"""
+
+    def __init__(self, workers: int = 0, chunk_seconds: float = 60.0, min_frames: int = 500):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds
+        # Below this many sampled frames the pool costs more than it saves; those are decoded in the calling thread
+        self.min_frames = min_frames
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """The pool is started on first use and kept: spawning workers (which import src again) is paid once"""
+        with self.lock:
+            if self.executor is None:
+                # spawn: the callers are threaded (UI, worker pools), which does not mix with fork
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def plan_chunks(self, info: Dict[str, Any], sample_fps: float, max_frames: Optional[int], start: float, end: Optional[float]) -> List[List[int]]:
+        """Sampled frame indices grouped into chunk_seconds time ranges"""
+        fps = info["fps"]
+        indices = sample_indices(info["total_frames"], fps, sample_fps, max_frames or info["total_frames"], start, end)
+        chunk_frames = max(1, int(self.chunk_seconds * fps))
+        chunks: Dict[int, List[int]] = {}
+        for index in indices:
+            chunks.setdefault(int(index) // chunk_frames, []).append(int(index))
+        return [chunks[key] for key in sorted(chunks)]
+
+    def iter_frames(
+        self,
+        path: str,
+        sample_fps: float = 15.0,
+        max_frames: int = 120,
+        start: float = 0.0,
+        end: Optional[float] = None,
+        max_width: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Drop-in for iter_sampled_frames: yields {"frame", "timestamp", "index"} in order, decoding spread over processes"""
+        info = probe_video(path)
+        chunks = self.plan_chunks(info, sample_fps, max_frames, start, end) if info["total_frames"] > 0 and info["fps"] > 0 else []
+        total = sum(len(c) for c in chunks)
+        if total < self.min_frames or len(chunks) < 2 or self.workers < 2:
+            # Few frames (a window, a short clip) or unknown length: decoded here
+            yield from iter_sampled_frames(path, sample_fps, max_frames, start, end, max_width)
+            return
+
+        width, height = output_size(info["width"], info["height"], max_width)
+        logger.info(f"Decoding {path}: {total} frames in {len(chunks)} chunks on {self.workers} processes")
+
+        executor = self.get_executor()
+        pending: Deque[Tuple[Future, shared_memory.SharedMemory, Tuple[int, ...]]] = deque()  # in chunk order
+        remaining = iter(chunks)
+        frames: Optional[np.ndarray] = None  # view of the chunk being yielded; must be released before its shared memory is closed
+
+        def submit_next() -> bool:
+            indices = next(remaining, None)
+            if indices is None:
+                return False
+            shape = (len(indices), height, width, 3)
+            shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+            pending.append((executor.submit(_decode_chunk, path, indices, max_width, shm.name, shape), shm, shape))
+            return True
+
+        try:
+            # One chunk queued ahead per worker keeps every core busy while bounding memory
+            for _ in range(self.workers * 2):
+                if not submit_next():
+                    break
+
+            while pending:
+                future, shm, shape = pending[0]
+                meta = future.result()
+                frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                for i, (index, timestamp) in enumerate(meta):
+                    # Copied out before yielding: nothing the consumer keeps points into shared memory
+                    frame = frames[i].copy()
+                    yield {"frame": frame, "timestamp": timestamp, "index": index}
+                frames = None
+                pending.popleft()
+                shm.close()
+                shm.unlink()
+                submit_next()
+        finally:
+            # Consumer stopped early or a worker failed: let running chunks finish before freeing their memory
+            frames = None
+            for future, shm, _ in pending:
+                future.cancel()
+            for future, shm, _ in pending:
+                if not future.cancelled():
+                    future.exception()
+                shm.close()
+                shm.unlink()
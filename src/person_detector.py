@@ -0,0 +1,159 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Class id of "person" in the 20-class VOC MobileNet-SSD Caffe model
+MOBILENET_SSD_PERSON = 15
+
+
+class PersonDetector:
+    """CPU person detector: OpenCV HOG by default, MobileNet-SSD via OpenCV DNN when model files are given"""
+
+    def __init__(self, prototxt: str = "", caffemodel: str = "", input_width: int = 640, min_score: float = 0.5):
+        self.input_width = input_width
+        self.min_score = min_score
+        self.net = None
+        # One detector is shared by the live loop and concurrent upload windows; setInput()/forward() must not interleave
+        self.lock = threading.Lock()
+
+        if prototxt and caffemodel:
+            try:
+                self.net = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
+                self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+                logger.info("Person detector: MobileNet-SSD (OpenCV DNN)")
+            except Exception as e:
+                logger.warning(f"Could not load MobileNet-SSD, using HOG person detector: {e}")
+
+        if self.net is None:
+            self.hog = cv2.HOGDescriptor()
+            self.hog.setSVMDetector(cv2.HOGDescriptor.getDefaultPeopleDetector())
+
+    @property
+    def fits_box_shape(self) -> bool:
+        """Whether box proportions follow the person: HOG always returns its fixed 64x128 window shape"""
+        return self.net is not None
+
+    def detect(self, frame: np.ndarray) -> List[Tuple[int, int, int, int, float]]:
+        """Return person boxes (x, y, w, h, score) in original frame coordinates"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.input_width / width)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+
+        with self.lock:
+            if self.net is not None:
+                boxes = self._detect_dnn(self.net, small)
+            else:
+                boxes = self._detect_hog(small)
+
+        return [(int(x / scale), int(y / scale), int(w / scale), int(h / scale), score) for x, y, w, h, score in boxes]
+
+    def _detect_hog(self, frame):
+        rects, weights = self.hog.detectMultiScale(frame, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        return [(x, y, w, h, float(score)) for (x, y, w, h), score in zip(rects, np.ravel(weights)) if score >= self.min_score]
+
+    def _detect_dnn(self, net, frame):
+        height, width = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
+        net.setInput(blob)
+        detections = net.forward()[0, 0]
+
+        boxes = []
+        for _, class_id, score, x1, y1, x2, y2 in detections:
+            if int(class_id) == MOBILENET_SSD_PERSON and score >= self.min_score:
+                x1, y1, x2, y2 = x1 * width, y1 * height, x2 * width, y2 * height
+                boxes.append((x1, y1, x2 - x1, y2 - y1, float(score)))
+        return boxes
+
+
+def posture_features(detections: List[List[Tuple]], frame_height: int) -> Dict[str, float]:
+    """Posture of the largest person per sampled frame: max width/height ratio, head (box top) drop and box height shrink"""
+    largest = [max(boxes, key=lambda b: b[2] * b[3]) for boxes in detections if boxes]
+    if not largest:
+        return {"person_frames": 0, "max_aspect_ratio": 0.0, "head_drop": 0.0, "height_shrink": 0.0, "person_lost": False}
+
+    aspect_ratios = np.array([w / max(h, 1) for _, _, w, h, _ in largest])
+    tops = np.array([y / frame_height for _, y, _, _, _ in largest])
+    heights = np.array([h for _, _, _, h, _ in largest], dtype=float)
+
+    return {
+        "person_frames": len(largest),
+        "max_aspect_ratio": float(aspect_ratios.max()),
+        # How far the highest point of the person moved down since the first sighting (fraction of frame height)
+        "head_drop": float(tops.max() - tops[0]) if len(tops) > 1 else 0.0,
+        # How much shorter the box got since the first sighting; HOG boxes keep their shape but shrink as the person goes down
+        "height_shrink": float(1 - heights.min() / max(heights[0], 1)) if len(heights) > 1 else 0.0,
+        # Upright-trained detectors usually lose a person once they are lying down
+        "person_lost": bool(detections[0]) and not detections[-1],
+    }
+
+
+class PersonPrefilter:
+    """First cascade stage: only windows with a person in a suspicious posture go on to the VLM"""
+
+    def __init__(
+        self,
+        detector: PersonDetector,
+        num_frames: int = 4,
+        aspect_ratio_threshold: float = 0.9,
+        head_drop_threshold: float = 0.2,
+        height_shrink_threshold: float = 0.35,
+        memory_seconds: Optional[float] = 10.0,
+    ):
+        self.detector = detector
+        self.num_frames = num_frames
+        # The lying-posture (wide box) rule only applies to detectors whose boxes follow the body (MobileNet-SSD)
+        self.aspect_ratio_threshold: Optional[float] = aspect_ratio_threshold if detector.fits_box_shape else None
+        self.head_drop_threshold = head_drop_threshold
+        self.height_shrink_threshold = height_shrink_threshold
+        # Remember the last person across consecutive windows of one live source; None when windows are not in time order
+        self.memory_seconds = memory_seconds
+        self.last_person_time: Optional[float] = None
+        self.stats = {"windows": 0, "no_person": 0, "normal_posture": 0, "escalated": 0}
+        self.lock = threading.Lock()  # guards last_person_time and stats; windows may be checked from several threads
+
+    def check(self, frame_buffer: List[Dict]) -> Tuple[bool, str, Dict[str, float]]:
+        """Return (escalate, reason, posture features) for a window"""
+        indices = np.linspace(0, len(frame_buffer) - 1, min(self.num_frames, len(frame_buffer))).astype(int)
+        detections = [self.detector.detect(frame_buffer[i]["frame"]) for i in indices]
+        features = posture_features(detections, frame_buffer[0]["frame"].shape[0])
+
+        with self.lock:
+            self.stats["windows"] += 1
+            return self._decide(features, frame_buffer[-1]["timestamp"])
+
+    def _decide(self, features: Dict[str, float], window_end: float) -> Tuple[bool, str, Dict[str, float]]:
+        """Escalation decision for a window's posture features; caller holds self.lock"""
+        if features["person_frames"] == 0:
+            # A person seen moments ago who is no longer detected may be lying on the floor
+            if self.memory_seconds is not None and self.last_person_time is not None and 0 <= window_end - self.last_person_time <= self.memory_seconds:
+                self.stats["escalated"] += 1
+                return True, "Người vừa biến mất khỏi khung hình (có thể đã ngã)", features
+            self.stats["no_person"] += 1
+            return False, "Không có người trong khung hình", features
+
+        self.last_person_time = window_end
+
+        if features["person_lost"]:
+            self.stats["escalated"] += 1
+            return True, "Người biến mất khỏi khung hình trong cửa sổ phân tích (có thể đã ngã)", features
+
+        lying = self.aspect_ratio_threshold is not None and features["max_aspect_ratio"] >= self.aspect_ratio_threshold
+        if lying or features["head_drop"] >= self.head_drop_threshold or features["height_shrink"] >= self.height_shrink_threshold:
+            self.stats["escalated"] += 1
+            reason = (
+                f"Tư thế đáng ngờ (tỉ lệ khung {features['max_aspect_ratio']:.2f}, đầu hạ {features['head_drop']:.0%}, "
+                f"chiều cao giảm {features['height_shrink']:.0%})"
+            )
+            return True, reason, features
+
+        self.stats["normal_posture"] += 1
+        return False, "Có người trong khung hình, tư thế bình thường", features
+
+    def get_stats_text(self) -> str:
+        stats = self.stats
+        return f"{stats['windows']} cửa sổ: {stats['no_person']} không có người, {stats['normal_posture']} tư thế bình thường, {stats['escalated']} chuyển tiếp"
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTH = 160
+MAX_THUMBNAILS = 16
+
+
+def cache_key(content_hashes: Sequence[str], settings: Dict[str, Any]) -> str:
+    """Key of one analysis: the content of the input file(s) plus every setting that changes the result"""
+    payload = json.dumps({"content": list(content_hashes), "settings": settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """On-disk analysis results (verdicts, timelines, thumbnails of the sampled frames), one directory per key"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result_file = os.path.join(self.path(key), "result.json")
+        if not os.path.exists(result_file):
+            return None
+        try:
+            with open(result_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {e}")
+            return None
+
+    def put(self, key: str, result: Dict[str, Any], frames: Optional[List[Dict]] = None):
+        """Store a JSON-serializable result and thumbnails of its frames; written to a temp dir and renamed into place"""
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(target))
+        try:
+            for i, frame_data in enumerate(self.pick_thumbnail_frames(frames or [])):
+                frame = frame_data["frame"]
+                height, width = frame.shape[:2]
+                if width > THUMBNAIL_WIDTH:
+                    frame = cv2.resize(frame, (THUMBNAIL_WIDTH, int(height * THUMBNAIL_WIDTH / width)), interpolation=cv2.INTER_AREA)
+                cv2.imwrite(os.path.join(staging, f"thumb_{i:03d}.jpg"), frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            with open(os.path.join(staging, "result.json"), "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+
+            if os.path.exists(target):
+                shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        except Exception as e:
+            logger.warning(f"Could not store cache entry {key}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def thumbnails(self, key: str) -> List[np.ndarray]:
+        directory = self.path(key)
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(name for name in os.listdir(directory) if name.startswith("thumb_"))
+        return [cv2.imread(os.path.join(directory, name)) for name in names]
+
+    @staticmethod
+    def pick_thumbnail_frames(frames: List[Dict]) -> List[Dict]:
+        if len(frames) <= MAX_THUMBNAILS:
+            return frames
+        return [frames[i] for i in np.linspace(0, len(frames) - 1, MAX_THUMBNAILS).astype(int)]
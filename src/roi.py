@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # x1, y1, x2, y2
+
+
+def parse_zones(spec: str) -> List[Tuple[float, float, float, float]]:
+    """Parse "x1,y1,x2,y2;..." rectangles given as fractions of the frame size"""
+    zones = []
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        x1, y1, x2, y2 = (float(v) for v in part.split(","))
+        zones.append((x1, y1, x2, y2))
+    return zones
+
+
+def union_box(boxes: Sequence[Box]) -> Optional[Box]:
+    if not boxes:
+        return None
+    array = np.array(boxes)
+    return int(array[:, 0].min()), int(array[:, 1].min()), int(array[:, 2].max()), int(array[:, 3].max())
+
+
+def expand_box(box: Box, margin: float, width: int, height: int) -> Box:
+    """Grow a box by margin (fraction of its size) on every side, clipped to the frame"""
+    x1, y1, x2, y2 = box
+    dx, dy = int((x2 - x1) * margin), int((y2 - y1) * margin)
+    return max(0, x1 - dx), max(0, y1 - dy), min(width, x2 + dx), min(height, y2 + dy)
+
+
+def crop_to_roi(frame: np.ndarray, roi: Optional[Box] = None, max_side: Optional[int] = None) -> np.ndarray:
+    """Crop a frame to the ROI and shrink it so its longest side is at most max_side"""
+    if roi is not None:
+        x1, y1, x2, y2 = roi
+        frame = frame[y1:y2, x1:x2]
+
+    if max_side:
+        height, width = frame.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    return frame
+
+
+class RoiCropper:
+    """Finds the region of a window worth sending to the model: the union of people across frames, or configured zones"""
+
+    def __init__(
+        self,
+        detector=None,
+        zones: Optional[List[Tuple[float, float, float, float]]] = None,
+        margin: float = 0.25,
+        max_side: int = 384,
+        num_frames: int = 4,
+        max_coverage: float = 0.8,
+    ):
+        self.detector = detector
+        self.zones = zones or []
+        self.margin = margin
+        self.max_side = max_side
+        self.num_frames = num_frames
+        self.max_coverage = max_coverage
+
+    def find_roi(self, frame_buffer: List[Dict], detect_frames: Optional[List[Dict]] = None) -> Optional[Box]:
+        """Return the crop box for a window, or None to keep the full frame; detect_frames: the window at a higher resolution"""
+        if not frame_buffer:
+            return None
+
+        height, width = frame_buffer[0]["frame"].shape[:2]
+        boxes = []
+
+        if self.detector is not None:
+            # People are found on the higher-resolution frames when given, their boxes scaled to frame_buffer
+            detect_frames = detect_frames or frame_buffer
+            scale = width / detect_frames[0]["frame"].shape[1]
+            indices = np.linspace(0, len(detect_frames) - 1, min(self.num_frames, len(detect_frames))).astype(int)
+            for i in indices:
+                for x, y, w, h, _ in self.detector.detect(detect_frames[i]["frame"]):
+                    boxes.append((int(x * scale), int(y * scale), int((x + w) * scale), int((y + h) * scale)))
+
+        # Without a person in view, fall back to the configured zones (e.g. floor and bed areas)
+        if not boxes:
+            boxes = [(int(x1 * width), int(y1 * height), int(x2 * width), int(y2 * height)) for x1, y1, x2, y2 in self.zones]
+
+        roi = union_box(boxes)
+        if roi is None:
+            return None
+
+        roi = expand_box(roi, self.margin, width, height)
+        x1, y1, x2, y2 = roi
+        if (x2 - x1) * (y2 - y1) >= self.max_coverage * width * height:
+            return None
+        return roi
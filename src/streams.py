@@ -0,0 +1,58 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DualResolutionStreams:
+    """Splits one capture into a small analysis stream and a full-resolution evidence stream at reduced fps"""
+
+    def __init__(self, analysis_width: int = 320, evidence_fps: float = 5.0, evidence_seconds: float = 10.0):
+        self.analysis_width = analysis_width
+        self.evidence_interval = 1.0 / evidence_fps if evidence_fps > 0 else 0.0
+        self.evidence_seconds = evidence_seconds
+        self.evidence: Deque[Dict] = deque()
+        self.last_evidence_time: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def push(self, frame: np.ndarray, timestamp: float) -> np.ndarray:
+        """Add a captured frame; returns its analysis-stream version (resized once here, never by consumers)"""
+        # Small tolerance so capture jitter does not skip a whole frame period
+        if self.last_evidence_time is None or timestamp - self.last_evidence_time >= 0.95 * self.evidence_interval:
+            self.last_evidence_time = timestamp
+            with self.lock:
+                self.evidence.append({"frame": frame, "timestamp": timestamp})
+                while self.evidence and timestamp - self.evidence[0]["timestamp"] > self.evidence_seconds:
+                    self.evidence.popleft()
+
+        height, width = frame.shape[:2]
+        if not self.analysis_width or width <= self.analysis_width:
+            return frame
+        scale = self.analysis_width / width
+        return cv2.resize(frame, (self.analysis_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def evidence_frames(self, since: Optional[float] = None) -> List[Dict]:
+        """Full-resolution frames for alerts and saved evidence, optionally only those after a timestamp"""
+        with self.lock:
+            frames = list(self.evidence)
+        if since is not None:
+            frames = [f for f in frames if f["timestamp"] >= since]
+        return frames
+
+    def detection_frames(self, since: float, mask: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> List[Dict]:
+        """Full-resolution frames of a window for the person detector, with mask (e.g. CameraZones.apply) applied to copies"""
+        # HOG needs people ~128 px tall, which the analysis stream is too small for
+        frames = self.evidence_frames(since)
+        if mask is not None:
+            frames = [{**f, "frame": mask(f["frame"])} for f in frames]
+        return frames
+
+    def clear(self):
+        with self.lock:
+            self.evidence.clear()
+        self.last_evidence_time = None
@@ -0,0 +1,96 @@
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+SUSPECT = "suspect"
+ALERTED = "alerted"
+
+
+def offset_frames(frame_buffer: List[Dict], max_frames: int) -> List[Dict]:
+    """Frames between the ones an evenly spaced sample of max_frames would pick, for a second look at a window"""
+    step = max(1, len(frame_buffer) // max(1, max_frames))
+    return frame_buffer[step // 2 :] if step > 1 else frame_buffer
+
+
+class TemporalFallFilter:
+    """Per-camera hysteresis over window scores: confirm before alerting, one alert per fall event"""
+
+    def __init__(
+        self,
+        smoothing: float = 0.5,
+        alert_score: float = 0.7,
+        clear_score: float = 0.3,
+        realert_seconds: float = 300.0,
+    ):
+        self.smoothing = smoothing  # weight of the previous smoothed score
+        self.alert_score = alert_score  # smoothed score that alerts without a re-check (consecutive fall windows)
+        self.clear_score = clear_score  # smoothed score below which an alerted event is over
+        self.realert_seconds = realert_seconds  # remind again if the same event is still going on
+        self.reset()
+
+    def reset(self):
+        self.state = IDLE
+        self.score = 0.0
+        self.event_start: Optional[float] = None
+        self.last_alert_time: Optional[float] = None
+        self.stats = {"windows": 0, "alerts": 0, "rechecks": 0, "rejected": 0, "suppressed": 0}
+
+    def update(self, score: Optional[float], timestamp: float, recheck: Optional[Callable[[], Optional[float]]] = None) -> str:
+        """Feed one window's fall score (0-1, None when analysis failed); returns "alert", "suspect", "suppressed" or "clear" """
+        self.stats["windows"] += 1
+        if score is None:
+            return {IDLE: "clear", SUSPECT: SUSPECT, ALERTED: "suppressed"}[self.state]
+
+        self.score = self.smoothing * self.score + (1 - self.smoothing) * score
+        is_fall = score >= 0.5
+
+        if self.state == ALERTED:
+            if self.score <= self.clear_score:
+                logger.info("Fall event ended")
+                self.state = IDLE
+                self.event_start = None
+            elif is_fall and self.last_alert_time is not None and timestamp - self.last_alert_time < self.realert_seconds:
+                self.stats["suppressed"] += 1
+                return "suppressed"
+            elif is_fall:
+                return self._alert(timestamp)
+            else:
+                return "suppressed"
+
+        if not is_fall:
+            if self.state == SUSPECT and self.score <= self.clear_score:
+                self.state = IDLE
+            return "clear" if self.state == IDLE else SUSPECT
+
+        # Several windows in a row agree: alert without spending a re-check
+        if self.score >= self.alert_score:
+            return self._alert(timestamp)
+
+        # First suspicious window: take a quick second look at the same buffer instead of waiting a full interval
+        if recheck is not None:
+            self.stats["rechecks"] += 1
+            recheck_score = recheck()
+            if recheck_score is not None and recheck_score >= 0.5:
+                self.score = max(self.score, self.alert_score)
+                return self._alert(timestamp)
+            if recheck_score is not None:
+                self.stats["rejected"] += 1
+
+        self.state = SUSPECT
+        return SUSPECT
+
+    def _alert(self, timestamp: float) -> str:
+        self.state = ALERTED
+        self.event_start = self.event_start or timestamp
+        self.last_alert_time = timestamp
+        self.stats["alerts"] += 1
+        return "alert"
+
+    def get_stats_text(self) -> str:
+        stats = self.stats
+        return (
+            f"{self.state} (điểm {self.score:.2f}) - {stats['alerts']} cảnh báo, {stats['rechecks']} kiểm tra lại, "
+            f"{stats['rejected']} bị bác, {stats['suppressed']} trùng sự kiện"
+        )
@@ -0,0 +1,137 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.geometric_detector import GeometricFallDetector
+from src.motion_features import MotionFeatureExtractor, buffer_motion_features
+from src.utils import is_verdict
+from src.video_reader import iter_sampled_frames
+
+logger = logging.getLogger(__name__)
+
+# Analyzer for one window of frames, returning a verdict string (or None when analysis failed)
+WindowAnalyzer = Callable[[List[Dict]], Optional[str]]
+
+
+def plan_windows(duration: float, window_seconds: float, overlap: float) -> List[Tuple[float, float]]:
+    """Overlapping (start, end) windows covering the whole video; the last one is aligned to the end"""
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+
+    step = max(window_seconds * (1 - overlap), 1e-3)
+    windows = []
+    start = 0.0
+    while start + window_seconds < duration:
+        windows.append((start, start + window_seconds))
+        start += step
+    windows.append((max(0.0, duration - window_seconds), duration))
+    return windows
+
+
+def locate_fall(frames: List[Dict], geometric_detector: Optional[GeometricFallDetector] = None) -> float:
+    """Best estimate of when the fall happens in a window: geometric drop, else peak downward motion, else the middle"""
+    detector = geometric_detector or GeometricFallDetector()
+    result = detector.analyze(frames)
+    if result["fall_time"] is not None:
+        return result["fall_time"]
+
+    features = buffer_motion_features(frames)
+    if features:
+        return max(features, key=lambda f: f["downward_velocity"])["timestamp"]
+    return (frames[0]["timestamp"] + frames[-1]["timestamp"]) / 2
+
+
+def fall_events(timeline: List[Dict]) -> List[Dict]:
+    """Merge overlapping fall windows into events: {start, end, fall_time, verdict, windows}"""
+    events: List[Dict] = []
+    for entry in sorted(timeline, key=lambda e: e["start"]):
+        if not entry["fall"]:
+            continue
+        if events and entry["start"] <= events[-1]["end"]:
+            events[-1]["end"] = max(events[-1]["end"], entry["end"])
+            events[-1]["windows"] += 1
+            continue
+        events.append({"start": entry["start"], "end": entry["end"], "fall_time": entry["fall_time"], "verdict": entry["verdict"], "windows": 1})
+    return events
+
+
+def format_timeline(timeline: List[Dict]) -> str:
+    lines = []
+    for entry in sorted(timeline, key=lambda e: e["start"]):
+        icon = "🚨" if entry["fall"] else ("✅" if is_verdict(entry["verdict"]) else "❓")
+        at = f" (té ngã lúc {entry['fall_time']:.1f}s)" if entry["fall"] else ""
+        lines.append(f"{icon} {entry['start']:6.1f}s - {entry['end']:6.1f}s{at}: {entry['verdict'] or 'Không phân tích được'}")
+    return "\n".join(lines)
+
+
+class TimelineAnalyzer:
+    """Splits a video into overlapping windows and analyzes them through a bounded thread pool"""
+
+    def __init__(
+        self,
+        analyze: WindowAnalyzer,
+        window_seconds: float = 10.0,
+        overlap: float = 0.5,
+        max_workers: int = 4,
+        sample_fps: float = 15.0,
+        max_frames: int = 120,
+        max_width: Optional[int] = None,
+        motion_width: int = 160,
+        geometric_detector: Optional[GeometricFallDetector] = None,
+        reader: Callable[..., Iterator[Dict]] = iter_sampled_frames,
+    ):
+        self.analyze = analyze
+        self.window_seconds = window_seconds
+        self.overlap = overlap
+        self.max_workers = max(1, max_workers)
+        self.sample_fps = sample_fps
+        self.max_frames = max_frames
+        self.max_width = max_width
+        self.motion_width = motion_width
+        self.geometric_detector = geometric_detector
+        self.reader = reader  # iter_sampled_frames or a frame cache with the same signature
+
+    def run(self, path: str, duration: float, progress: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """Per-window entries {start, end, verdict, fall, fall_time, frames}; frames are only kept for fall windows"""
+        windows = plan_windows(duration, self.window_seconds, self.overlap)
+        logger.info(f"Analyzing {path} as {len(windows)} windows of {self.window_seconds:.0f}s with {self.max_workers} workers")
+
+        timeline = []
+        # At most max_workers windows are read and held in memory at a time
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="timeline") as executor:
+            # Each window runs in a copy of the caller's context, so context variables such as the job id carry over
+            futures = [executor.submit(contextvars.copy_context().run, self.analyze_window, path, start, end) for start, end in windows]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    timeline.append(future.result())
+                    if progress:
+                        progress(done, len(windows))
+            except BaseException:
+                # e.g. the job was cancelled from its progress callback: drop windows that have not started
+                for future in futures:
+                    future.cancel()
+                raise
+
+        timeline.sort(key=lambda e: e["start"])
+        return timeline
+
+    def analyze_window(self, path: str, start: float, end: float) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"start": start, "end": end, "verdict": None, "fall": False, "fall_time": None, "frames": None}
+        try:
+            frames = []
+            motion_extractor = MotionFeatureExtractor(1, self.motion_width)
+            for sample in self.reader(path, self.sample_fps, self.max_frames, start, end, self.max_width):
+                sample["motion"] = motion_extractor.update(sample["frame"], sample["timestamp"])
+                frames.append(sample)
+            if not frames:
+                return entry
+
+            entry["verdict"] = self.analyze(frames)
+            if entry["verdict"] and entry["verdict"].startswith("PHÁT_HIỆN_TÉ_NGÃ"):
+                entry["fall"] = True
+                entry["fall_time"] = locate_fall(frames, self.geometric_detector)
+                entry["frames"] = frames
+        except Exception as e:
+            logger.error(f"Window {start:.1f}s-{end:.1f}s of {path} failed: {e}")
+        return entry
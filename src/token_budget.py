@@ -0,0 +1,102 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from src.motion_features import THUMBNAIL_SIZE, buffer_motion_features
+
+# VideoLLaMA3 uses 14px patches and merges 2x2 patches into one token for video frames
+PATCH_SIZE = 14
+VIDEO_MERGE_SIZE = 2
+
+PRESETS = {
+    "fast": {"max_frames": 8, "max_side": 320, "min_side": 160, "token_ceiling": 1024},
+    "balanced": {"max_frames": 16, "max_side": 448, "min_side": 224, "token_ceiling": 3072},
+    "quality": {"max_frames": 64, "max_side": 640, "min_side": 336, "token_ceiling": 16384},
+}
+
+# Mean absolute frame difference (0-1) below which a window counts as calm / above which as busy
+CALM_MOTION = 0.01
+BUSY_MOTION = 0.04
+
+
+def tokens_per_frame(width: int, height: int) -> int:
+    """Estimate visual tokens VideoLLaMA3 spends on one frame"""
+    patches = math.ceil(width / PATCH_SIZE) * math.ceil(height / PATCH_SIZE)
+    return math.ceil(patches / (VIDEO_MERGE_SIZE * VIDEO_MERGE_SIZE))
+
+
+def estimate_motion(frame_buffer: List[Dict], samples: int = 8) -> float:
+    """Cheap motion score: mean absolute difference of tiny grayscale thumbnails"""
+    # Thumbnails precomputed in the capture loop are used when the buffer carries them
+    precomputed = buffer_motion_features(frame_buffer)
+    if len(precomputed) >= 2:
+        indices = np.linspace(0, len(precomputed) - 1, min(samples, len(precomputed))).astype(int)
+        thumbs = np.stack([precomputed[i]["thumbnail"] for i in indices]).astype(np.float32)
+        return float(np.abs(np.diff(thumbs, axis=0)).mean() / 255.0)
+
+    if len(frame_buffer) < 2:
+        return 0.0
+
+    indices = np.linspace(0, len(frame_buffer) - 1, min(samples, len(frame_buffer))).astype(int)
+    grays = [cv2.cvtColor(frame_buffer[i]["frame"], cv2.COLOR_BGR2GRAY) for i in indices]
+    thumbs = np.stack([cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA) for gray in grays]).astype(np.float32)
+    return float(np.abs(np.diff(thumbs, axis=0)).mean() / 255.0)
+
+
+class VisualTokenPlanner:
+    """Chooses frame count and input resolution per VideoLLaMA3 request"""
+
+    def __init__(self, preset: str = "balanced", token_ceiling: int = 0):
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown token budget preset: {preset}")
+        self.preset = preset
+        self.settings = PRESETS[preset]
+        self.token_ceiling = token_ceiling or self.settings["token_ceiling"]
+
+    def plan(self, frame_buffer: List[Dict], motion: Optional[float] = None, queue_depth: int = 0) -> Dict[str, Any]:
+        """Return frame indices, target size, sampling fps and estimated visual tokens for a window"""
+        if motion is None:
+            motion = estimate_motion(frame_buffer)
+
+        height, width = frame_buffer[0]["frame"].shape[:2]
+        window_seconds = max(frame_buffer[-1]["timestamp"] - frame_buffer[0]["timestamp"], 1e-3)
+
+        # Calm windows need few frames at low resolution; busy windows get the full preset
+        if motion < CALM_MOTION:
+            frame_scale, side_scale = 0.25, 0.5
+        elif motion < BUSY_MOTION:
+            frame_scale, side_scale = 0.5, 0.75
+        else:
+            frame_scale, side_scale = 1.0, 1.0
+
+        # Back off further while other requests are waiting for the model
+        load_scale = 1.0 / (1 + max(queue_depth, 0))
+
+        max_frames = max(2, int(self.settings["max_frames"] * frame_scale * load_scale))
+        max_frames = min(max_frames, len(frame_buffer))
+        max_side = max(self.settings["min_side"], int(self.settings["max_side"] * side_scale * math.sqrt(load_scale)))
+        max_side = min(max_side, max(width, height))
+
+        scale = max_side / max(width, height)
+        target_width, target_height = max(PATCH_SIZE, int(width * scale)), max(PATCH_SIZE, int(height * scale))
+
+        # Enforce the hard ceiling: drop frames first, then resolution
+        while max_frames > 2 and max_frames * tokens_per_frame(target_width, target_height) > self.token_ceiling:
+            max_frames -= 1
+        while max_frames * tokens_per_frame(target_width, target_height) > self.token_ceiling and min(target_width, target_height) > PATCH_SIZE * 2:
+            target_width, target_height = int(target_width * 0.9), int(target_height * 0.9)
+
+        indices = np.linspace(0, len(frame_buffer) - 1, max_frames).astype(int).tolist()
+
+        return {
+            "indices": indices,
+            "width": target_width,
+            "height": target_height,
+            "fps": max_frames / window_seconds,
+            "max_frames": max_frames,
+            "motion": motion,
+            "queue_depth": queue_depth,
+            "visual_tokens": max_frames * tokens_per_frame(target_width, target_height),
+        }
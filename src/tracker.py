@@ -0,0 +1,146 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.geometric_detector import ASPECT, CX, CY, H, T, W, evaluate_history
+from src.roi import Box, expand_box
+from src.zones import CameraZones
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) arrays of x, y, w, h boxes"""
+    ax1, ay1, ax2, ay2 = a[:, 0, None], a[:, 1, None], a[:, 0, None] + a[:, 2, None], a[:, 1, None] + a[:, 3, None]
+    bx1, by1, bx2, by2 = b[None, :, 0], b[None, :, 1], b[None, :, 0] + b[None, :, 2], b[None, :, 1] + b[None, :, 3]
+
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = a[:, 2, None] * a[:, 3, None] + b[None, :, 2] * b[None, :, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class Track:
+    """One person: latest box plus a fixed-size posture history in the geometric detector's row format"""
+
+    def __init__(self, track_id: int, capacity: int):
+        self.track_id = track_id
+        self.rows = np.full((capacity, 6), np.nan, dtype=np.float64)
+        self.position = 0
+        self.box: Optional[Tuple[int, int, int, int]] = None
+        self.first_seen: Optional[float] = None
+        self.last_seen: float = 0.0
+        self.reported_fall: Optional[float] = None  # fall_time of the last fall event already handed out
+        self.last_alert_time: Optional[float] = None
+
+    def add(self, box: Sequence[int], timestamp: float, width: int, height: int):
+        x, y, w, h = box
+        row = self.rows[self.position % len(self.rows)]
+        row[T], row[CX], row[CY] = timestamp, (x + w / 2) / width, (y + h / 2) / height
+        row[W], row[H], row[ASPECT] = w / width, h / height, w / max(h, 1)
+        self.position += 1
+        self.box = (int(x), int(y), int(w), int(h))
+        self.first_seen = self.first_seen if self.first_seen is not None else timestamp
+        self.last_seen = timestamp
+
+    def history(self) -> np.ndarray:
+        count = min(self.position, len(self.rows))
+        return self.rows[np.arange(self.position - count, self.position) % len(self.rows)]
+
+    def roi(self, width: int, height: int, margin: float = 0.25) -> Box:
+        """Crop box covering everywhere the person was during the history (standing and lying), with a margin"""
+        rows = self.history()
+        x1 = np.min(rows[:, CX] - rows[:, W] / 2) * width
+        y1 = np.min(rows[:, CY] - rows[:, H] / 2) * height
+        x2 = np.max(rows[:, CX] + rows[:, W] / 2) * width
+        y2 = np.max(rows[:, CY] + rows[:, H] / 2) * height
+        return expand_box((int(x1), int(y1), int(x2), int(y2)), margin, width, height)
+
+
+class PersonTracker:
+    """Greedy IoU tracker with a centroid-distance fallback; fast falls change the box shape too much for IoU alone"""
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.2,
+        max_distance: float = 0.15,
+        max_missed_seconds: float = 2.0,
+        history_seconds: float = 10.0,
+        max_fps: float = 30.0,
+        drop_velocity: float = 0.5,
+        lying_aspect: float = 1.0,
+        floor_seconds: float = 1.0,
+        settle_seconds: float = 0.5,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance  # centroid distance as a fraction of the frame diagonal
+        self.max_missed_seconds = max_missed_seconds
+        self.capacity = int(history_seconds * max_fps) + 1
+        self.fall_settings = (drop_velocity, lying_aspect, floor_seconds, settle_seconds)
+        self.zones: Optional[CameraZones] = None  # CameraZones of the camera being watched, if any
+        self.tracks: Dict[int, Track] = {}
+        self.next_id = 1
+        self.frame_size: Optional[Tuple[int, int]] = None
+
+    def update(self, boxes: Sequence[Sequence[int]], timestamp: float, frame_size: Tuple[int, int]) -> List[Track]:
+        """Match this frame's (x, y, w, h) detections to tracks; returns the tracks seen in this frame"""
+        width, height = frame_size
+        self.frame_size = frame_size
+        tracks = list(self.tracks.values())
+        detections = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+        matched_tracks, matched_detections = set(), set()
+
+        if tracks and len(detections):
+            previous = np.array([track.box for track in tracks], dtype=np.float64)
+            iou = iou_matrix(previous, detections)
+
+            centers_a = previous[:, :2] + previous[:, 2:] / 2
+            centers_b = detections[:, :2] + detections[:, 2:] / 2
+            distance = np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2) / np.hypot(width, height)
+
+            # IoU matches first (cost < 1), centroid matches after (cost 1-2), everything else is not a match
+            cost = np.where(iou >= self.iou_threshold, 1.0 - iou, np.where(distance <= self.max_distance, 1.0 + distance, np.inf))
+            for flat in np.argsort(cost, axis=None):
+                if not np.isfinite(cost.flat[flat]):
+                    break
+                t, d = divmod(int(flat), len(detections))
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                tracks[t].add(detections[d], timestamp, width, height)
+                matched_tracks.add(t)
+                matched_detections.add(d)
+
+        for d in range(len(detections)):
+            if d not in matched_detections:
+                track = Track(self.next_id, self.capacity)
+                track.add(detections[d], timestamp, width, height)
+                self.tracks[track.track_id] = track
+                self.next_id += 1
+
+        for track in tracks:
+            if timestamp - track.last_seen > self.max_missed_seconds:
+                del self.tracks[track.track_id]
+
+        return [track for track in self.tracks.values() if track.last_seen == timestamp]
+
+    def evaluate(self, track: Track) -> Dict[str, Any]:
+        return evaluate_history(track.history(), *self.fall_settings, zones=self.zones)
+
+    def new_falls(self, timestamp: float, cooldown: float = 30.0) -> List[Tuple[Track, Dict[str, Any]]]:
+        """Tracks with a fall event not reported yet; the cooldown is per person, so others can still alert"""
+        falls = []
+        for track in self.tracks.values():
+            result = self.evaluate(track)
+            if not result["fall"] or result["fall_time"] == track.reported_fall:
+                continue
+            if track.last_alert_time is not None and timestamp - track.last_alert_time < cooldown:
+                continue
+            track.reported_fall = result["fall_time"]
+            track.last_alert_time = timestamp
+            falls.append((track, result))
+        return falls
+
+    def get_stats_text(self) -> str:
+        return f"{len(self.tracks)} người đang theo dõi (tổng {self.next_id - 1})"
@@ -1,10 +1,25 @@
 import base64
+import hashlib
 import os
 from datetime import datetime
+from typing import Optional
 
 import cv2
 
 from src import MAX_FRAMES, SAVE_FORMAT, TEMP_DIR, console, logger
+from src.roi import crop_to_roi
+
+# Bump when the prompt in prepare_messages changes, so cached results of the old prompt are not reused
+PROMPT_VERSION = 1
+# JPEG quality of frames sent to the model
+JPEG_QUALITY = 80
+# Every real answer starts with one of these; anything else (MODEL_NOT_LOADED, LỖI_PHÂN_TÍCH_KẾT_HỢP: ...) is a failure
+VERDICT_PREFIXES = ("PHÁT_HIỆN_TÉ_NGÃ", "KHÔNG_PHÁT_HIỆN_TÉ_NGÃ")
+
+
+def is_verdict(text: Optional[str]) -> bool:
+    """True for a fall / no-fall verdict, False for None and error strings"""
+    return text is not None and text.startswith(VERDICT_PREFIXES)
 
 
 def prepare_messages(base64_frames: list[str]) -> list[dict]:
@@ -124,8 +139,8 @@ def save_analysis_frames_to_temp(frames, folder_dir=TEMP_DIR):
         logger.error(f"[red]✗[/red] Không thể lưu khung hình phân tích: {e}", extra={"markup": True})
 
 
-def frames_to_base64(frames, max_frames=MAX_FRAMES):
-    """Convert frames to base64 for OpenAI API"""
+def frames_to_base64(frames, max_frames=MAX_FRAMES, roi=None, max_side=None):
+    """Convert frames to base64 for OpenAI API, optionally cropped to an ROI and downscaled"""
     base64_frames = []
     step = max(1, len(frames) // max_frames)
 
@@ -134,8 +149,19 @@ def frames_to_base64(frames, max_frames=MAX_FRAMES):
             break
 
         frame = frames[i]["frame"]
-        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if roi is not None or max_side:
+            frame = crop_to_roi(frame, roi, max_side)
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
         base64_frame = base64.b64encode(buffer).decode("utf-8")
         base64_frames.append(base64_frame)
 
     return base64_frames
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of a file, read in blocks so large recordings are never loaded whole"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,146 @@
+import logging
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FALL_LABEL = "PHÁT_HIỆN_TÉ_NGÃ"
+NO_FALL_LABEL = "KHÔNG_PHÁT_HIỆN_TÉ_NGÃ"
+
+# (pattern, weight, Vietnamese cue) - positive weights point to a fall, negative to normal activity
+FALL_PATTERNS = [
+    (r"\b(falls?|fell|fallen|falling)\b( down| over| to the (floor|ground))?", 2.5, "ngã xuống"),
+    (r"\b(collaps(e|es|ed|ing)|slump(s|ed|ing)?)\b", 2.5, "gục xuống"),
+    (r"\b(slip(s|ped|ping)?)\b", 1.5, "trượt ngã"),
+    (r"\b(trip(s|ped|ping)?|stumbl(e|es|ed|ing))\b", 1.5, "vấp ngã"),
+    (r"\blos(e|es|ing|t) (his |her |their )?balance\b", 2.0, "mất thăng bằng"),
+    (r"\b(lying|lies|laying|lay|sprawled) (motionless |still |face down |flat )?on the (floor|ground)\b", 2.5, "nằm trên sàn"),
+    (r"\b(on the (floor|ground)) (and )?(not moving|motionless|unable to get up)\b", 2.0, "không thể đứng dậy"),
+    (r"\b(accident|emergency|injur(ed|y))\b", 1.0, "tình huống khẩn cấp"),
+]
+
+NORMAL_PATTERNS = [
+    (r"\b(walk(s|ed|ing)?|stroll(s|ing)?)\b", -0.5, "đi lại"),
+    (r"\b(sit(s|ting)?|seated)\b", -0.5, "ngồi"),
+    (r"\b(stand(s|ing)?|stood)\b", -0.5, "đứng"),
+    (r"\b(lying|lies|resting|sleeping) (in|on) (a |the )?bed\b", -1.0, "nằm trên giường"),
+    (r"\b(talk(s|ing)?|chat(s|ting)?|convers(e|ing|ation))\b", -0.3, "trò chuyện"),
+    (r"\bbend(s|ing)? (down|over)\b", -0.5, "cúi xuống"),
+    (r"\b(exercis(e|es|ing)|stretch(es|ing)?)\b", -0.5, "tập thể dục"),
+]
+
+# Phrases that deny a fall; removed before positive patterns are matched
+NEGATION_PATTERNS = [
+    r"\bno (signs? of |evidence of |indication of )?(falls?|falling|stumbl\w*|accidents?|collaps\w*)\b",
+    r"\b(does not|doesn't|did not|didn't|do not|don't|never|without) (appear to )?(fall|falling|stumble|trip|slip|collapse|lose (his |her |their )?balance)\w*\b",
+    r"\b(there (are|is|were|was) no|nor any) [a-z ]{0,30}(falls?|accidents?|stumbles?)\b",
+    r"\bnot (falling|fallen|collapsed|on the (floor|ground))\b",
+]
+
+
+class KeywordVerdictScorer:
+    """Fast regex scorer mapping an English video description to a fall score"""
+
+    def __init__(self, bias: float = -1.0):
+        self.bias = bias
+        self.fall_patterns = [(re.compile(p, re.IGNORECASE), w, cue) for p, w, cue in FALL_PATTERNS]
+        self.normal_patterns = [(re.compile(p, re.IGNORECASE), w, cue) for p, w, cue in NORMAL_PATTERNS]
+        self.negation_patterns = [re.compile(p, re.IGNORECASE) for p in NEGATION_PATTERNS]
+
+    def score(self, description: str) -> Tuple[float, List[str], List[str]]:
+        """Return (fall probability, fall cues, normal cues) for a description"""
+        text = description or ""
+        for pattern in self.negation_patterns:
+            text = pattern.sub(" ", text)
+
+        logit = self.bias
+        fall_cues, normal_cues = [], []
+
+        for pattern, weight, cue in self.fall_patterns:
+            if pattern.search(text):
+                logit += weight
+                fall_cues.append(cue)
+
+        for pattern, weight, cue in self.normal_patterns:
+            if pattern.search(text):
+                logit += weight
+                normal_cues.append(cue)
+
+        probability = 1.0 / (1.0 + math.exp(-logit))
+        return probability, fall_cues, normal_cues
+
+
+class TextVerdictClassifier:
+    """Optional small zero-shot text classifier running on CPU"""
+
+    LABELS = ["a person falls down", "normal activity without any fall"]
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.pipeline: Optional[Callable[..., Dict]] = None
+        self.is_available = True
+
+    def load(self) -> bool:
+        """Load the classifier pipeline on first use"""
+        if self.pipeline is not None:
+            return True
+        if not self.is_available:
+            return False
+
+        try:
+            from transformers import pipeline
+
+            self.pipeline = pipeline("zero-shot-classification", model=self.model_name, device=-1)
+            logger.info(f"Local verdict classifier loaded: {self.model_name}")
+            return True
+        except Exception as e:
+            logger.warning(f"Local verdict classifier unavailable, using keywords only: {e}")
+            self.is_available = False
+            return False
+
+    def score(self, description: str) -> Optional[float]:
+        """Return the fall probability, or None when the classifier can't run"""
+        if not self.load() or self.pipeline is None:
+            return None
+
+        try:
+            result = self.pipeline(description, candidate_labels=self.LABELS)
+            scores = dict(zip(result["labels"], result["scores"]))
+            return float(scores[self.LABELS[0]])
+        except Exception as e:
+            logger.error(f"Error in local verdict classifier: {e}")
+            return None
+
+
+class LocalVerdictClassifier:
+    """Offline replacement for the OpenAI Vietnamese verdict step"""
+
+    def __init__(self, model_name: str = "", fall_threshold: float = 0.5, ambiguous_band: Tuple[float, float] = (0.3, 0.7)):
+        self.keyword_scorer = KeywordVerdictScorer()
+        self.text_classifier = TextVerdictClassifier(model_name) if model_name else None
+        self.fall_threshold = fall_threshold
+        self.ambiguous_band = ambiguous_band
+
+    def score(self, description: str) -> Tuple[float, List[str], List[str]]:
+        """Score a description, consulting the text classifier only for ambiguous keyword scores"""
+        probability, fall_cues, normal_cues = self.keyword_scorer.score(description)
+
+        low, high = self.ambiguous_band
+        if self.text_classifier and low <= probability <= high:
+            classifier_probability = self.text_classifier.score(description)
+            if classifier_probability is not None:
+                probability = classifier_probability
+
+        return probability, fall_cues, normal_cues
+
+    def classify(self, description: str) -> str:
+        """Return a verdict in the same format as the OpenAI analysis"""
+        probability, fall_cues, normal_cues = self.score(description)
+
+        if probability >= self.fall_threshold:
+            cues = ", ".join(fall_cues) if fall_cues else "chuyển động bất thường"
+            return f"{FALL_LABEL}: Mô tả video cho thấy dấu hiệu té ngã ({cues}). Độ tin cậy: {probability:.0%}"
+
+        cues = ", ".join(normal_cues) if normal_cues else "không có chuyển động bất thường"
+        return f"{NO_FALL_LABEL}: Hoạt động bình thường ({cues}). Độ tin cậy: {1 - probability:.0%}"
@@ -0,0 +1,126 @@
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Gaps longer than this are seeked over; shorter ones are skipped with grab() (no color conversion or copy), since a seek
+# decodes forward from the previous keyframe anyway and typical keyframe intervals are 1-2 s
+SEEK_SECONDS = 2.0
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """Frame count, fps, duration and size of a video file without decoding it"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {path}")
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            "total_frames": total_frames,
+            "fps": fps,
+            "duration": total_frames / fps if fps > 0 else 0.0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def sample_indices(total_frames: int, fps: float, sample_fps: float, max_frames: int, start: float = 0.0, end: Optional[float] = None) -> np.ndarray:
+    """Frame indices to read: sample_fps over [start, end), spread evenly if that would exceed max_frames"""
+    first = max(0, int(round(start * fps)))
+    last = total_frames if end is None else min(total_frames, int(round(end * fps)))
+    if last <= first:
+        return np.array([], dtype=int)
+
+    count = int((last - first) / fps * sample_fps) if sample_fps > 0 and fps > 0 else max_frames
+    count = max(1, min(count, max_frames, last - first))
+    return np.unique(np.linspace(first, last - 1, count).astype(int))
+
+
+def resize_to_width(frame: np.ndarray, max_width: Optional[int]) -> np.ndarray:
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+
+def iter_sampled_frames(
+    path: str,
+    sample_fps: float = 15.0,
+    max_frames: int = 120,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    max_width: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield {"frame", "timestamp", "index"} for the sampled frames only; memory does not grow with video length"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {path}")
+
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+
+        if total_frames <= 0 or fps <= 0:
+            # Unknown length (some streams/containers): read through once, keeping frames on the sampling clock
+            yield from _iter_sequential(cap, fps if fps > 0 else 30.0, sample_fps, max_frames, start, end, max_width)
+            return
+
+        yield from _iter_indices(cap, sample_indices(total_frames, fps, sample_fps, max_frames, start, end), fps, max_width, path)
+    finally:
+        cap.release()
+
+
+def iter_frames_at(path: str, indices, max_width: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield {"frame", "timestamp", "index"} for the given ascending frame indices"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        yield from _iter_indices(cap, indices, fps, max_width, path)
+    finally:
+        cap.release()
+
+
+def _iter_indices(cap, indices, fps, max_width, path) -> Iterator[Dict[str, Any]]:
+    seek_gap = max(1, int(SEEK_SECONDS * fps))
+    position = 0  # index of the next frame read() would return
+    for index in indices:
+        gap = index - position
+        if gap > seek_gap or gap < 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        else:
+            for _ in range(gap):
+                cap.grab()
+        ret, frame = cap.read()
+        if not ret:
+            logger.warning(f"Could not read frame {index} of {path}, stopping early")
+            break
+        position = index + 1
+        yield {"frame": resize_to_width(frame, max_width), "timestamp": index / fps, "index": int(index)}
+
+
+def _iter_sequential(cap, fps, sample_fps, max_frames, start, end, max_width) -> Iterator[Dict[str, Any]]:
+    interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+    next_time, index, yielded = start, 0, 0
+    while yielded < max_frames:
+        if not cap.grab():
+            break
+        timestamp = index / fps
+        index += 1
+        if end is not None and timestamp >= end:
+            break
+        if timestamp < next_time:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        next_time = timestamp + interval
+        yielded += 1
+        yield {"frame": resize_to_width(frame, max_width), "timestamp": timestamp, "index": index - 1}
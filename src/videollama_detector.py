@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 import time
 from typing import Any, Dict, List
 
@@ -9,25 +10,60 @@ from openai import OpenAI
 from openai.types.chat import ChatCompletionMessageParam
 from transformers import AutoModelForCausalLM, AutoProcessor
 
+from src import (
+    FALL_PROBE_BACKEND,
+    FALL_PROBE_HIGH,
+    FALL_PROBE_LOW,
+    FALL_PROBE_ONNX,
+    FALL_PROBE_WEIGHTS,
+    LOCAL_VERDICT_MODEL,
+    TOKEN_BUDGET_PRESET,
+    TOKEN_CEILING,
+    VERDICT_BACKEND,
+)
+from src.fall_probe import create_fall_probe
+from src.token_budget import VisualTokenPlanner
+from src.verdict_classifier import LocalVerdictClassifier
+
 logger = logging.getLogger(__name__)
 
 
 class VideoLLamaFallDetector:
     """VideoLLaMA3-based fall detection system with OpenAI Vietnamese analysis"""
 
-    def __init__(self, model_name="DAMO-NLP-SG/VideoLLaMA3-2B"):
+    def __init__(self, model_name="DAMO-NLP-SG/VideoLLaMA3-2B", verdict_backend=VERDICT_BACKEND):
         self.model_name = model_name
         self.model = None
         self.processor = None
         self.is_loaded = False
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
-        # Initialize OpenAI client for Vietnamese analysis
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Second stage: "openai" (gpt-4o-mini) or "local" (offline keyword scorer + optional text classifier)
+        self.verdict_backend = verdict_backend
+        self.local_verdict = LocalVerdictClassifier(LOCAL_VERDICT_MODEL)
+        self.openai_client = None
+
+        # Frame count and resolution are chosen per request from motion and queue depth
+        self.token_planner = VisualTokenPlanner(TOKEN_BUDGET_PRESET, TOKEN_CEILING)
+
+        # Optional early-exit probe (needs FALL_PROBE_WEIGHTS), created once the model is loaded
+        self.fall_probe = None
+
+        # The live loop and concurrent upload windows share one model (and one temp video path): generate one at a time
+        self.inference_lock = threading.Lock()
+
+    def classify_description(self, video_description: str) -> str:
+        """Turn an English video description into a Vietnamese fall verdict using the configured backend"""
+        if self.verdict_backend == "local":
+            return self.local_verdict.classify(video_description)
+        return self.translate_to_vietnamese_analysis(video_description)
 
     def translate_to_vietnamese_analysis(self, video_description: str) -> str:
         """Analyze video description and provide Vietnamese fall detection response"""
         try:
+            if self.openai_client is None:
+                self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
             messages: list[ChatCompletionMessageParam] = [
                 {"role": "system", "content": "Bạn là trợ lý AI chuyên về phát hiện té ngã trong môi trường bệnh viện."},
                 {
@@ -64,6 +100,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
             self.processor = AutoProcessor.from_pretrained(self.model_name, trust_remote_code=True)
 
             self.is_loaded = True
+            self.fall_probe = create_fall_probe(self, FALL_PROBE_WEIGHTS, FALL_PROBE_BACKEND, FALL_PROBE_ONNX, FALL_PROBE_LOW, FALL_PROBE_HIGH)
             logger.info("VideoLLaMA3 model loaded successfully")
             return True
 
@@ -81,6 +118,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
             if self.processor:
                 del self.processor
                 self.processor = None
+            self.fall_probe = None
 
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
@@ -91,7 +129,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
         except Exception as e:
             logger.error(f"Error unloading model: {e}")
 
-    def create_video_file_from_frames(self, frame_buffer: List[Dict], temp_path: str = "temp_video.mp4") -> str:
+    def create_video_file_from_frames(self, frame_buffer: List[Dict], temp_path: str = "temp_video.mp4", fps: float = 10) -> str:
         """Create a temporary video file from frame buffer"""
         try:
             if not frame_buffer:
@@ -103,7 +141,6 @@ Chỉ trả lời theo một trong hai định dạng sau:
 
             # Create video writer
             fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            fps = 10  # 10 FPS for analysis
             out = cv2.VideoWriter(temp_path, fourcc, fps, (width, height))
 
             # Write frames
@@ -117,7 +154,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
             logger.error(f"Error creating video file: {e}")
             return None
 
-    def get_video_description(self, frame_buffer: List[Dict]) -> str:
+    def get_video_description(self, frame_buffer: List[Dict], queue_depth: int = 0) -> str:
         """Get detailed video description from VideoLLaMA3 in English"""
         if not self.is_loaded:
             logger.error("Model not loaded. Call load_model() first.")
@@ -128,9 +165,21 @@ Chỉ trả lời theo một trong hai định dạng sau:
             return "NO_FRAMES"
 
         try:
+            # Only the planned frames, at the planned resolution, go into the video
+            plan = self.token_planner.plan(frame_buffer, queue_depth=queue_depth)
+            size = (plan["width"], plan["height"])
+            planned_frames = [
+                {"frame": cv2.resize(frame_buffer[i]["frame"], size, interpolation=cv2.INTER_AREA), "timestamp": frame_buffer[i]["timestamp"]} for i in plan["indices"]
+            ]
+            video_fps = max(1.0, plan["fps"])
+            logger.info(
+                f"Visual token plan: {plan['max_frames']} frames at {size[0]}x{size[1]}, ~{plan['visual_tokens']} tokens "
+                f"(motion {plan['motion']:.3f}, queue {queue_depth})"
+            )
+
             # Create temporary video file
             temp_video_path = "temp_analysis_video.mp4"
-            video_path = self.create_video_file_from_frames(frame_buffer, temp_video_path)
+            video_path = self.create_video_file_from_frames(planned_frames, temp_video_path, fps=video_fps)
 
             if not video_path:
                 return "FAILED_TO_CREATE_VIDEO"
@@ -153,7 +202,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
                 {
                     "role": "user",
                     "content": [
-                        {"type": "video", "video": {"video_path": video_path, "fps": 1, "max_frames": 64}},
+                        {"type": "video", "video": {"video_path": video_path, "fps": video_fps, "max_frames": plan["max_frames"]}},
                         {"type": "text", "text": question},
                     ],
                 },
@@ -223,7 +272,7 @@ Chỉ trả lời theo một trong hai định dạng sau:
             logger.error(f"Error in VideoLLaMA3 video description: {e}")
             return f"DESCRIPTION_ERROR: {str(e)}"
 
-    def analyze_frames(self, frame_buffer: List[Dict]) -> str:
+    def analyze_frames(self, frame_buffer: List[Dict], queue_depth: int = 0) -> str:
         """Analyze frames for fall detection using VideoLLaMA3 + OpenAI flow"""
         if not self.is_loaded:
             logger.error("Model not loaded. Call load_model() first.")
@@ -234,18 +283,26 @@ Chỉ trả lời theo một trong hai định dạng sau:
             return "NO_FRAMES"
 
         try:
-            # Step 1: Get detailed video description from VideoLLaMA3
-            logger.info("Step 1: Getting video description from VideoLLaMA3...")
-            video_description = self.get_video_description(frame_buffer)
+            with self.inference_lock:
+                # Step 0: a confident probe score on vision features skips generation entirely
+                if self.fall_probe:
+                    probe_verdict = self.fall_probe.decide(frame_buffer)
+                    if probe_verdict:
+                        logger.info(f"Fall probe verdict: {probe_verdict}")
+                        return probe_verdict
+
+                # Step 1: Get detailed video description from VideoLLaMA3
+                logger.info("Step 1: Getting video description from VideoLLaMA3...")
+                video_description = self.get_video_description(frame_buffer, queue_depth)
 
             if video_description.startswith(("MODEL_NOT_LOADED", "NO_FRAMES", "FAILED_TO_CREATE_VIDEO", "DESCRIPTION_ERROR")):
                 return video_description
 
             logger.info(f"VideoLLaMA3 description: {video_description}")
 
-            # Step 2: Analyze description with OpenAI for Vietnamese fall detection
-            logger.info("Step 2: Analyzing with OpenAI for Vietnamese fall detection...")
-            vietnamese_analysis = self.translate_to_vietnamese_analysis(video_description)
+            # Step 2: Turn the description into a Vietnamese fall verdict
+            logger.info(f"Step 2: Analyzing description for Vietnamese fall detection ({self.verdict_backend})...")
+            vietnamese_analysis = self.classify_description(video_description)
 
             logger.info(f"Final Vietnamese analysis: {vietnamese_analysis}")
 
@@ -265,4 +322,6 @@ Chỉ trả lời theo một trong hai định dạng sau:
             "memory_allocated": torch.cuda.memory_allocated() if torch.cuda.is_available() else 0,
             "memory_reserved": torch.cuda.memory_reserved() if torch.cuda.is_available() else 0,
             "openai_available": bool(os.getenv("OPENAI_API_KEY")),
+            "verdict_backend": self.verdict_backend,
+            "fall_probe": self.fall_probe.stats if self.fall_probe else None,
         }
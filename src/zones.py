@@ -0,0 +1,93 @@
+import json
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Polygon = List[Tuple[float, float]]  # points as fractions of the frame size
+
+ZONE_KINDS = ("ignore", "floor", "bed")
+
+# Resolution of the normalized lookup grid used to test many points against floor/bed zones at once
+LOOKUP_SIZE = 200
+
+
+class CameraZones:
+    """Polygon zones of one camera: ignore (never analyzed or sent), floor and bed; masks are built once per frame size"""
+
+    def __init__(self, ignore: Sequence[Polygon] = (), floor: Sequence[Polygon] = (), bed: Sequence[Polygon] = ()):
+        self.polygons = {"ignore": list(ignore), "floor": list(floor), "bed": list(bed)}
+        self.masks: Dict[Tuple[str, int, int], np.ndarray] = {}
+        self.floor_lookup = self.mask("floor", LOOKUP_SIZE, LOOKUP_SIZE) > 0
+        self.bed_lookup = self.mask("bed", LOOKUP_SIZE, LOOKUP_SIZE) > 0
+
+    def mask(self, kind: str, width: int, height: int) -> np.ndarray:
+        """uint8 mask (255 inside) of all zones of a kind at a frame size, cached"""
+        key = (kind, width, height)
+        if key not in self.masks:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            polygons = [np.round(np.array(p, dtype=np.float64) * (width, height)).astype(np.int32) for p in self.polygons[kind]]
+            if polygons:
+                cv2.fillPoly(mask, polygons, 255)
+            self.masks[key] = mask
+        return self.masks[key]
+
+    def keep_mask(self, width: int, height: int) -> np.ndarray:
+        """3-channel mask of the pixels that may be analyzed (everything outside ignore zones), cached"""
+        key = ("keep", width, height)
+        if key not in self.masks:
+            keep = cv2.bitwise_not(self.mask("ignore", width, height))
+            self.masks[key] = cv2.merge([keep, keep, keep])
+        return self.masks[key]
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Black out ignore zones; returns the frame itself when there are none"""
+        if not self.polygons["ignore"]:
+            return frame
+        height, width = frame.shape[:2]
+        return cv2.bitwise_and(frame, self.keep_mask(width, height))
+
+    def lying_allowed(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """Whether lying at normalized centroids counts as on the floor: never in a bed, only on the floor if floors are set"""
+        col = np.clip((np.asarray(cx) * LOOKUP_SIZE).astype(int), 0, LOOKUP_SIZE - 1)
+        row = np.clip((np.asarray(cy) * LOOKUP_SIZE).astype(int), 0, LOOKUP_SIZE - 1)
+        allowed = ~self.bed_lookup[row, col]
+        if self.polygons["floor"]:
+            allowed &= self.floor_lookup[row, col]
+        return allowed
+
+    def roi_zones(self) -> List[Tuple[float, float, float, float]]:
+        """Bounding rectangles of the floor and bed zones, as ROI fallback zones"""
+        zones = []
+        for polygon in self.polygons["floor"] + self.polygons["bed"]:
+            points = np.array(polygon)
+            zones.append((float(points[:, 0].min()), float(points[:, 1].min()), float(points[:, 0].max()), float(points[:, 1].max())))
+        return zones
+
+
+def load_camera_zones(path: str, camera: str) -> Optional[CameraZones]:
+    """Zones for a camera from a JSON file {"<camera>" | "default": {"ignore": [polygon...], "floor": [...], "bed": [...]}}"""
+    if not path:
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except Exception as e:
+        logger.error(f"Could not read zones file {path}: {e}")
+        return None
+
+    camera_config = config.get(str(camera), config.get("default"))
+    if not camera_config:
+        return None
+
+    unknown = set(camera_config) - set(ZONE_KINDS)
+    if unknown:
+        logger.warning(f"Ignoring unknown zone kinds for camera {camera}: {sorted(unknown)}")
+
+    zones = CameraZones(**{kind: camera_config.get(kind, []) for kind in ZONE_KINDS})
+    logger.info(f"Camera {camera} zones: " + ", ".join(f"{len(zones.polygons[kind])} {kind}" for kind in ZONE_KINDS))
+    return zones